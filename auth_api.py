@@ -1,5 +1,5 @@
 from flask import Flask, request, jsonify
-from jwt_token import create_jwt
+from jwt_token import create_jwt, revoke_jwt
 
 app = Flask(__name__)
 
@@ -29,5 +29,23 @@ def generate_token():
     })
 
 
+@app.route("/revoke-token", methods=["POST"])
+def revoke_token():
+
+    # revokes the bearer token itself (logout); every server process
+    # rejects it within a second
+    auth_header = request.headers.get("Authorization", "")
+
+    if not auth_header.startswith("Bearer "):
+        return jsonify({"error": "Authorization header missing or invalid"}), 401
+
+    try:
+        revoke_jwt(auth_header.split(" ")[1])
+    except Exception:
+        return jsonify({"error": "Invalid token"}), 401
+
+    return jsonify({"status": "revoked"})
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import uuid
+import shutil
+import sqlite3
+import hashlib
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from ledger_writer import lock_for
+
+
+ANALYTICS_DIR = "analytics"
+
+PARTITIONS = ["month", "employee"]
+NO_EMPLOYEE = "unassigned"
+NO_MONTH = "undated"
+
+# typed core columns every source is mapped onto; anything else the
+# source carries is kept alongside as string columns
+CORE_SCHEMA = pa.schema([
+    ("row_id", pa.int64()),
+    ("date", pa.date32()),
+    ("employee", pa.string()),
+    ("vendor", pa.string()),
+    ("invoice_no", pa.string()),
+    ("amount", pa.float64()),
+])
+
+
+# -------------------------------------------------------------
+# SOURCES
+#   load(since) → DataFrame with a stable int64 "row_id" per row:
+#   the ledger's own primary key, or (workbooks / journals, whose
+#   rows have no id and may be rewritten in a different order) a
+#   hash of the row's content. since: only ledger sources ("ordered")
+#   use it; the others return every row and the sync skips the
+#   row_ids it has already exported.
+# -------------------------------------------------------------
+def content_row_ids(df):
+    # identical rows are told apart by their occurrence number, so a
+    # repeated row is exported as many times as it occurs
+    keys = [
+        json.dumps(sorted((str(k), str(v)) for k, v in row.items()))
+        for row in df.to_dict("records")
+    ]
+    occurrence = pd.Series(keys).groupby(keys).cumcount()
+    return [
+        int.from_bytes(hashlib.blake2b(f"{k}#{n}".encode(), digest_size=8).digest(),
+                       "big") >> 1
+        for k, n in zip(keys, occurrence)
+    ]
+
+
+def _load_journal(excel_file):
+    def load(since):
+        from claim_journal import ClaimJournal
+
+        df = ClaimJournal(excel_file).frame()
+        df.insert(0, "row_id", content_row_ids(df))
+        return df
+    return load
+
+
+def _load_workbook(excel_file):
+    def load(since):
+        if not os.path.exists(excel_file):
+            return pd.DataFrame(columns=["row_id"])
+        df = pd.read_excel(excel_file)
+        df.columns = df.columns.str.strip()
+        df.insert(0, "row_id", content_row_ids(df))
+        return df
+    return load
+
+
+def _load_ledger(db_path):
+    def load(since):
+        if not os.path.exists(db_path):
+            return pd.DataFrame(columns=["row_id"])
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            df = pd.read_sql_query(
+                "SELECT id AS row_id, file_name, file_hash, invoice_date, "
+                "invoice_number, vendor, total_amount, created_at "
+                "FROM claimed_invoices WHERE id >= ? ORDER BY id",
+                conn, params=(since,)
+            )
+        finally:
+            conn.close()
+        return df
+    return load
+
+
+SOURCES = {
+    # claim_service ledger (claim.xlsx + journal)
+    "claims": {
+        "load": _load_journal("claim.xlsx"),
+        "date": "Date",
+        "employee": "Employee_Code",
+        "vendor": None,
+        "invoice_no": "Invoice_No",
+        "amount": "Total_Amount",
+    },
+    # vali invoice ledger (claimed_invoices.db)
+    "invoices": {
+        "load": _load_ledger("claimed_invoices.db"),
+        "ordered": True,        # AUTOINCREMENT ids: load only id >= since
+        "date": "invoice_date",
+        "employee": None,
+        "vendor": "vendor",
+        "invoice_no": "invoice_number",
+        "amount": "total_amount",
+    },
+    # valiex expense database
+    "expenses": {
+        "load": _load_workbook("Book1.xlsx"),
+        "date": "Applied Date",
+        "employee": "Employee Code",
+        "vendor": None,
+        "invoice_no": "ClaimID",
+        "amount": "Applied Amount/Units",
+    },
+}
+
+
+# -------------------------------------------------------------
+# TYPING
+# -------------------------------------------------------------
+def _parse_dates(values):
+    # ledgers mix ISO dates, dd/mm/yyyy and "April 8, 2024"
+    iso = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    rest = pd.to_datetime(
+        values.where(iso.isna()), errors="coerce", dayfirst=True, format="mixed"
+    )
+    return iso.fillna(rest)
+
+
+def _text(values):
+    return values.map(lambda v: None if pd.isna(v) else str(v).strip())
+
+
+def to_columnar(df, spec):
+
+    out = pd.DataFrame({"row_id": df["row_id"].astype("int64")})
+
+    dates = _parse_dates(df[spec["date"]]) if spec["date"] else pd.NaT
+    out["date"] = pd.Series(dates, index=df.index).dt.date
+
+    for col in ("employee", "vendor", "invoice_no"):
+        out[col] = _text(df[spec[col]]) if spec[col] else None
+
+    out["amount"] = pd.to_numeric(df[spec["amount"]], errors="coerce")
+
+    mapped = {spec[c] for c in ("date", "employee", "vendor", "invoice_no", "amount")}
+    extras = [c for c in df.columns if c not in mapped and c != "row_id"]
+    for col in extras:
+        out[col] = _text(df[col])
+
+    out["month"] = pd.Series(dates, index=df.index).dt.strftime("%Y-%m").fillna(NO_MONTH)
+    out["employee"] = out["employee"].fillna(NO_EMPLOYEE)
+
+    schema = CORE_SCHEMA
+    for col in extras:
+        schema = schema.append(pa.field(col, pa.string()))
+    schema = schema.append(pa.field("month", pa.string()))
+
+    return pa.Table.from_pandas(out, schema=schema, preserve_index=False)
+
+
+# -------------------------------------------------------------
+# INCREMENTAL SYNC
+#   <ANALYTICS_DIR>/<source>/month=YYYY-MM/employee=<code>/part-*.parquet
+#   _sync.db remembers every exported row_id. One sync per source at a
+#   time across processes (every server worker's write-behind calls
+#   it): the state is read and updated under the dataset's lock.
+# -------------------------------------------------------------
+def dataset_dir(source):
+    return os.path.join(ANALYTICS_DIR, source)
+
+
+def _open_state(source):
+    conn = sqlite3.connect(os.path.join(dataset_dir(source), "_sync.db"), timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS exported (row_id INTEGER PRIMARY KEY)")
+    _import_watermark(conn, source)
+    return conn
+
+
+def _import_watermark(conn, source):
+    # datasets synced with the old row-position watermark: the rows
+    # before it (in today's order) count as exported
+    legacy = os.path.join(dataset_dir(source), "_watermark.json")
+    if not os.path.exists(legacy):
+        return
+    with open(legacy) as f:
+        next_row = json.load(f).get("next_row_id", 0)
+
+    spec = SOURCES[source]
+    df = spec["load"](0)
+    done = df["row_id"] < next_row if spec.get("ordered") else df.index < next_row
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO exported VALUES (?)",
+                         ((int(r),) for r in df.loc[done, "row_id"]))
+    os.remove(legacy)
+
+
+def sync_source(source, rebuild=False):
+    spec = SOURCES[source]
+    base_dir = dataset_dir(source)
+
+    with lock_for(base_dir):
+        if rebuild and os.path.exists(base_dir):
+            shutil.rmtree(base_dir)
+        os.makedirs(base_dir, exist_ok=True)
+
+        state = _open_state(source)
+        try:
+            exported = {r for (r,) in state.execute("SELECT row_id FROM exported")}
+            since = max(exported) + 1 if spec.get("ordered") and exported else 0
+
+            df = spec["load"](since)
+            df = df[~df["row_id"].isin(exported)]
+
+            if df.empty:
+                return 0
+
+            table = to_columnar(df, spec)
+
+            # new rows land in new files; existing partitions are never rewritten
+            ds.write_dataset(
+                table, base_dir,
+                format="parquet",
+                partitioning=PARTITIONS,
+                partitioning_flavor="hive",
+                basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+
+            with state:
+                state.executemany("INSERT OR IGNORE INTO exported VALUES (?)",
+                                  ((int(r),) for r in df["row_id"]))
+        finally:
+            state.close()
+
+    print(f"📦 Exported {len(df)} {source} rows to {base_dir}")
+    return len(df)
+
+
+def sync_all(rebuild=False):
+    return {source: sync_source(source, rebuild) for source in SOURCES}
+
+
+# -------------------------------------------------------------
+# QUERY (partition pruning + parquet predicate pushdown)
+# -------------------------------------------------------------
+def open_dataset(source):
+    return ds.dataset(
+        dataset_dir(source),
+        format="parquet",
+        partitioning="hive",
+        exclude_invalid_files=True,
+        ignore_prefixes=["_", "."],
+    )
+
+
+def _month(value):
+    return pd.Timestamp(value).strftime("%Y-%m")
+
+
+def query_claims(source="claims", employee=None, start=None, end=None,
+                 month=None, vendor=None, columns=None):
+    """
+    Filters on month / employee only open the matching partition
+    directories; date and vendor filters are pushed down to the
+    parquet row-group statistics.
+    """
+    dataset = open_dataset(source)
+    filters = []
+
+    if month is not None:
+        filters.append(ds.field("month") == month)
+
+    if employee is not None:
+        filters.append(ds.field("employee") == str(employee).strip())
+
+    if start is not None:
+        start = pd.Timestamp(start).date()
+        filters.append(ds.field("month") >= _month(start))
+        filters.append(ds.field("date") >= start)
+
+    if end is not None:
+        end = pd.Timestamp(end).date()
+        filters.append(ds.field("month") <= _month(end))
+        filters.append(ds.field("date") <= end)
+
+    if vendor is not None:
+        filters.append(ds.field("vendor") == str(vendor).strip())
+
+    expr = None
+    for f in filters:
+        expr = f if expr is None else expr & f
+
+    return dataset.to_table(filter=expr, columns=columns).to_pandas()
+
+
+def month_report(month, source="claims"):
+    df = query_claims(source, month=month, columns=["employee", "amount"])
+    return (
+        df.groupby("employee", as_index=False)["amount"]
+        .agg(["count", "sum"])
+        .rename(columns={"count": "claims", "sum": "total_amount"})
+    )
+
+
+# -------------------------------------------------------------
+# CLI
+#   python claim_analytics.py sync [--rebuild]
+#   python claim_analytics.py report 2024-04 [source]
+# -------------------------------------------------------------
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "sync"
+
+    if cmd == "sync":
+        print(sync_all(rebuild="--rebuild" in sys.argv))
+    elif cmd == "report":
+        print(month_report(sys.argv[2], *sys.argv[3:4]).to_string(index=False))
+    else:
+        sys.exit(f"unknown command: {cmd}")
@@ -0,0 +1,81 @@
+from bisect import bisect_left, insort
+
+import pandas as pd
+
+
+AMOUNT_TOLERANCE = 5
+
+
+# -------------------------------------------------------------
+# (Employee_Code, Invoice_No, Date) → sorted amounts
+#   duplicate = same key and an amount within ± tolerance,
+#   answered with one dict lookup + one bisect.
+# -------------------------------------------------------------
+def claim_key(emp, inv, date):
+    return (str(emp).strip(), str(inv).strip(), str(date).strip())
+
+
+class ClaimAmountIndex:
+
+    def __init__(self, tolerance=AMOUNT_TOLERANCE):
+        self.tolerance = tolerance
+        self._amounts = {}
+
+    def clear(self):
+        self._amounts = {}
+
+    def add(self, emp, inv, date, amt):
+        try:
+            amt = float(amt)
+        except (TypeError, ValueError):
+            return
+        if pd.isna(amt):
+            return
+        insort(self._amounts.setdefault(claim_key(emp, inv, date), []), amt)
+
+    def add_row(self, row):
+        self.add(row.get("Employee_Code"), row.get("Invoice_No"),
+                 row.get("Date"), row.get("Total_Amount"))
+
+    def contains(self, emp, inv, date, amt):
+        amounts = self._amounts.get(claim_key(emp, inv, date))
+        if not amounts:
+            return False
+        amt = float(amt)
+        i = bisect_left(amounts, amt - self.tolerance)
+        return i < len(amounts) and amounts[i] <= amt + self.tolerance
+
+    def batch_contains(self, rows):
+        """rows: iterable of (emp, inv, date, amt) → list of bools."""
+        return [self.contains(*r) for r in rows]
+
+    def duplicate_mask(self, emp, invoices, dates, amounts):
+        """
+        Vectorized contains() for one employee's sheet: the sheet's
+        (invoice, date) keys are joined once against the indexed amounts.
+        Arguments are aligned Series; returns a bool Series on their index.
+        """
+        sheet = pd.DataFrame({
+            "inv": invoices.astype(str).str.strip(),
+            "date": dates.astype(str).str.strip(),
+            "amt": pd.to_numeric(amounts, errors="coerce"),
+        }).rename_axis("row").reset_index()
+
+        emp = str(emp).strip()
+        ledger = pd.DataFrame(
+            [
+                (inv, date, amt)
+                for inv, date in set(zip(sheet["inv"], sheet["date"]))
+                for amt in self._amounts.get((emp, inv, date), ())
+            ],
+            columns=["inv", "date", "ledger_amt"]
+        )
+
+        matched = sheet.merge(ledger, on=["inv", "date"])
+        hits = matched.loc[
+            (matched["amt"] - matched["ledger_amt"]).abs() <= self.tolerance, "row"
+        ]
+        return pd.Series(invoices.index.isin(hits), index=invoices.index)
+
+    def __len__(self):
+        return sum(len(v) for v in self._amounts.values())
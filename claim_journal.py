@@ -0,0 +1,291 @@
+import os
+import sys
+import copy
+import json
+import uuid
+import threading
+
+import pandas as pd
+
+from ledger_writer import lock_for
+
+
+# -------------------------------------------------------------
+# APPEND-ONLY CLAIM JOURNAL
+#
+# New rows go to "<ledger>.journal.jsonl" (one JSON object per line,
+# fsync'd under a file lock) instead of rewriting the workbook.
+# compact() folds the journal into the .xlsx and starts a new journal.
+#
+# Each journal starts with a header line {"_journal": <id>}. The
+# workbook records, in its JOURNAL_SHEET, which journal it was
+# compacted from and up to which byte: if compaction dies after
+# replacing the workbook but before replacing the journal, replay
+# skips the rows the workbook already holds.
+# -------------------------------------------------------------
+JOURNAL_SHEET = "_journal"
+
+
+def new_journal_id():
+    return "j" + uuid.uuid4().hex      # never all digits (read back as text)
+
+
+class ClaimJournal:
+
+    def __init__(self, excel_file, columns=None, indexes=None):
+        self.excel_file = excel_file
+        self.journal_file = os.path.splitext(excel_file)[0] + ".journal.jsonl"
+        self.columns = columns
+
+        # name -> function(row) returning a hashable key (kept as a set),
+        #         or an object with add_row(row) / clear() (kept as is)
+        self.index_funcs = indexes or {}
+        self.index = self._new_indexes()
+
+        self._mutex = threading.Lock()
+        self._base = None
+        self._base_mtime = None
+        self._compacted = (None, 0)     # (journal id, offset) held by the workbook
+        self._journal_id = None
+        self._tail = []
+        self._offset = 0
+
+    @property
+    def lock(self):
+        # per process (see ledger_writer.lock_for)
+        return lock_for(self.excel_file)
+
+    # ---------------------------------------------------------
+    # LOAD / REFRESH
+    # ---------------------------------------------------------
+    def _new_indexes(self):
+        # fresh objects: callers still holding the old ones (a request in
+        # flight) keep a consistent view while a reload builds these
+        index = {}
+        for name, spec in self.index_funcs.items():
+            if callable(spec):
+                index[name] = set()
+            else:
+                index[name] = copy.copy(spec)
+                index[name].clear()
+        return index
+
+    def _index_rows(self, rows, index=None):
+        index = self.index if index is None else index
+        for name, spec in self.index_funcs.items():
+            idx = index[name]
+            for row in rows:
+                if callable(spec):
+                    idx.add(spec(row))
+                else:
+                    idx.add_row(row)
+
+    def _load_base(self):
+        compacted = (None, 0)
+        if os.path.exists(self.excel_file):
+            self._base_mtime = os.path.getmtime(self.excel_file)
+            sheets = pd.read_excel(self.excel_file, sheet_name=None)
+            df = next(iter(sheets.values()))
+            df.columns = df.columns.str.strip()
+            meta = sheets.get(JOURNAL_SHEET)
+            if meta is not None and len(meta):
+                journal_id = meta["journal_id"].iloc[0]
+                compacted = (None if pd.isna(journal_id) else str(journal_id),
+                             int(meta["offset"].iloc[0]))
+        else:
+            df = pd.DataFrame(columns=self.columns or [])
+            self._base_mtime = None
+
+        for col in self.columns or []:
+            if col not in df.columns:
+                df[col] = ""
+
+        index = self._new_indexes()
+        self._index_rows(df.to_dict("records"), index)
+
+        self._base = df
+        self._compacted = compacted
+        self._journal_id = None
+        self._tail = []
+        self._offset = 0
+        self.index = index
+
+    def _journal_header(self):
+        """(journal id, header length); (None, 0) for a journal without one."""
+        with open(self.journal_file, "rb") as f:
+            line = f.readline()
+        if line.endswith(b"\n"):
+            try:
+                header = json.loads(line)
+            except ValueError:
+                header = None
+            if isinstance(header, dict) and "_journal" in header:
+                return header["_journal"], len(line)
+        return None, 0
+
+    def _read_tail(self):
+        excel_mtime = (
+            os.path.getmtime(self.excel_file) if os.path.exists(self.excel_file) else None
+        )
+        if excel_mtime != self._base_mtime:
+            # another process compacted (or someone edited the workbook)
+            self._load_base()
+
+        if not os.path.exists(self.journal_file):
+            if self._offset:
+                # journal was compacted away by another process
+                self._load_base()
+            return
+
+        journal_id, header_len = self._journal_header()
+        if self._offset and (journal_id != self._journal_id or
+                             os.path.getsize(self.journal_file) < self._offset):
+            # journal replaced by another process's compaction
+            self._load_base()
+
+        if not self._offset:
+            # start of this journal, or past what the workbook already holds
+            self._journal_id = journal_id
+            done_id, done_offset = self._compacted
+            self._offset = done_offset if done_offset and done_id == journal_id else header_len
+
+        with open(self.journal_file, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+
+        # only consume complete lines; a half-written line is picked up next time
+        end = chunk.rfind(b"\n") + 1
+        if not end:
+            return
+
+        rows = [json.loads(line) for line in chunk[:end].splitlines() if line.strip()]
+        rows = [r for r in rows if "_journal" not in r]
+        self._offset += end
+        self._tail.extend(rows)
+        self._index_rows(rows)
+
+    def refresh(self):
+        with self._mutex:
+            if self._base is None:
+                self._load_base()
+            self._read_tail()
+
+    # ---------------------------------------------------------
+    # QUERIES
+    # ---------------------------------------------------------
+    def contains(self, index_name, key):
+        self.refresh()
+        return key in self.index[index_name]
+
+    def get_index(self, index_name):
+        self.refresh()
+        return self.index[index_name]
+
+    def frame(self):
+        self.refresh()
+        with self._mutex:
+            if not self._tail:
+                return self._base.copy()
+            return pd.concat([self._base, pd.DataFrame(self._tail)], ignore_index=True)
+
+    # ---------------------------------------------------------
+    # APPEND (constant time, durable)
+    # ---------------------------------------------------------
+    def append(self, records):
+        if isinstance(records, dict):
+            records = [records]
+        if not records:
+            return
+
+        payload = "".join(json.dumps(r, default=str) + "\n" for r in records)
+
+        with self.lock:
+            if not os.path.exists(self.journal_file) or not os.path.getsize(self.journal_file):
+                payload = self._header_line(new_journal_id()) + payload
+            with open(self.journal_file, "a", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+        self.refresh()
+
+    # ---------------------------------------------------------
+    # COMPACTION (journal → xlsx)
+    #   1. workbook + (journal id, offset) written to a temp file,
+    #      fsync'd, os.replace'd
+    #   2. the journal replaced by an empty one with a new id
+    #   a crash between 1 and 2 leaves the old journal, whose rows up
+    #   to offset replay then skips
+    # ---------------------------------------------------------
+    @staticmethod
+    def _header_line(journal_id):
+        return json.dumps({"_journal": journal_id}) + "\n"
+
+    @staticmethod
+    def _write_durably(tmp_file, target):
+        with open(tmp_file, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_file, target)
+
+    def compact(self):
+        with self.lock:
+            self.refresh()
+
+            with self._mutex:
+                if not self._tail:
+                    return 0
+
+                added = len(self._tail)
+                df = pd.concat([self._base, pd.DataFrame(self._tail)], ignore_index=True)
+
+                if self.columns:
+                    df = df[self.columns + [c for c in df.columns if c not in self.columns]]
+
+                compacted = (self._journal_id, self._offset)
+                base, ext = os.path.splitext(self.excel_file)
+                tmp_file = base + ".compacting" + ext
+                with pd.ExcelWriter(tmp_file) as xw:
+                    df.to_excel(xw, index=False)
+                    pd.DataFrame([{"journal_id": compacted[0], "offset": compacted[1]}]) \
+                        .to_excel(xw, sheet_name=JOURNAL_SHEET, index=False)
+                self._write_durably(tmp_file, self.excel_file)
+
+                # workbook now holds every journalled row: start a new journal
+                journal_id = new_journal_id()
+                header = self._header_line(journal_id)
+                tmp_journal = self.journal_file + ".new"
+                with open(tmp_journal, "w", encoding="utf-8") as f:
+                    f.write(header)
+                self._write_durably(tmp_journal, self.journal_file)
+
+                self._base = df
+                self._base_mtime = os.path.getmtime(self.excel_file)
+                self._compacted = compacted
+                self._journal_id = journal_id
+                self._tail = []
+                self._offset = len(header.encode())
+
+        print(f"🗜️ Compacted {added} journal rows into {self.excel_file}")
+        return added
+
+    def schedule_compaction(self, interval_seconds=300):
+
+        def loop():
+            while not stop.wait(interval_seconds):
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"⚠️ Journal compaction failed: {e}")
+
+        stop = threading.Event()
+        threading.Thread(target=loop, daemon=True).start()
+        return stop
+
+
+# -------------------------------------------------------------
+# ON-DEMAND COMPACTION
+#   python claim_journal.py claim.xlsx claimed_invoices.xlsx
+# -------------------------------------------------------------
+if __name__ == "__main__":
+    for excel in sys.argv[1:]:
+        ClaimJournal(excel).compact()
@@ -1,14 +1,35 @@
 import os
-import base64
-import uuid
+import json
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 from flask import Flask, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
 from dateutil import parser
 
 # external extractors
-from total import extract_total, extract_text_full
+from total import extract_total
 from invoice import extract_invoice
 from date import extract_date_from_text
+from claim_journal import ClaimJournal
+from claim_index import ClaimAmountIndex
+from daily_limits import DailyTotalIndex, daily_limit_check
+from ledger_cache import ConnectionPool, WriteBehind
+from ledger_writer import LedgerWriter
+from claim_analytics import sync_source
+from expense_sheet import read_sheet_columns, parse_date_column, parse_amount_column
+from doc_hash import decode_base64_chunks, write_chunks
+from uploads import request_uploads, close_uploads, UploadTooLarge, MAX_REQUEST_BYTES
+from doc_source import source_ext
+from governor import Budget, Cancelled, admitted, disconnect_probe, ADMISSION
+from scheduler import extract_text, estimate_size, size_class, SCHEDULER
+from idempotency import idempotent, run_idempotent, payload_digest, idempotency_key
+from near_dup import check_near_duplicate, confirm_near_duplicate, PAGE_INDEX, NEAR_DUP_ACTION
+from text_lsh import connect_lsh, minhash, query, add_document
+from job_queue import (
+    connect_jobs, enqueue, get_job, job_view, queue_stats, WorkerPool
+)
 
 # ================= DATE NORMALIZER =================
 def normalize_date(date_str):
@@ -20,225 +41,547 @@ def normalize_date(date_str):
         return None
 
 # ================= BASE64 DECODER =================
+# decodes chunk by chunk into memory, hashing on the way → (buffer, doc_id)
 def decode_base64_file(base64_string):
     if "base64," in base64_string:
         base64_string = base64_string.split("base64,")[1]
 
-    file_bytes = base64.b64decode(base64_string.strip())
+    buffer = io.BytesIO()
+    doc = write_chunks(decode_base64_chunks(base64_string), buffer)
+    buffer.seek(0)
 
-    os.makedirs("temp_files", exist_ok=True)
+    return buffer, doc.doc_id
 
-    if file_bytes.startswith(b"%PDF"):
-        ext = ".pdf"
-    elif file_bytes[:2] == b"PK":
-        ext = ".xlsx"
-    else:
-        ext = ".jpg"
+# ================= DUPLICATE CHECK =================
+# index: ClaimAmountIndex (same employee/invoice/date, amount within ±5)
+def check_duplicate(index, emp, inv, date, amt):
+    return index.contains(emp, inv, date, amt)
 
-    path = os.path.join("temp_files", f"{uuid.uuid4()}{ext}")
+# ================= SAVE TO EXCEL =================
+# rows are appended to claim.journal.jsonl; compaction rewrites claim.xlsx
+CLAIM_DB = "claim.xlsx"
+CLAIM_COLUMNS = [
+    "Employee_Code",
+    "Invoice_No",
+    "Date",
+    "Total_Amount",
+    "Claim_Type",
+    "Doc_ID"
+]
+# duplicate index is built once from claim.xlsx and kept current from the journal
+CLAIM_JOURNAL = ClaimJournal(
+    CLAIM_DB,
+    columns=CLAIM_COLUMNS,
+    indexes={
+        "doc": lambda r: str(r.get("Doc_ID")),
+        "amount": ClaimAmountIndex(),
+        "daily": DailyTotalIndex()
+    }
+)
+
+# single writer: appends and compactions are applied by one thread
+LEDGER_WRITER = LedgerWriter(CLAIM_DB)
+
+def flush_claims():
+    LEDGER_WRITER.call(CLAIM_JOURNAL.compact)
+    sync_source("claims")     # append new rows to the parquet copy
+
+# claim.xlsx is rewritten in the background, at most a minute behind the journal
+CLAIM_WRITER = WriteBehind(flush_claims, max_staleness=60, name="claim.xlsx")
+
+# runs on the writer thread, which holds the ledger's file lock: the
+# checks prepare_attachment made against its snapshot are repeated
+# against the journal as it is now (another request or job process may
+# have saved the same bill meanwhile). Returns the rejection, or None
+# once appended.
+def append_new_claims(records):
+    CLAIM_JOURNAL.refresh()
+    docs = CLAIM_JOURNAL.index["doc"]
+    amounts = CLAIM_JOURNAL.index["amount"]
+
+    for r in records:
+        if str(r.get("Doc_ID")) in docs:
+            return {"status": "DUPLICATE_CLAIM", "doc_id": r.get("Doc_ID")}
+        if check_duplicate(amounts, r["Employee_Code"], r["Invoice_No"],
+                           r["Date"], r["Total_Amount"]):
+            return {"status": "DUPLICATE_CLAIM", "invoice_number": r["Invoice_No"]}
+
+    CLAIM_JOURNAL.append(records)
+    return None
 
-    with open(path, "wb") as f:
-        f.write(file_bytes)
+def insert_into_excel(records):
+    duplicate = LEDGER_WRITER.call(append_new_claims, records)
+    if duplicate is None:
+        CLAIM_WRITER.mark_dirty()
+    return duplicate
 
-    return path
+def load_claims():
+    return CLAIM_JOURNAL.frame()
 
-# ================= DUPLICATE CHECK =================
-def check_duplicate(df, emp, inv, date, amt):
-    if df.empty:
-        return False
-
-    dup = df[
-        (df["Employee_Code"] == emp) &
-        (df["Invoice_No"] == inv) &
-        (df["Date"] == date) &
-        (abs(df["Total_Amount"] - amt) <= 5)
-    ]
-    return not dup.empty
+def claim_index():
+    return CLAIM_JOURNAL.get_index("amount")
 
-# ================= SAVE TO EXCEL =================
-def insert_into_excel(records):
-    DB = "claim.xlsx"
-
-    if os.path.exists(DB):
-        df = pd.read_excel(DB)
-    else:
-        df = pd.DataFrame(columns=[
-            "Employee_Code",
-            "Invoice_No",
-            "Date",
-            "Total_Amount",
-            "Claim_Type"
-        ])
-
-    df = pd.concat([df, pd.DataFrame(records)], ignore_index=True)
-    df.to_excel(DB, index=False)
+def daily_totals():
+    return CLAIM_JOURNAL.get_index("daily")
 
 # ================= DAILY EXPENSE (EXCEL) =================
-def process_daily_expense_excel(path, emp, ctype, voucher, db_df):
-    df = pd.read_excel(path)
-
-    required_cols = ["Invoice_No", "Date", "Total_Amount"]
-    for col in required_cols:
-        if col not in df.columns:
-            return {"status": "ERROR", "message": f"{col} column missing in Excel"}
+def process_daily_expense_excel(path, emp, ctype, voucher, index, doc_id=None, daily=None):
+    df, missing = read_sheet_columns(path, ["Invoice_No", "Date", "Total_Amount"])
+    if missing:
+        return {"status": "ERROR", "message": f"{missing[0]} column missing in Excel"}
 
     daily_limit = float(voucher.get("Daily_Limit", 0))
     voucher_amount = float(voucher.get("Bill_Amount", 0))
 
-    total_excel_amount = 0
-    records = []
+    invoices = df["Invoice_No"].astype(str)
+    dates = parse_date_column(df["Date"], normalize_date).astype(str)
+    amounts = parse_amount_column(df["Total_Amount"])
 
-    for _, row in df.iterrows():
-        inv = str(row["Invoice_No"])
-        date_obj = normalize_date(row["Date"])
-        amt = float(row["Total_Amount"])
-
-        # I️⃣ duplicate check
-        if check_duplicate(db_df, emp, inv, str(date_obj), amt):
-            return {
-                "status": "DUPLICATE_CLAIM",
-                "invoice_number": inv
-            }
+    # employee's day totals include what is already in the ledger
+    over_limit, day_totals = daily_limit_check(
+        pd.Series(emp, index=df.index), dates, amounts, daily_limit, daily
+    )
 
+    # every check runs over whole columns; all failures are reported together
+    checks = [
+        ("INVALID_AMOUNT", amounts.isna(), {}),
+        # I️⃣ duplicate check — one join against the ledger index
+        ("DUPLICATE_CLAIM", index.duplicate_mask(emp, invoices, dates, amounts), {}),
         # II️⃣ daily limit check
-        if amt > daily_limit:
-            return {
-                "status": "DAILY_LIMIT_EXCEEDED",
-                "invoice_number": inv,
-                "amount": amt,
-                "daily_limit": daily_limit
-            }
+        ("DAILY_LIMIT_EXCEEDED", over_limit, {"daily_limit": daily_limit}),
+    ]
 
-        total_excel_amount += amt
+    violations = []
+    for status, mask, extra in checks:
+        for row in df.index[mask.to_numpy()]:
+            violation = {"row": int(row), "status": status, "invoice_number": invoices[row]}
+            if status == "DAILY_LIMIT_EXCEEDED":
+                violation["amount"] = float(amounts[row])
+                violation["day_total"] = float(day_totals[row])
+            violations.append({**violation, **extra})
 
-        records.append({
-            "Employee_Code": emp,
-            "Invoice_No": inv,
-            "Date": str(date_obj),
-            "Total_Amount": amt,
-            "Claim_Type": ctype
-        })
+    # row order first, then check order (what a row-by-row pass would hit first)
+    violations.sort(key=lambda v: v["row"])
+
+    total_excel_amount = float(amounts.sum())
 
     # III️⃣ total <= voucher bill amount
     if total_excel_amount > voucher_amount:
-        return {
+        violations.append({
             "status": "VOUCHER_AMOUNT_EXCEEDED",
             "excel_total": total_excel_amount,
             "voucher_amount": voucher_amount
-        }
-
-    return {"records": records, "total": total_excel_amount}
-
-# ================= CLAIM PROCESSOR =================
-def process_claim(data):
-
-    claim = data.get("Claim", {})
-    emp = claim.get("Employee_Code")
-    #ctype = claim.get("Claim_Type")
-    total_expected = float(claim.get("Total_Bill_Amount", 0))
-
-    vouchers = claim.get("Vouchers", [])
-    db_df = pd.read_excel("claim.xlsx") if os.path.exists("claim.xlsx") else pd.DataFrame()
-
-    grand_total = 0
-    all_records = []
-
-    for v in vouchers:
-
-        subtype = v.get("Sub_Type")
-        ctype = v.get("Sub_Type")
-        voucher_total = 0
-
-        attachments = v.get("Attachments", [])
-        if not attachments:
-            continue
+        })
 
-        for att in attachments:
+    if violations:
+        return {**violations[0], "violations": violations}
 
-            path = decode_base64_file(att.get("base64File"))
+    records = pd.DataFrame({
+        "Employee_Code": emp,
+        "Invoice_No": invoices,
+        "Date": dates,
+        "Total_Amount": amounts.astype(float),
+        "Claim_Type": ctype,
+        "Doc_ID": doc_id
+    }).to_dict("records")
 
-            # =====================================================
-            # DAILY EXPENSE → ONLY EXCEL
-            # =====================================================
-            if subtype == "Daily_Expense":
+    return {"records": records, "total": total_excel_amount}
 
-                if not path.endswith(".xlsx"):
-                    return {
-                        "status": "INVALID_ATTACHMENT",
-                        "message": "Daily_Expense requires Excel attachment"
-                    }
+# ================= ATTACHMENT SOURCE =================
+# uploaded parts are used straight from their (spooled) buffer;
+# base64 attachments are decoded into memory — nothing touches disk
+def load_attachment(att):
+    upload = att.get("upload")
+    if upload is not None:
+        return upload.buffer, upload.doc_id, upload.ext
+
+    buffer, doc_id = decode_base64_file(att.get("base64File"))
+    return buffer, doc_id, source_ext(buffer)
+
+# ================= ATTACHMENT WORKER =================
+# everything one attachment needs that does not depend on the others;
+# "reject" carries the response that fails the whole claim
+def prepare_attachment(att, v, emp, index, daily, cancelled=None):
+
+    subtype = v.get("Sub_Type")
+    ctype = v.get("Sub_Type")
+
+    path, doc_id, ext = load_attachment(att)
+    out = {"doc_id": doc_id, "records": [], "total": 0,
+           "candidates": [], "phash": None, "sig": None}
+
+    # same file bytes already claimed
+    if CLAIM_JOURNAL.contains("doc", doc_id):
+        return {**out, "reject": {"status": "DUPLICATE_CLAIM", "doc_id": doc_id}}
+
+    # =====================================================
+    # DAILY EXPENSE → ONLY EXCEL
+    # =====================================================
+    if subtype == "Daily_Expense":
+
+        if ext != ".xlsx":
+            return {**out, "reject": {
+                "status": "INVALID_ATTACHMENT",
+                "message": "Daily_Expense requires Excel attachment"
+            }}
+
+        result = process_daily_expense_excel(
+            path, emp, ctype, v, index, doc_id, daily
+        )
+
+        if "status" in result and result["status"] != "OK":
+            return {**out, "reject": result}
+
+        return {**out, "records": result["records"], "total": result["total"]}
+
+    # =====================================================
+    # INDIVIDUAL EXPENSE → PDF / IMAGE
+    # =====================================================
+    if subtype == "Individual_Expense":
+
+        if ext == ".xlsx":
+            return {**out, "reject": {
+                "status": "INVALID_ATTACHMENT",
+                "message": "Individual_Expense requires PDF or Image"
+            }}
+
+        # re-scanned / re-photographed bill → known before OCR; when
+        # flagged, confirmed on total / text in process_claim
+        phash, candidates = check_near_duplicate(path, doc_id)
+
+        if candidates and NEAR_DUP_ACTION == "defer":
+            return {**out, "reject": {
+                "status": "SUSPECTED_DUPLICATE",
+                "doc_id": doc_id,
+                "matched_doc_id": candidates[0]["doc_id"],
+                "distance": candidates[0]["distance"]
+            }}
+
+        budget = Budget(cancelled=cancelled)
+        text = extract_text(path, budget)
+
+        inv = extract_invoice(text)
+        date_text = extract_date_from_text(text)
+        invoice_date = normalize_date(date_text)
+        total = float(extract_total(text) or 0)
+
+        if check_duplicate(index, emp, inv, str(invoice_date), total):
+            return {**out, "reject": {
+                "status": "DUPLICATE_CLAIM",
+                "invoice_number": inv
+            }}
 
-                result = process_daily_expense_excel(
-                    path, emp, ctype, v, db_df
-                )
+        return {
+            **out,
+            "partial": budget.truncated,
+            "candidates": candidates,
+            "phash": phash,
+            "sig": minhash(text),
+            "total": total,
+            "records": [{
+                "Employee_Code": emp,
+                "Invoice_No": inv,
+                "Date": str(invoice_date),
+                "Total_Amount": total,
+                "Claim_Type": ctype,
+                "Doc_ID": doc_id
+            }]
+        }
 
-                if "status" in result and result["status"] != "OK":
-                    return result
+    return out
+
+# ================= BOUNDED FAN-OUT =================
+ATTACHMENT_WORKERS = int(os.environ.get("ATTACHMENT_WORKERS", "4"))
+
+def run_attachments(tasks, worker, cancelled=None):
+    """
+    Runs worker(*task, cancelled) on a bounded thread pool; results come
+    back in claim order. After a rejection at position i nothing after i
+    is started, OCR already running after i stops at its next budget
+    check (the per-claim event), and the list is cut at the earliest
+    rejection — the same one a sequential pass would have hit.
+    cancelled: optional callable (client gone), checked as well.
+    """
+    results = [None] * len(tasks)
+    first_reject = len(tasks)
+    rejected = threading.Event()
+
+    def stop_after(i):
+        # only attachments after the rejection are abandoned: an earlier
+        # one may still be the rejection to report
+        return lambda: (rejected.is_set() and i > first_reject) or \
+            bool(cancelled and cancelled())
+
+    pool = ThreadPoolExecutor(max_workers=ATTACHMENT_WORKERS)
+    try:
+        futures = {pool.submit(worker, *task, stop_after(i)): i
+                   for i, task in enumerate(tasks)}
 
-                all_records.extend(result["records"])
-                voucher_total += result["total"]
+        for fut in as_completed(futures):
+            if fut.cancelled():
                 continue
+            i = futures[fut]
+            if i > first_reject:
+                continue        # discarded; may have stopped with Cancelled
+            results[i] = fut.result()
 
-            # =====================================================
-            # INDIVIDUAL EXPENSE → PDF / IMAGE
-            # =====================================================
-            if subtype == "Individual_Expense":
-
-                if path.endswith(".xlsx"):
-                    return {
-                        "status": "INVALID_ATTACHMENT",
-                        "message": "Individual_Expense requires PDF or Image"
-                    }
+            if results[i].get("reject") and i < first_reject:
+                first_reject = i
+                rejected.set()
+                for other, j in futures.items():
+                    if j > i:
+                        other.cancel()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
 
-                text = extract_text_full(path)
+    return results[:first_reject + 1]
 
-                inv = extract_invoice(text)
-                date_text = extract_date_from_text(text)
-                invoice_date = normalize_date(date_text)
-                total = float(extract_total(text) or 0)
+def process_claim(data, cancelled=None):
 
-                if check_duplicate(db_df, emp, inv, str(invoice_date), total):
-                    return {
-                        "status": "DUPLICATE_CLAIM",
-                        "invoice_number": inv
-                    }
+    claim = data.get("Claim", {})
+    emp = claim.get("Employee_Code")
+    #ctype = claim.get("Claim_Type")
+    total_expected = float(claim.get("Total_Bill_Amount", 0))
 
-                voucher_total += total
+    vouchers = claim.get("Vouchers", [])
+    index = claim_index()
+    daily = daily_totals()
+
+    # decode + OCR + extraction fan out; checks below run in claim order
+    tasks = [
+        (att, v, emp, index, daily)
+        for v in vouchers
+        for att in v.get("Attachments", [])
+    ]
+    results = run_attachments(tasks, prepare_attachment, cancelled)
 
-                all_records.append({
-                    "Employee_Code": emp,
-                    "Invoice_No": inv,
-                    "Date": str(invoice_date),
-                    "Total_Amount": total,
-                    "Claim_Type": ctype
-                })
+    grand_total = 0
+    all_records = []
+    seen_docs = set()
+    page_hashes = []
+    text_sigs = []
+    lsh_conn = connect_lsh()
+    suspected = []
+    partial = []
 
-        grand_total += voucher_total
+    try:
+        for res in results:
+
+            doc_id = res["doc_id"]
+
+            # same file attached twice in this claim
+            if doc_id in seen_docs:
+                return {
+                    "status": "DUPLICATE_CLAIM",
+                    "doc_id": doc_id
+                }
+            seen_docs.add(doc_id)
+
+            if res.get("reject"):
+                return res["reject"]
+
+            if res.get("partial"):
+                partial.append({"doc_id": doc_id, "reason": res["partial"]})
+            if res["phash"] is not None:
+                page_hashes.append((doc_id, res["phash"], res.get("total")))
+
+            # OCR noise in the invoice number defeats the exact duplicate check
+            similar_ids = set()
+            if res["sig"] is not None:
+                for match_id, jaccard in query(lsh_conn, res["sig"], exclude=doc_id):
+                    similar_ids.add(match_id)
+                    suspected.append({
+                        "doc_id": doc_id,
+                        "matched_doc_id": match_id,
+                        "jaccard": jaccard
+                    })
+                text_sigs.append((doc_id, res["sig"]))
+
+            # same page layout AND same total / text → likely a re-scan
+            near = confirm_near_duplicate(res["candidates"], res.get("total"), similar_ids)
+            if near:
+                suspected.append({"doc_id": doc_id, "matched_doc_id": near["doc_id"],
+                                  "confirmed_by": near["confirmed_by"]})
+
+            all_records.extend(res["records"])
+            grand_total += res["total"]
+
+        # final claim validation
+        if grand_total > total_expected:
+            return {
+                "status": "CLAIM_TOTAL_MISMATCH",
+                "total_attachments_amount": grand_total
+            }
 
-    # final claim validation
-    if grand_total > total_expected:
-        return {
-            "status": "CLAIM_TOTAL_MISMATCH",
-            "total_attachments_amount": grand_total
-        }
+        duplicate = insert_into_excel(all_records)
+        if duplicate:
+            return duplicate
 
-    insert_into_excel(all_records)
+        for doc_id, phash, total in page_hashes:
+            PAGE_INDEX.add(doc_id, phash, total)
+        for doc_id, sig in text_sigs:
+            add_document(lsh_conn, doc_id, sig)
+    finally:
+        lsh_conn.close()
 
-    return {
+    response = {
         "status": "NEW_CLAIM",
         "records_saved": len(all_records),
-        "total_amount": grand_total
+        "total_amount": grand_total,
+        "suspected_duplicates": suspected
     }
+    # attachments whose text was cut at the page / time budget
+    if partial:
+        response["partial_attachments"] = partial
+    return response
+
+# runs inside a job_queue worker process
+def run_claim_job(data):
+    CLAIM_WRITER.start()
+    return process_claim(data)
 
 # ================= FLASK API =================
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+
+JOB_POOL = ConnectionPool(connect_jobs)
+
+# a claim sent with an Idempotency-Key is finished even if the client
+# hangs up: its retry picks up the stored result (idempotency.py)
+def request_cancelled():
+    if idempotency_key():
+        return None
+    return disconnect_probe(request.environ)
 
 @app.route("/process-claim", methods=["POST"])
+@idempotent
+@admitted
 def api():
     try:
-        return jsonify(process_claim(request.get_json()))
+        return jsonify(process_claim(request.get_json(), request_cancelled()))
+    except Cancelled:
+        return jsonify({"status": "CANCELLED"}), 499
     except Exception as e:
         return jsonify({"status": "ERROR", "message": str(e)})
 
+# ================= BINARY UPLOAD =================
+# multipart/form-data: field "claim" holds the same JSON as /process-claim,
+# with attachments naming their file part ({"file": "<field>"}) instead
+# of carrying base64File; parts are processed from memory
+# raw body (one PDF / image): the claim JSON comes in the X-Claim header
+# or the "claim" query parameter, the attachment names {"file": "file"}
+def upload_claim_json():
+    if (request.mimetype or "").startswith("multipart/"):
+        return request.form.get("claim") or ""
+    return request.headers.get("X-Claim") or request.args.get("claim") or ""
+
+@app.route("/process-claim/upload", methods=["POST"])
+def upload_api():
+    try:
+        uploads = request_uploads(request)
+    except (UploadTooLarge, RequestEntityTooLarge) as e:
+        return jsonify({"status": "ERROR", "message": str(e)}), 413
+
+    try:
+        claim_json = upload_claim_json()
+        if not claim_json:
+            return jsonify({"status": "ERROR", "message": "claim JSON is required"}), 400
+
+        # same claim JSON + same files (doc IDs, hashed while spooling)
+        digest = payload_digest(
+            claim_json,
+            *sorted(f"{field}={upload.doc_id}" for field, upload in uploads.items())
+        )
+        return run_idempotent(digest, lambda: process_upload(claim_json, uploads))
+    finally:
+        close_uploads(uploads)
+
+@admitted
+def process_upload(claim_json, uploads):
+    try:
+        data = json.loads(claim_json)
+        used = set()
+
+        for v in data.get("Claim", {}).get("Vouchers", []):
+            for att in v.get("Attachments", []):
+                field = att.get("file")
+                if field is None:
+                    continue
+                if field not in uploads:
+                    return jsonify({"status": "ERROR", "message": f"file part '{field}' missing"}), 400
+                # same file attached twice in this claim
+                if field in used:
+                    return jsonify({"status": "DUPLICATE_CLAIM", "doc_id": uploads[field].doc_id})
+                used.add(field)
+                att["upload"] = uploads[field]
+
+        return jsonify(process_claim(data, request_cancelled()))
+    except Cancelled:
+        return jsonify({"status": "CANCELLED"}), 499
+    except Exception as e:
+        return jsonify({"status": "ERROR", "message": str(e)})
+
+# ================= ASYNC JOBS =================
+# POST enqueues and returns 202 + job id; a worker pool runs the pipeline
+# job cost = sum of its attachments' estimates (shortest jobs run first),
+# each sized from its base64 length (4 characters → 3 bytes): nothing
+# is decoded at enqueue time
+def estimate_claim(data):
+    cost = 0.0
+    for v in data.get("Claim", {}).get("Vouchers", []):
+        for att in v.get("Attachments", []):
+            encoded = att.get("base64File")
+            if encoded:
+                encoded = encoded.rpartition("base64,")[2]
+                cost += estimate_size(len(encoded) * 3 // 4)
+    return cost
+
+@app.route("/jobs/process-claim", methods=["POST"])
+@idempotent
+def enqueue_claim_api():
+    data = request.get_json()
+    try:
+        cost = estimate_claim(data)
+    except Exception:
+        cost = 1.0      # undecodable: the job itself reports the error
+
+    with JOB_POOL.connection() as conn:
+        job_id = enqueue(conn, "claim", data, cost, size_class(cost))
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status_api(job_id):
+    with JOB_POOL.connection() as conn:
+        job = get_job(conn, job_id)
+    if job is None:
+        return jsonify({"status": "ERROR", "message": "job not found"}), 404
+    return jsonify(job_view(job))
+
+@app.route("/jobs/stats", methods=["GET"])
+def job_stats_api():
+    with JOB_POOL.connection() as conn:
+        return jsonify(queue_stats(conn))
+
+# OCR scheduler / admission of this server process (per gunicorn worker)
+@app.route("/ocr/stats", methods=["GET"])
+def ocr_stats_api():
+    return jsonify({"scheduler": SCHEDULER.stats(), "admission": ADMISSION.stats()})
+
+# ================= SERVER LIFECYCLE =================
+# warm_state runs once per server (in the gunicorn master before fork,
+# see serving.py); start_background in every worker process
+def warm_state():
+    CLAIM_JOURNAL.refresh()   # load ledger + indexes before the first request
+
+def start_background():
+    CLAIM_WRITER.start()
+
 if __name__ == "__main__":
+    # debug=True: the reloader runs this file again in a child
+    # (WERKZEUG_RUN_MAIN set) and only that child serves
+    if os.environ.get("WERKZEUG_RUN_MAIN"):
+        # fork the job workers before this process has any thread
+        WorkerPool(["claim"]).start()
+        warm_state()
+        start_background()
     app.run(debug=True)
@@ -0,0 +1,88 @@
+import pandas as pd
+
+
+DAILY_LIMIT = 200
+
+
+# -------------------------------------------------------------
+# (employee, day) → running total of everything already claimed
+#   kept next to the ledger (a ClaimJournal index, or built once
+#   from the database workbook) so a limit check is a dict lookup
+#   instead of re-aggregating the ledger.
+# -------------------------------------------------------------
+def day_key(date):
+    if date is None or pd.isna(date):
+        return None
+    if hasattr(date, "strftime"):
+        return date.strftime("%Y-%m-%d")
+    return str(date).strip()
+
+
+def employee_key(emp):
+    return str(emp).strip()
+
+
+class DailyTotalIndex:
+
+    def __init__(self, employee_col="Employee_Code", date_col="Date",
+                 amount_col="Total_Amount"):
+        self.columns = (employee_col, date_col, amount_col)
+        self._totals = {}
+
+    def clear(self):
+        self._totals = {}
+
+    def add(self, emp, date, amt):
+        day = day_key(date)
+        amt = pd.to_numeric(amt, errors="coerce")
+        if day is None or pd.isna(amt):
+            return
+        key = (employee_key(emp), day)
+        self._totals[key] = self._totals.get(key, 0.0) + float(amt)
+
+    def add_row(self, row):
+        emp, date, amt = (row.get(c) for c in self.columns)
+        self.add(emp, date, amt)
+
+    def add_frame(self, df, employee_col, date_col, amount_col):
+        # workbook dates mix real dates with dd/mm/yyyy text
+        dates = pd.to_datetime(df[date_col], errors="coerce", dayfirst=True, format="mixed")
+        amounts = pd.to_numeric(df[amount_col], errors="coerce")
+        for emp, date, amt in zip(df[employee_col], dates, amounts):
+            self.add(emp, date, amt)
+
+    def total(self, emp, date):
+        return self._totals.get((employee_key(emp), day_key(date)), 0.0)
+
+    def __len__(self):
+        return len(self._totals)
+
+
+# -------------------------------------------------------------
+# SHARED LIMIT RULE (claim_service Daily_Expense + valiex)
+#   a row breaks the limit when its own amount does, or when the
+#   employee's day total — history plus this upload — does.
+# -------------------------------------------------------------
+def daily_limit_check(employees, dates, amounts, limit=DAILY_LIMIT, history=None):
+    """
+    Aligned Series in → (exceeded mask, day total per row).
+    dates should already be parsed (date / Timestamp / ISO string).
+    """
+    amounts = pd.to_numeric(amounts, errors="coerce").fillna(0)
+    emps = employees.map(employee_key)
+    days = dates.map(day_key)
+
+    uploaded = amounts.groupby([emps, days], dropna=False).transform("sum")
+
+    if history is not None and len(history):
+        previous = pd.Series(
+            [history.total(e, d) for e, d in zip(emps, days)],
+            index=amounts.index
+        )
+    else:
+        previous = 0.0
+
+    day_total = uploaded + previous
+    exceeded = (amounts > limit) | (day_total > limit)
+
+    return exceeded, day_total
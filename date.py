@@ -5,6 +5,8 @@ from PIL import Image
 import re
 import os
 
+from doc_source import source_ext, open_source, LazyPath
+
 # -----------------------------------------------------------
 # TESSERACT PATH
 pytesseract.pytesseract.tesseract_cmd = r"C:\Users\VikasTiwari\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
@@ -46,46 +48,49 @@ date_patterns = [
 # ----------------------------
 def extract_text_full(filepath):
 
-    ext = filepath.lower().split(".")[-1]
+    ext = source_ext(filepath)
 
     # -------------------- PDF --------------------
-    if ext == "pdf":
-        try:
-            pdf = pdfplumber.open(filepath)
-            full_text = ""
-
-            for pg in pdf.pages:
-                txt = pg.extract_text()
-
-                if txt and txt.strip():
-                    full_text += "\n" + txt
-                else:
-                    # OCR for scanned pages
-                    images = convert_from_path(
-                        filepath,
-                        first_page=pg.page_number,
-                        last_page=pg.page_number,
-                        poppler_path=POPLER_PATH
-                    )
-                    for img in images:
-                        img = img.rotate(-90, expand=True)
-                        full_text += pytesseract.image_to_string(img)
-
-            pdf.close()
-            return full_text
-
-        except Exception:
-            # FULL fallback OCR for entire PDF
-            images = convert_from_path(filepath, poppler_path=POPLER_PATH)
-            text_all = ""
-            for img in images:
-                img = img.rotate(-90, expand=True)
-                text_all += pytesseract.image_to_string(img)
-            return text_all
+    if ext == ".pdf":
+        # poppler needs a file: one temp copy per document, made for the
+        # first scanned page
+        with LazyPath(filepath) as workspace:
+            try:
+                pdf = pdfplumber.open(open_source(filepath))
+                full_text = ""
+
+                for pg in pdf.pages:
+                    txt = pg.extract_text()
+
+                    if txt and txt.strip():
+                        full_text += "\n" + txt
+                    else:
+                        # OCR for scanned pages
+                        images = convert_from_path(
+                            workspace.path(),
+                            first_page=pg.page_number,
+                            last_page=pg.page_number,
+                            poppler_path=POPLER_PATH
+                        )
+                        for img in images:
+                            img = img.rotate(-90, expand=True)
+                            full_text += pytesseract.image_to_string(img)
+
+                pdf.close()
+                return full_text
+
+            except Exception:
+                # FULL fallback OCR for entire PDF
+                images = convert_from_path(workspace.path(), poppler_path=POPLER_PATH)
+                text_all = ""
+                for img in images:
+                    img = img.rotate(-90, expand=True)
+                    text_all += pytesseract.image_to_string(img)
+                return text_all
 
     # -------------------- IMAGE --------------------
     else:
-        img = Image.open(filepath)
+        img = Image.open(open_source(filepath))
         img = img.rotate(-90, expand=True)
         return pytesseract.image_to_string(img)
 
@@ -0,0 +1,171 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager, ExitStack
+
+
+# -------------------------------------------------------------
+# DOCUMENT SOURCES
+#   extraction functions accept any of:
+#     - a file path (str / PathLike)
+#     - bytes / bytearray / memoryview
+#     - a seekable binary file object (BytesIO, SpooledTemporaryFile)
+#   so uploads can be processed straight from memory.
+# -------------------------------------------------------------
+def is_path(src):
+    return isinstance(src, (str, os.PathLike))
+
+
+def sniff_ext(head):
+    if head.startswith(b"%PDF"):
+        return ".pdf"
+    if head[:2] == b"PK":
+        return ".xlsx"
+    if head.startswith(b"\x89PNG"):
+        return ".png"
+    return ".jpg"
+
+
+def source_ext(src):
+    """Lower-case extension: from the name for paths, from magic bytes otherwise."""
+    if is_path(src):
+        return os.path.splitext(str(src))[1].lower()
+
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return sniff_ext(bytes(src[:8]))
+
+    pos = src.tell()
+    src.seek(0)
+    head = src.read(8)
+    src.seek(pos)
+    return sniff_ext(head)
+
+
+def open_source(src):
+    """Something pdfplumber / PIL / openpyxl can open (rewound file or path)."""
+    if is_path(src):
+        return src
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return io.BytesIO(src)
+    src.seek(0)
+    return src
+
+
+def source_bytes(src):
+    """Whole document as a bytes-like object (for PyMuPDF / pdf2image)."""
+    if is_path(src):
+        with open(src, "rb") as f:
+            return f.read()
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return src
+    if isinstance(src, io.BytesIO):
+        return src.getbuffer()      # no copy
+    src.seek(0)
+    return src.read()
+
+
+# -------------------------------------------------------------
+# SCOPED TEMP WORKSPACE
+#   for the few tools that only take a path (poppler via pdf2image).
+#   Files go to tmpfs (/dev/shm) when available, count against a
+#   process-wide quota, and the directory is removed on exit even
+#   if extraction raises.
+# -------------------------------------------------------------
+TEMP_ROOT = os.environ.get("DOC_TEMP_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else None)
+TEMP_QUOTA_BYTES = int(os.environ.get("DOC_TEMP_QUOTA_BYTES", 256 << 20))
+
+_temp_used = 0
+_temp_lock = threading.Lock()
+
+
+class TempQuotaExceeded(Exception):
+    pass
+
+
+def _reserve(size, quota):
+    global _temp_used
+    with _temp_lock:
+        if _temp_used + size > quota:
+            raise TempQuotaExceeded(
+                f"temp workspace full ({_temp_used} + {size} > {quota} bytes)"
+            )
+        _temp_used += size
+
+
+def _release(size):
+    global _temp_used
+    with _temp_lock:
+        _temp_used -= size
+
+
+def temp_usage():
+    return _temp_used
+
+
+class TempWorkspace:
+
+    def __init__(self, root=TEMP_ROOT, quota=TEMP_QUOTA_BYTES):
+        self.dir = tempfile.mkdtemp(prefix="doc-", dir=root)
+        self.quota = quota
+        self.reserved = 0
+
+    def write(self, src, suffix=""):
+        """Copies a document source into the workspace → path."""
+        data = source_bytes(src)
+        _reserve(len(data), self.quota)
+        self.reserved += len(data)
+
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return path
+
+    def cleanup(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+        _release(self.reserved)
+        self.reserved = 0
+
+
+@contextmanager
+def temp_workspace(root=TEMP_ROOT, quota=TEMP_QUOTA_BYTES):
+    ws = TempWorkspace(root, quota)
+    try:
+        yield ws
+    finally:
+        ws.cleanup()
+
+
+@contextmanager
+def as_path(src):
+    """A path for src: itself if it already is one, else a scoped temp copy."""
+    if is_path(src):
+        yield src
+        return
+    with temp_workspace() as ws:
+        yield ws.write(src, source_ext(src))
+
+
+class LazyPath:
+    """
+    as_path for one document, taken on first use and kept until the
+    with block ends: a text-layer PDF never needs a file, a scanned one
+    gets a single temp copy for all of its pages.
+    """
+
+    def __init__(self, src):
+        self.src = src
+        self._stack = ExitStack()
+        self._path = None
+
+    def path(self):
+        if self._path is None:
+            self._path = self._stack.enter_context(as_path(self.src))
+        return self._path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._stack.close()
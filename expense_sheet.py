@@ -0,0 +1,52 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+
+# -------------------------------------------------------------
+# STREAMING SHEET READER
+#   read-only openpyxl walks the sheet XML row by row instead of
+#   building the whole workbook; only the wanted columns are kept.
+# -------------------------------------------------------------
+def read_sheet_columns(path, columns, sheet=None):
+    """
+    Returns (DataFrame with `columns`, missing column names).
+    The DataFrame index is the Excel row number (header = row 1).
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.active
+        rows = ws.iter_rows(values_only=True)
+
+        header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        missing = [c for c in columns if c not in header]
+        if missing:
+            return None, missing
+
+        pos = [header.index(c) for c in columns]
+        data = []
+        excel_rows = []
+
+        for n, row in enumerate(rows, start=2):
+            values = [row[i] if i < len(row) else None for i in pos]
+            if all(v is None or v == "" for v in values):
+                continue    # blank / formatted-only rows
+            data.append(values)
+            excel_rows.append(n)
+    finally:
+        wb.close()
+
+    return pd.DataFrame(data, columns=columns, index=excel_rows), []
+
+
+# -------------------------------------------------------------
+# COLUMN PARSING (each distinct value parsed once)
+# -------------------------------------------------------------
+def parse_date_column(values, parse):
+    """parse: the scalar normalizer (e.g. claim_service.normalize_date)."""
+    uniq = pd.unique(values.astype(str))
+    lookup = {u: parse(u) for u in uniq}
+    return values.astype(str).map(lookup)
+
+
+def parse_amount_column(values):
+    return pd.to_numeric(values, errors="coerce")
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from doc_hash import hash_file
+from daily_limits import DailyTotalIndex, day_key, employee_key
+from validation_report import write_validation_report
+
+
+STORE_DIR = "expense_store"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    upload_id    TEXT PRIMARY KEY,
+    file_name    TEXT,
+    rows         INTEGER,
+    uploaded_by  TEXT,
+    ingested_at  TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS ingested_rows (
+    employee    TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    amount      REAL NOT NULL,
+    upload_id   TEXT NOT NULL,
+    occurrence  INTEGER NOT NULL,
+    PRIMARY KEY (upload_id, employee, day, amount, occurrence)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS ix_ingested_employee_day
+    ON ingested_rows (employee, day);
+
+CREATE TABLE IF NOT EXISTS partitions (
+    path       TEXT PRIMARY KEY,
+    upload_id  TEXT NOT NULL,
+    rows       INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# -------------------------------------------------------------
+# EXPENSE STORE
+#   <STORE_DIR>/month=YYYY-MM/<upload>-<n>.parquet holds the rows;
+#   <STORE_DIR>/ingested.db indexes every ingested row by
+#   (employee, day, amount, upload id) and lists the partitions.
+#   The consolidated workbook is only a regenerated view.
+# -------------------------------------------------------------
+def connect_store(store_dir=STORE_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(store_dir, "ingested.db"), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _store_dir(conn):
+    # partitions live next to the index database
+    return os.path.dirname(conn.execute("PRAGMA database_list").fetchone()[2])
+
+
+def _meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(conn, key, value):
+    conn.execute(
+        "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, str(value))
+    )
+
+
+def upload_id_for(path):
+    # same file uploaded twice → same id → every row already ingested
+    return hash_file(path).doc_id
+
+
+# -------------------------------------------------------------
+# ROW KEYS + DEDUP
+# -------------------------------------------------------------
+def row_keys(df, employee_col, date_col, amount_col, upload_id):
+    keys = pd.DataFrame({
+        "employee": df[employee_col].map(employee_key),
+        "day": df[date_col].map(day_key).fillna(""),
+        "amount": pd.to_numeric(df[amount_col], errors="coerce").fillna(0).astype(float),
+    }, index=df.index)
+    keys["upload_id"] = upload_id
+    # identical rows inside one sheet are separate claims
+    keys["occurrence"] = keys.groupby(["employee", "day", "amount"]).cumcount()
+    return keys
+
+
+def new_rows_mask(conn, keys, upload_id):
+    """True for rows not yet ingested (a retried or repeated upload is skipped)."""
+    seen = set(conn.execute(
+        "SELECT employee, day, amount, occurrence FROM ingested_rows WHERE upload_id = ?",
+        (upload_id,)
+    ).fetchall())
+    if not seen:
+        return pd.Series(True, index=keys.index)
+    return pd.Series(
+        [k not in seen for k in zip(keys["employee"], keys["day"],
+                                    keys["amount"], keys["occurrence"])],
+        index=keys.index
+    )
+
+
+def load_daily_totals(conn):
+    history = DailyTotalIndex()
+    for emp, day, total in conn.execute(
+        "SELECT employee, day, SUM(amount) FROM ingested_rows "
+        "WHERE day != '' GROUP BY employee, day"
+    ):
+        history.add(emp, day, total)
+    return history
+
+
+# -------------------------------------------------------------
+# APPEND (new partition files only; nothing is rewritten)
+# -------------------------------------------------------------
+def _parquet_safe(df):
+    out = df.copy()
+    for col in out.columns:
+        if out[col].dtype == object:
+            kind = pd.api.types.infer_dtype(out[col], skipna=True)
+            if kind not in ("string", "empty"):
+                # workbook columns mix text, numbers and dates
+                out[col] = out[col].map(lambda v: None if pd.isna(v) else str(v))
+    out.columns = [str(c) for c in out.columns]
+    return out
+
+
+def ingest(conn, df, keys, upload_id, file_name=None, uploaded_by=None):
+    if df.empty:
+        return 0
+
+    store_dir = _store_dir(conn)
+    months = keys["day"].str[:7].replace("", "undated")
+    written = []
+
+    for month, part in df.groupby(months):
+        n = conn.execute(
+            "SELECT COUNT(*) FROM partitions WHERE upload_id = ?", (upload_id,)
+        ).fetchone()[0] + len(written)
+
+        rel_path = os.path.join(f"month={month}", f"{upload_id}-{n}.parquet")
+        path = os.path.join(store_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp = path + ".tmp"
+        _parquet_safe(part).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        written.append((rel_path, upload_id, len(part)))
+
+    # files first, index second: an interrupted ingest leaves only
+    # unlisted files, which regeneration ignores
+    with conn:
+        conn.executemany(
+            "INSERT INTO partitions (path, upload_id, rows) VALUES (?, ?, ?)", written
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO ingested_rows "
+            "(employee, day, amount, upload_id, occurrence) VALUES (?, ?, ?, ?, ?)",
+            keys[["employee", "day", "amount", "upload_id", "occurrence"]]
+            .itertuples(index=False, name=None)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO uploads (upload_id, file_name, rows, uploaded_by) "
+            "VALUES (?, ?, COALESCE((SELECT rows FROM uploads WHERE upload_id = ?), 0) + ?, ?)",
+            (upload_id, file_name, upload_id, len(df), uploaded_by)
+        )
+        _set_meta(conn, "generation", int(_meta(conn, "generation", 0)) + 1)
+
+    return len(df)
+
+
+# -------------------------------------------------------------
+# ONE-SHOT IMPORT OF AN EXISTING DATABASE WORKBOOK
+# -------------------------------------------------------------
+def import_workbook(conn, workbook, employee_col, date_col, amount_col):
+
+    marker = "imported:" + os.path.abspath(workbook)
+    if _meta(conn, marker) or not os.path.exists(workbook):
+        return 0
+
+    old_df = pd.read_excel(workbook)
+    old_df.columns = old_df.columns.str.strip()
+
+    added = 0
+    if {employee_col, date_col, amount_col} <= set(old_df.columns):
+        dates = pd.to_datetime(old_df[date_col], errors="coerce", dayfirst=True, format="mixed")
+        upload_id = "legacy-" + upload_id_for(workbook)
+        keys = row_keys(old_df.assign(**{date_col: dates}),
+                        employee_col, date_col, amount_col, upload_id)
+        added = ingest(conn, old_df, keys, upload_id, os.path.basename(workbook))
+
+    with conn:
+        _set_meta(conn, marker, 1)
+        # the workbook already shows these rows
+        _set_meta(conn, "exported_generation", _meta(conn, "generation", 0))
+
+    print(f"📥 Imported {added} rows from {workbook} into {_store_dir(conn)}")
+    return added
+
+
+# -------------------------------------------------------------
+# LAZY WORKBOOK REGENERATION
+# -------------------------------------------------------------
+def workbook_is_stale(conn, workbook):
+    return (
+        not os.path.exists(workbook)
+        or _meta(conn, "generation", "0") != _meta(conn, "exported_generation")
+    )
+
+
+def export_workbook(conn, workbook, force=False):
+    if not force and not workbook_is_stale(conn, workbook):
+        print(f"✅ {workbook} is up to date")
+        return False
+
+    generation = _meta(conn, "generation", "0")
+    paths = [p for (p,) in conn.execute("SELECT path FROM partitions ORDER BY rowid")]
+
+    frames = [pd.read_parquet(os.path.join(_store_dir(conn), p)) for p in paths]
+    final_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    write_validation_report(final_df, workbook)
+
+    with conn:
+        _set_meta(conn, "exported_generation", generation)
+
+    print(f"💾 Regenerated {workbook} ({len(final_df)} rows)")
+    return True
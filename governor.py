@@ -0,0 +1,214 @@
+import os
+import math
+import time
+import socket
+import threading
+import functools
+from contextlib import contextmanager
+
+from flask import jsonify
+
+
+# per server process (each gunicorn worker has its own governor)
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# requests admitted at once: more than OCR_WORKERS, so the scheduler
+# (scheduler.py) has short jobs to pick from while a long one runs
+OCR_CONCURRENCY = int(os.environ.get("OCR_CONCURRENCY", OCR_WORKERS * 2))
+OCR_QUEUE = int(os.environ.get("OCR_QUEUE", OCR_CONCURRENCY * 2))
+QUEUE_TIMEOUT = float(os.environ.get("OCR_QUEUE_TIMEOUT", "30"))
+
+# per document
+MAX_PAGES = int(os.environ.get("OCR_MAX_PAGES", "20"))
+DOC_TIME_BUDGET = float(os.environ.get("OCR_TIME_BUDGET", "60"))
+MAX_PIXELS = int(os.environ.get("OCR_MAX_PIXELS", 12_000_000))   # ~A4 at 300 dpi
+RASTER_DPI = 200                                                  # pdf2image default
+
+DISCONNECT_POLL = 0.5
+
+
+class Overloaded(Exception):
+    pass
+
+
+class Cancelled(Exception):
+    pass
+
+
+# -------------------------------------------------------------
+# ADMISSION CONTROL
+#   at most OCR_CONCURRENCY OCR requests run at once; up to OCR_QUEUE
+#   more wait (max QUEUE_TIMEOUT s). Anything beyond is refused with
+#   429 + Retry-After instead of piling onto CPU and memory.
+# -------------------------------------------------------------
+class Admission:
+
+    def __init__(self, concurrency=OCR_CONCURRENCY, queue=OCR_QUEUE, timeout=QUEUE_TIMEOUT):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._cond = threading.Condition()
+
+    def enter(self):
+        with self._cond:
+            if self.active >= self.concurrency and self.waiting >= self.queue:
+                self.rejected += 1
+                raise Overloaded("OCR queue is full")
+
+            self.waiting += 1
+            try:
+                admitted = self._cond.wait_for(
+                    lambda: self.active < self.concurrency, timeout=self.timeout
+                )
+            finally:
+                self.waiting -= 1
+
+            if not admitted:
+                self.rejected += 1
+                raise Overloaded("timed out waiting for an OCR slot")
+            self.active += 1
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.enter()
+        try:
+            yield
+        finally:
+            self.leave()
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting, "rejected": self.rejected,
+                "concurrency": self.concurrency, "queue": self.queue}
+
+
+ADMISSION = Admission()
+
+
+def overloaded_response(e):
+    response = jsonify({"status": "OVERLOADED", "message": str(e)})
+    response.headers["Retry-After"] = str(max(1, int(QUEUE_TIMEOUT // 2)))
+    return response, 429
+
+
+def admitted(view):
+    """Route decorator: the view runs holding an OCR slot, or gets 429."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            ADMISSION.enter()
+        except Overloaded as e:
+            return overloaded_response(e)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            ADMISSION.leave()
+    return wrapper
+
+
+# -------------------------------------------------------------
+# CLIENT DISCONNECT
+#   the request body has been read by the time OCR starts, so a
+#   zero-byte peek on the client socket means the client hung up.
+# -------------------------------------------------------------
+def disconnect_probe(environ):
+    """Returns a cancelled() callable for this request (never True if unknown)."""
+    sock = environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+    if sock is None:
+        return lambda: False
+
+    state = {"checked": 0.0, "gone": False}
+
+    def cancelled():
+        now = time.monotonic()
+        if state["gone"] or now - state["checked"] < DISCONNECT_POLL:
+            return state["gone"]
+        state["checked"] = now
+        try:
+            state["gone"] = sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            state["gone"] = True
+        return state["gone"]
+
+    return cancelled
+
+
+# -------------------------------------------------------------
+# PER-DOCUMENT BUDGET
+#   extraction asks before every page / OCR pass. When pages or time
+#   run out it stops and records why (partial result); a disconnected
+#   client raises Cancelled. The clock starts at the first check, i.e.
+#   when the document's first task runs: time spent queued in the
+#   scheduler does not count.
+# -------------------------------------------------------------
+class Budget:
+
+    def __init__(self, max_pages=MAX_PAGES, seconds=DOC_TIME_BUDGET, cancelled=None):
+        self.max_pages = max_pages
+        self.seconds = seconds
+        self.deadline = None
+        self.cancelled = cancelled or (lambda: False)
+        self.pages = 0
+        self.truncated = None       # reason, once the document was cut short
+        self._mutex = threading.Lock()  # pages of one document may run in parallel
+
+    def remaining(self):
+        if self.deadline is None:
+            with self._mutex:
+                if self.deadline is None:
+                    self.deadline = time.monotonic() + self.seconds
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """False once the time budget is spent; raises if the client left."""
+        if self.cancelled():
+            raise Cancelled("client disconnected")
+        if self.remaining() <= 0:
+            self.truncated = self.truncated or "time_budget"
+            return False
+        return True
+
+    def take_page(self):
+        if not self.check():
+            return False
+        with self._mutex:
+            if self.pages >= self.max_pages:
+                self.truncated = self.truncated or "page_limit"
+                return False
+            self.pages += 1
+        return True
+
+    def timeout(self):
+        # for subprocess-backed calls (tesseract, poppler)
+        return max(1, math.ceil(self.remaining()))
+
+
+# -------------------------------------------------------------
+# PIXEL LIMITS
+# -------------------------------------------------------------
+def page_dpi(width_pt, height_pt, max_pixels=MAX_PIXELS, dpi=RASTER_DPI):
+    """Raster dpi for a PDF page (size in points) that stays under max_pixels."""
+    inches = (width_pt / 72) * (height_pt / 72)
+    if inches <= 0:
+        return dpi
+    return max(36, min(dpi, int(math.sqrt(max_pixels / inches))))
+
+
+def limit_pixels(img, max_pixels=MAX_PIXELS):
+    w, h = img.size
+    if w * h <= max_pixels:
+        return img
+    scale = math.sqrt(max_pixels / (w * h))
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    img.draft(img.mode, size)       # JPEG: decode at reduced size
+    if img.size[0] * img.size[1] > max_pixels:
+        img = img.resize(size)
+    return img
@@ -0,0 +1,53 @@
+import os
+import multiprocessing
+
+import serving
+
+
+# -------------------------------------------------------------
+# PRODUCTION SERVER
+#   python serving.py claim      (or: gunicorn -c gunicorn.conf.py claim_service:app)
+#   python serving.py invoice    (or: ... -b 0.0.0.0:5001 invoice_api:app)
+#
+#   preload_app: the app, OCR weights and indexes are loaded once in
+#   the master, then WEB_WORKERS processes are forked and share them
+#   copy-on-write.
+#
+#   graceful restart (same code): kill -HUP <master>
+#     new workers are forked from the preloaded master, old ones
+#     finish their requests (graceful_timeout) and exit
+#   code upgrade: kill -USR2 <master>, then -WINCH / -TERM the old master
+#
+#   async jobs run in their own pool: python job_queue.py claim invoice
+# -------------------------------------------------------------
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_WORKERS", max(2, multiprocessing.cpu_count() // 2)))
+
+# threads keep a worker responsive while one request streams a batch
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", "4"))
+
+preload_app = True
+
+timeout = int(os.environ.get("WEB_TIMEOUT", "300"))     # a long scanned PDF
+graceful_timeout = 120
+keepalive = 5
+
+# recycle workers now and then (fragmentation); forks are cheap after preload
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+
+
+def _module(server):
+    return server.app.app_uri.split(":")[0]
+
+
+def on_starting(server):
+    # runs in the master after the app was imported (preload_app)
+    serving.preload(_module(server))
+
+
+def post_fork(server, worker):
+    serving.post_fork(_module(server), server.cfg.workers)
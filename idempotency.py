@@ -0,0 +1,253 @@
+import os
+import time
+import socket
+import sqlite3
+import hashlib
+import threading
+import functools
+
+from flask import request, jsonify, make_response, Response
+
+from job_queue import worker_alive
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_DB = os.environ.get("IDEMPOTENCY_DB", "idempotency.db")
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", 24 * 3600))     # stored results kept for
+IDEMPOTENCY_WAIT = int(os.environ.get("IDEMPOTENCY_WAIT", "300"))       # a retry waits for the first
+IDEMPOTENCY_LEASE = int(os.environ.get("IDEMPOTENCY_LEASE", "900"))     # "running" older than this is abandoned
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.2
+PURGE_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key          TEXT PRIMARY KEY,
+    digest       TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'running',
+    owner        TEXT,
+    code         INTEGER,
+    mimetype     TEXT,
+    body         BLOB,
+    started_at   REAL NOT NULL,
+    finished_at  REAL
+);
+
+CREATE INDEX IF NOT EXISTS ix_idempotency_finished
+    ON idempotency (finished_at);
+"""
+
+
+def connect_idempotency(db_path=IDEMPOTENCY_DB):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def payload_digest(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+# -------------------------------------------------------------
+# IDEMPOTENCY STORE (SQLite, shared by every server process)
+#   the first request with a key inserts a "running" row and computes;
+#   requests with the same key wait for it (an in-process event, or
+#   polling when the owner is another worker) and then replay the
+#   stored response. A key sent again with a different payload is
+#   refused. Failed / unfinished results are not kept, so a retry
+#   after an error starts over.
+# -------------------------------------------------------------
+class IdempotencyStore:
+
+    def __init__(self, db_path=IDEMPOTENCY_DB):
+        self.db_path = db_path
+        self.replayed = 0
+        self._local = threading.local()
+        self._inflight = {}         # key → Event, computations in this process
+        self._mutex = threading.Lock()
+        self._purged = 0.0
+
+    @property
+    def conn(self):
+        # one connection per thread; the owner name is per process (fork)
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.conn = connect_idempotency(self.db_path)
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _owner(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # ---------------------------------------------------------
+    # CLAIM / FINISH
+    # ---------------------------------------------------------
+    def _claim(self, key, digest):
+        """True if this request now owns the key, else the existing row."""
+        now = time.time()
+        conn = self.conn
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM idempotency WHERE key = ?", (key,)).fetchone()
+
+            expired = row is not None and row["status"] == "done" and \
+                row["finished_at"] < now - IDEMPOTENCY_TTL
+            abandoned = row is not None and row["status"] == "running" and (
+                row["started_at"] < now - IDEMPOTENCY_LEASE or not worker_alive(row["owner"])
+            )
+
+            if row is None or expired or abandoned:
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotency (key, digest, status, owner, started_at) "
+                    "VALUES (?, ?, 'running', ?, ?)",
+                    (key, digest, self._owner(), now)
+                )
+                row = True
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        return row
+
+    def _finish(self, key, response):
+        self.conn.execute(
+            "UPDATE idempotency SET status = 'done', code = ?, mimetype = ?, body = ?, "
+            "finished_at = ? WHERE key = ? AND owner = ?",
+            (response.status_code, response.mimetype, response.get_data(),
+             time.time(), key, self._owner())
+        )
+
+    def _abandon(self, key):
+        self.conn.execute(
+            "DELETE FROM idempotency WHERE key = ? AND owner = ? AND status = 'running'",
+            (key, self._owner())
+        )
+
+    def purge(self):
+        """Drops results past IDEMPOTENCY_TTL (at most once per PURGE_INTERVAL)."""
+        now = time.time()
+        if now - self._purged < PURGE_INTERVAL:
+            return 0
+        self._purged = now
+        return self.conn.execute(
+            "DELETE FROM idempotency WHERE status = 'done' AND finished_at < ?",
+            (now - IDEMPOTENCY_TTL,)
+        ).rowcount
+
+    # ---------------------------------------------------------
+    # RUN
+    # ---------------------------------------------------------
+    def run(self, key, digest, compute):
+        """
+        compute() → Flask response; runs at most once per key while its
+        result is kept. Returns the response to send.
+        """
+        self.purge()
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT
+
+        while True:
+            row = self._claim(key, digest)
+
+            if row is True:
+                return self._compute(key, compute)
+
+            if row["digest"] != digest:
+                return refuse(
+                    "IDEMPOTENCY_KEY_REUSED",
+                    "this Idempotency-Key was used with a different request", 422
+                )
+
+            if row["status"] == "done":
+                self.replayed += 1
+                return replay_response(row)
+
+            # still running: wait for the first request, then look again
+            if time.monotonic() >= deadline:
+                return refuse(
+                    "IN_PROGRESS", "a request with this Idempotency-Key is still running", 409
+                )
+            event = self._inflight.get(key)
+            if event is not None:
+                event.wait(min(IDEMPOTENCY_WAIT, max(0.0, deadline - time.monotonic())))
+            else:
+                time.sleep(POLL_INTERVAL)
+
+    def _compute(self, key, compute):
+        event = threading.Event()
+        with self._mutex:
+            self._inflight[key] = event
+
+        try:
+            response = make_response(compute())
+            if cacheable(response):
+                self._finish(key, response)
+            else:
+                self._abandon(key)
+            return response
+        except BaseException:
+            self._abandon(key)
+            raise
+        finally:
+            with self._mutex:
+                self._inflight.pop(key, None)
+            event.set()
+
+
+IDEMPOTENCY = IdempotencyStore()
+
+
+# -------------------------------------------------------------
+# RESPONSES
+# -------------------------------------------------------------
+def cacheable(response):
+    # only final outcomes are replayed: not 4xx/5xx (429 overloaded,
+    # 499 cancelled ...) and not the {"status": "ERROR"} bodies
+    if response.status_code >= 400 or response.is_streamed:
+        return False
+    body = response.get_json(silent=True)
+    return not (isinstance(body, dict) and body.get("status") == "ERROR")
+
+
+def replay_response(row):
+    response = Response(row["body"], status=row["code"], mimetype=row["mimetype"])
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def refuse(status, message, code):
+    return jsonify({"status": status, "message": message}), code
+
+
+def idempotency_key():
+    return request.headers.get(IDEMPOTENCY_HEADER, "").strip() or None
+
+
+def run_idempotent(digest, compute):
+    """
+    compute() once per Idempotency-Key (namespaced by route); without
+    the header it simply runs. digest: payload_digest of the request.
+    """
+    key = idempotency_key()
+    if key is None:
+        return compute()
+    if len(key) > MAX_KEY_LENGTH:
+        return refuse("ERROR", "Idempotency-Key is too long", 400)
+    return IDEMPOTENCY.run(f"{request.path}:{key}", digest, compute)
+
+
+def idempotent(view):
+    """Route decorator for JSON endpoints: the payload digest is the raw body."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        digest = payload_digest(request.get_data()) if idempotency_key() else None
+        return run_idempotent(digest, lambda: view(*args, **kwargs))
+    return wrapper
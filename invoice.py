@@ -5,6 +5,8 @@ from PIL import Image
 import re
 import os
  
+from doc_source import source_ext, open_source, LazyPath
+ 
 # -----------------------------------------------------------
 # TESSERACT PATH (add your path here)
 pytesseract.pytesseract.tesseract_cmd = r"C:\Users\VikasTiwari\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
@@ -102,48 +104,51 @@ def check_known_invoice_in_text(text, known_invoice):
 # ------------------------ UNIVERSAL PDF/IMAGE TEXT EXTRACTOR -------------------------
 def extract_text_full(filepath):
  
-    ext = filepath.lower().split(".")[-1]
+    ext = source_ext(filepath)
  
     # -------------------------------- PDF --------------------------------
-    if ext == "pdf":
+    if ext == ".pdf":
         text_out = ""
  
-        try:
-            pdf = pdfplumber.open(filepath)
- 
-            for pg in pdf.pages:
-                txt = pg.extract_text()
-                if txt and txt.strip():
-                    text_out += "\n" + txt
-                else:
-                    # Page might be scanned → OCR
-                    images = convert_from_path(
-                        filepath,
-                        first_page=pg.page_number,
-                        last_page=pg.page_number,
-                        poppler_path=POPLER_PATH
-                    )
- 
-                    for img in images:
-                        img = img.rotate(-90, expand=True)
-                        ocr_text = pytesseract.image_to_string(img)
-                        text_out += "\n" + ocr_text
- 
-            pdf.close()
-            return text_out
- 
-        except Exception as e:
-            # If pdfplumber fails → fallback OCR for whole PDF
-            images = convert_from_path(filepath, poppler_path=POPLER_PATH)
-            full_text = ""
-            for img in images:
-                img = img.rotate(-90, expand=True)
-                full_text += pytesseract.image_to_string(img) + "\n"
-            return full_text
+        # poppler needs a file: one temp copy per document, made for the
+        # first scanned page
+        with LazyPath(filepath) as workspace:
+            try:
+                pdf = pdfplumber.open(open_source(filepath))
+ 
+                for pg in pdf.pages:
+                    txt = pg.extract_text()
+                    if txt and txt.strip():
+                        text_out += "\n" + txt
+                    else:
+                        # Page might be scanned → OCR
+                        images = convert_from_path(
+                            workspace.path(),
+                            first_page=pg.page_number,
+                            last_page=pg.page_number,
+                            poppler_path=POPLER_PATH
+                        )
+ 
+                        for img in images:
+                            img = img.rotate(-90, expand=True)
+                            ocr_text = pytesseract.image_to_string(img)
+                            text_out += "\n" + ocr_text
+ 
+                pdf.close()
+                return text_out
+ 
+            except Exception as e:
+                # If pdfplumber fails → fallback OCR for whole PDF
+                images = convert_from_path(workspace.path(), poppler_path=POPLER_PATH)
+                full_text = ""
+                for img in images:
+                    img = img.rotate(-90, expand=True)
+                    full_text += pytesseract.image_to_string(img) + "\n"
+                return full_text
  
     # -------------------------------- IMAGE --------------------------------
     else:
-        img = Image.open(filepath)
+        img = Image.open(open_source(filepath))
         img = img.rotate(-90, expand=True)  # auto-rotate simple
         return pytesseract.image_to_string(img)
  
@@ -1,65 +1,314 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from jwt_token import verify_jwt
-from vali import process_invoice, load_or_create_excel
+from vali import process_invoice, process_batch, open_ledger, EXCEL_FILE, BATCH_WORKERS
+from uploads import request_upload_list, UploadTooLarge, MAX_REQUEST_BYTES
+from werkzeug.exceptions import RequestEntityTooLarge
+from ven1 import get_reader
+from scheduler import estimate, SCHEDULER
+from governor import (
+    ADMISSION, Budget, Cancelled, admitted, disconnect_probe
+)
+from ledger import export_to_excel
+from ledger_cache import ConnectionPool, WriteBehind
+from job_queue import (
+    connect_jobs, enqueue, get_job, job_view, queue_stats, WorkerPool
+)
 import os
+import json
+import time
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
 
-@app.route("/process-invoice", methods=["POST"])
-def process_invoice_api():
+# ledger connections live for the whole process
+# (request threads + one per batch worker)
+LEDGER_POOL = ConnectionPool(open_ledger, size=4 + BATCH_WORKERS)
 
-    # -------------------------
-    # 1️⃣ AUTH HEADER
-    # -------------------------
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", "5000"))
+
+
+def export_ledger():
+    with LEDGER_POOL.connection() as conn:
+        export_to_excel(conn, EXCEL_FILE)
+
+
+# job queue connections (jobs.db)
+JOB_POOL = ConnectionPool(connect_jobs)
+
+# claimed_invoices.xlsx trails the ledger by at most a minute
+EXCEL_EXPORT = WriteBehind(export_ledger, max_staleness=60, name="claimed_invoices.xlsx")
+
+def authenticate():
+    """Returns (user_data, None) or (None, error response)."""
     auth_header = request.headers.get("Authorization")
 
     if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"error": "Authorization header missing or invalid"}), 401
+        return None, (jsonify({"error": "Authorization header missing or invalid"}), 401)
 
     token = auth_header.split(" ")[1]
 
     try:
-        user_data = verify_jwt(token)
+        return verify_jwt(token), None
     except Exception:
-        return jsonify({"error": "Invalid or expired token"}), 401
+        return None, (jsonify({"error": "Invalid or expired token"}), 401)
 
-    # -------------------------
-    # 2️⃣ REQUEST BODY
-    # -------------------------
+
+def requested_file():
+    """Returns (file_path, None) or (None, error response)."""
     data = request.json
     file_path = data.get("file_path") if data else None
 
     if not file_path:
-        return jsonify({"error": "file_path is required"}), 400
+        return None, (jsonify({"error": "file_path is required"}), 400)
 
     if not os.path.exists(file_path):
-        return jsonify({"error": "File not found"}), 404
+        return None, (jsonify({"error": "File not found"}), 404)
+
+    return file_path, None
+
+
+def run_invoice(file_path, user_id, cancelled=None):
 
     # -------------------------
-    # 3️⃣ LOAD EXCEL + PROCESS
+    # LEDGER + PROCESS
     # -------------------------
-    df = load_or_create_excel()
-    before_count = len(df)
+    with LEDGER_POOL.connection() as conn:
+        result = process_invoice(file_path, conn, budget=Budget(cancelled=cancelled))
+
+    if result["status"] == "NEW_CLAIM":
+        EXCEL_EXPORT.mark_dirty()
+
+    return invoice_response(result, user_id)
 
-    df = process_invoice(file_path, df)
 
-    after_count = len(df)
-    status = "NEW_CLAIM" if after_count > before_count else "DUPLICATE_CLAIM"
+def invoice_response(result, user_id):
+    response = {
+        "status": result["status"],
+        "doc_id": result["doc_id"],
+        "invoice_number": result.get("invoice_number"),
+        "invoice_date": str(result.get("invoice_date")),
+        "vendor": result.get("vendor"),
+        "total_amount": result.get("total_amount"),
+        "suspected_duplicate_of": result.get("suspected_duplicate_of"),
+        "similar_claims": result.get("similar_claims", []),
+        "processed_by": user_id
+    }
 
-    last_row = df.iloc[-1]
+    if result["status"] == "SUSPECTED_DUPLICATE":
+        response["suspected_duplicate_of"] = result["matched_doc_id"]
+        response["distance"] = result["distance"]
+
+    if result.get("duplicate_reason"):
+        response["duplicate_reason"] = result["duplicate_reason"]
+
+    if result.get("partial"):
+        response["partial"] = result["partial"]
+
+    return response
+
+
+def cancelled_response():
+    # client already gone; the status is for the access log
+    return jsonify({"status": "CANCELLED"}), 499
+
+
+# -------------------------
+# BATCH
+#   one auth check and one up-front ledger pass for the whole batch;
+#   results stream back as NDJSON, one line per file as it finishes,
+#   then a summary line
+# -------------------------
+def batch_items():
+    """Returns (items, missing, uploads) or raises ValueError."""
+    if (request.mimetype or "").startswith("multipart/"):
+        uploads = request_upload_list(request)
+        return [(u.name, u.buffer, u.doc) for u in uploads], [], uploads
+
+    data = request.get_json(silent=True) or {}
+    paths = data.get("file_paths")
+    if not isinstance(paths, list) or not paths:
+        raise ValueError("file_paths (list) or multipart files are required")
+
+    items, missing = [], []
+    for path in paths:
+        if isinstance(path, str) and os.path.exists(path):
+            items.append((path, path, None))
+        else:
+            missing.append(path)
+    return items, missing, []
+
+
+def stream_batch(items, missing, user_id, cancelled):
+    start = time.perf_counter()
+    counts = {}
+
+    def line(payload):
+        counts[payload["status"]] = counts.get(payload["status"], 0) + 1
+        return json.dumps(payload, default=str) + "\n"
+
+    try:
+        for path in missing:
+            yield line({"file": path, "status": "ERROR", "error": "File not found"})
+
+        # each in-flight file holds its own OCR slot, like a single upload
+        for i, result in process_batch(items, LEDGER_POOL.connection,
+                                       cancelled=cancelled, slot=ADMISSION.slot):
+            if result["status"] == "NEW_CLAIM":
+                EXCEL_EXPORT.mark_dirty()
+            if result["status"] not in ("ERROR", "DUPLICATE_IN_BATCH"):
+                result = invoice_response(result, user_id)
+            yield line({"index": i, "file": items[i][0], **result})
+
+        yield json.dumps({
+            "summary": counts,
+            "files": len(items) + len(missing),
+            "seconds": round(time.perf_counter() - start, 3)
+        }) + "\n"
+    except Cancelled:
+        return
+
+
+@app.route("/process-invoice/batch", methods=["POST"])
+def process_invoice_batch_api():
+    user_data, error = authenticate()
+    if error:
+        return error
+
+    try:
+        items, missing, uploads = batch_items()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except (UploadTooLarge, RequestEntityTooLarge) as e:
+        return jsonify({"error": str(e)}), 413
 
+    if len(items) + len(missing) > MAX_BATCH_FILES:
+        for upload in uploads:
+            upload.close()
+        return jsonify({"error": f"at most {MAX_BATCH_FILES} files per batch"}), 413
+
+    def release():
+        for upload in uploads:
+            upload.close()
+
+    cancelled = disconnect_probe(request.environ)
+    response = Response(
+        stream_with_context(stream_batch(items, missing, user_data["user_id"], cancelled)),
+        mimetype="application/x-ndjson"
+    )
+    # the server closes the response even if the stream never started
+    response.call_on_close(release)
+    return response
+
+
+# runs inside a job_queue worker process
+def run_invoice_job(payload):
+    EXCEL_EXPORT.start()
+    return run_invoice(payload["file_path"], payload["user_id"])
+
+
+@app.route("/process-invoice", methods=["POST"])
+def process_invoice_api():
+
+    # -------------------------
+    # 1️⃣ AUTH HEADER
+    # -------------------------
+    user_data, error = authenticate()
+    if error:
+        return error
+
+    # -------------------------
+    # 2️⃣ REQUEST BODY
     # -------------------------
-    # 4️⃣ RESPONSE
+    file_path, error = requested_file()
+    if error:
+        return error
+
+    # -------------------------
+    # 3️⃣ PROCESS + RESPOND
+    #    only authenticated, valid requests take an OCR slot
     # -------------------------
-    return jsonify({
-        "status": status,
-        "invoice_number": last_row["Invoice Number"],
-        "invoice_date": str(last_row["Invoice Date"]),
-        "vendor": last_row["Vendor"],
-        "total_amount": last_row["Total Amount"],
-        "processed_by": user_data["user_id"]
-    })
+    return admitted_invoice(file_path, user_data["user_id"], disconnect_probe(request.environ))
+
+
+@admitted
+def admitted_invoice(file_path, user_id, cancelled):
+    try:
+        return jsonify(run_invoice(file_path, user_id, cancelled))
+    except Cancelled:
+        return cancelled_response()
+
+
+# -------------------------
+# ASYNC JOBS
+#   POST enqueues and returns 202 + job id; a worker pool runs OCR
+# -------------------------
+@app.route("/jobs/process-invoice", methods=["POST"])
+def enqueue_invoice_api():
+    user_data, error = authenticate()
+    if error:
+        return error
+
+    file_path, error = requested_file()
+    if error:
+        return error
+
+    # cheap cost estimate → short jobs are picked first
+    est = estimate(file_path)
+
+    with JOB_POOL.connection() as conn:
+        job_id = enqueue(conn, "invoice", {
+            "file_path": os.path.abspath(file_path),
+            "user_id": user_data["user_id"]
+        }, est.cost, est.size_class)
+
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status_api(job_id):
+    user_data, error = authenticate()
+    if error:
+        return error
+
+    with JOB_POOL.connection() as conn:
+        job = get_job(conn, job_id)
+
+    if job is None or json.loads(job["payload"]).get("user_id") != user_data["user_id"]:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify(job_view(job))
+
+
+@app.route("/jobs/stats", methods=["GET"])
+def job_stats_api():
+    with JOB_POOL.connection() as conn:
+        return jsonify(queue_stats(conn))
+
+
+# OCR scheduler / admission of this server process (per gunicorn worker)
+@app.route("/ocr/stats", methods=["GET"])
+def ocr_stats_api():
+    return jsonify({"scheduler": SCHEDULER.stats(), "admission": ADMISSION.stats()})
+
+
+# -------------------------
+# SERVER LIFECYCLE
+#   warm_state: once per server (gunicorn master, before fork);
+#   start_background: in every worker process (see serving.py)
+# -------------------------
+def warm_state():
+    get_reader()    # EasyOCR weights for get_vendor
+
+
+def start_background():
+    EXCEL_EXPORT.start()
 
 
 if __name__ == "__main__":
+    # debug=True: the reloader runs this file again in a child
+    # (WERKZEUG_RUN_MAIN set) and only that child serves
+    if os.environ.get("WERKZEUG_RUN_MAIN"):
+        # fork the job workers before this process has any thread
+        WorkerPool(["invoice"]).start()
+        start_background()
     app.run(port=5001, debug=True)
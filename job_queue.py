@@ -0,0 +1,326 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import importlib
+import traceback
+import multiprocessing
+
+
+JOBS_DB = "jobs.db"
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+POLL_INTERVAL = 0.5
+
+# a job whose worker died this many times (it keeps crashing or
+# OOM-killing its worker) is failed instead of requeued
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+# workers look for jobs orphaned by a dead sibling this often (seconds)
+ORPHAN_SWEEP = float(os.environ.get("JOB_ORPHAN_SWEEP", "30"))
+
+# shortest job first: the queued job with the lowest
+#   cost - JOB_AGING * seconds queued
+# runs next (cost: scheduler.estimate, ~ pages to OCR)
+JOB_AGING = float(os.environ.get("JOB_AGING", "0.5"))
+
+# job kind → "module:function" run inside a worker process
+JOB_HANDLERS = {
+    "claim": "claim_service:run_claim_job",
+    "invoice": "invoice_api:run_invoice_job",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'queued',
+    result       TEXT,
+    error        TEXT,
+    worker       TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    cost         REAL NOT NULL DEFAULT 1.0,
+    size_class   TEXT,
+    enqueued_at  REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_queue
+    ON jobs (status, kind, enqueued_at);
+"""
+
+
+# -------------------------------------------------------------
+# DURABLE QUEUE (SQLite, survives restarts)
+#   queued → running → done | failed
+# -------------------------------------------------------------
+def connect_jobs(db_path=JOBS_DB):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    _add_columns(conn)
+    return conn
+
+
+def _add_columns(conn):
+    # jobs.db created before cost-based ordering
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+    for name, decl in (("cost", "REAL NOT NULL DEFAULT 1.0"), ("size_class", "TEXT")):
+        if name not in columns:
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+            except sqlite3.OperationalError:
+                pass    # another process added it first
+
+
+def enqueue(conn, kind, payload, cost=1.0, size_class=None):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"unknown job kind: {kind}")
+
+    job_id = uuid.uuid4().hex
+    conn.execute(
+        "INSERT INTO jobs (id, kind, payload, cost, size_class, enqueued_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (job_id, kind, json.dumps(payload), cost, size_class, time.time())
+    )
+    return job_id
+
+
+def claim_next(conn, kinds, worker):
+    """Atomically moves the next queued job of `kinds` (shortest, aged) to running."""
+    marks = ",".join("?" * len(kinds))
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # every job ages at the same rate: cost + JOB_AGING * enqueued_at
+        # orders like cost - JOB_AGING * waited
+        row = conn.execute(
+            f"SELECT id, kind, payload FROM jobs WHERE status = 'queued' "
+            f"AND kind IN ({marks}) ORDER BY cost + ? * enqueued_at, enqueued_at LIMIT 1",
+            list(kinds) + [JOB_AGING]
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker, time.time(), row["id"])
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    return row
+
+
+def finish(conn, job_id, result):
+    conn.execute(
+        "UPDATE jobs SET status = 'done', result = ?, finished_at = ? WHERE id = ?",
+        (json.dumps(result, default=str), time.time(), job_id)
+    )
+
+
+def fail(conn, job_id, error):
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+        (error, time.time(), job_id)
+    )
+
+
+def get_job(conn, job_id):
+    return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def job_view(job):
+    """JSON-ready status for GET /jobs/<id>."""
+    view = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "wait_seconds": _span(job["enqueued_at"], job["started_at"]),
+        "service_seconds": _span(job["started_at"], job["finished_at"]),
+    }
+    if job["status"] == "done":
+        view["result"] = json.loads(job["result"])
+    if job["status"] == "failed":
+        view["error"] = job["error"]
+    return view
+
+
+def _span(start, end):
+    return round(end - start, 3) if start and end else None
+
+
+# -------------------------------------------------------------
+# RESTART RECOVERY
+#   a job left "running" by a worker process that no longer exists
+#   (crash, redeploy) goes back to the queue, or fails after
+#   MAX_ATTEMPTS. Checked at pool start and every ORPHAN_SWEEP s.
+# -------------------------------------------------------------
+def worker_alive(worker):
+    host, _, pid = (worker or "").rpartition(":")
+    if host != socket.gethostname():
+        return True     # another host's worker; not ours to judge
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except (ValueError, ProcessLookupError):
+        return False
+    except (PermissionError, OSError):
+        return True
+
+
+def requeue_orphans(conn, max_attempts=MAX_ATTEMPTS):
+    rows = conn.execute(
+        "SELECT id, worker, attempts FROM jobs WHERE status = 'running'"
+    ).fetchall()
+    orphans = [r for r in rows if not worker_alive(r["worker"])]
+    requeued = 0
+    for r in orphans:
+        if r["attempts"] >= max_attempts:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (f"worker died {r['attempts']} times running this job",
+                 time.time(), r["id"])
+            )
+            print(f"💀 Job {r['id']} failed after {r['attempts']} attempts")
+            continue
+        requeued += conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL "
+            "WHERE id = ? AND status = 'running'",
+            (r["id"],)
+        ).rowcount
+    if requeued:
+        print(f"♻️ Requeued {requeued} interrupted jobs")
+    return requeued
+
+
+# -------------------------------------------------------------
+# METRICS
+# -------------------------------------------------------------
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(pct / 100 * len(values)))], 3)
+
+
+def queue_stats(conn, window=500):
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    oldest = conn.execute(
+        "SELECT MIN(enqueued_at) FROM jobs WHERE status = 'queued'"
+    ).fetchone()[0]
+
+    recent = conn.execute(
+        "SELECT enqueued_at, started_at, finished_at, size_class FROM jobs "
+        "WHERE status IN ('done', 'failed') ORDER BY finished_at DESC LIMIT ?",
+        (window,)
+    ).fetchall()
+    waits = [r["started_at"] - r["enqueued_at"] for r in recent]
+    services = [r["finished_at"] - r["started_at"] for r in recent]
+
+    # end-to-end latency (enqueued → finished) per size class
+    latencies = {}
+    for r in recent:
+        latencies.setdefault(r["size_class"] or "unknown", []).append(
+            r["finished_at"] - r["enqueued_at"]
+        )
+
+    return {
+        "queue_depth": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "done": counts.get("done", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_queued_seconds": round(time.time() - oldest, 3) if oldest else 0,
+        "wait_seconds": {"p50": percentile(waits, 50), "p95": percentile(waits, 95)},
+        "service_seconds": {"p50": percentile(services, 50), "p95": percentile(services, 95)},
+        "latency_seconds": {
+            name: {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for name, values in sorted(latencies.items())
+        },
+    }
+
+
+# -------------------------------------------------------------
+# WORKER POOL (local processes; each loads OCR models once)
+# -------------------------------------------------------------
+def _load_handler(kind):
+    module, _, func = JOB_HANDLERS[kind].partition(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def _worker_main(db_path, kinds):
+    conn = connect_jobs(db_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    handlers = {}
+    next_sweep = time.monotonic() + ORPHAN_SWEEP
+
+    while True:
+        # a sibling killed mid-job (OOM, segfault in OCR) leaves it running
+        if time.monotonic() >= next_sweep:
+            requeue_orphans(conn)
+            next_sweep = time.monotonic() + ORPHAN_SWEEP
+
+        job = claim_next(conn, kinds, worker)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        try:
+            if job["kind"] not in handlers:
+                handlers[job["kind"]] = _load_handler(job["kind"])
+            result = handlers[job["kind"]](json.loads(job["payload"]))
+            finish(conn, job["id"], result)
+        except Exception as e:
+            traceback.print_exc()
+            fail(conn, job["id"], str(e))
+
+
+class WorkerPool:
+
+    def __init__(self, kinds, size=JOB_WORKERS, db_path=JOBS_DB):
+        self.kinds = list(kinds)
+        self.size = size
+        self.db_path = db_path
+        self.processes = []
+
+    def start(self):
+        requeue_orphans(connect_jobs(self.db_path))
+        for _ in range(self.size):
+            p = multiprocessing.Process(
+                target=_worker_main, args=(self.db_path, self.kinds), daemon=True
+            )
+            p.start()
+            self.processes.append(p)
+        print(f"👷 Started {self.size} workers for {', '.join(self.kinds)} jobs")
+        return self
+
+    def stop(self):
+        for p in self.processes:
+            p.terminate()
+        for p in self.processes:
+            p.join()
+        self.processes = []
+
+
+# -------------------------------------------------------------
+# STANDALONE WORKERS
+#   python job_queue.py claim invoice   (size from JOB_WORKERS)
+# -------------------------------------------------------------
+if __name__ == "__main__":
+    kinds = sys.argv[1:] or list(JOB_HANDLERS)
+    pool = WorkerPool(kinds).start()
+    try:
+        for p in pool.processes:
+            p.join()
+    except KeyboardInterrupt:
+        pool.stop()
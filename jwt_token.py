@@ -1,20 +1,264 @@
-import jwt
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
-SECRET_KEY = "a8f9c2d7$KJH@#9xP0qL!mZ8w3E1"
+import jwt
+from filelock import FileLock
+
 ALGORITHM = "HS256"
 TOKEN_EXPIRE_MINUTES = 30
 
+TOKEN_CACHE_SIZE = int(os.environ.get("JWT_CACHE_SIZE", "10000"))
+REVOKED_FILE = os.environ.get("JWT_REVOKED_FILE", "revoked_tokens.jsonl")
+REVOCATION_POLL = 1.0   # seconds between checks of the revocation file
+REVOCATION_PRUNE = 60.0  # seconds between drops of expired entries
+REVOCATION_COMPACT_MIN = int(os.environ.get("JWT_REVOKED_COMPACT_MIN", "1000"))
+
+
+# -------------------------------------------------------------
+# SECRET (configuration, never in the source)
+#   JWT_SECRET_KEY=...        or
+#   JWT_SECRET_FILE=/run/secrets/jwt
+# -------------------------------------------------------------
+_secret = None
+
+
+def secret_key():
+    global _secret
+    if _secret is None:
+        secret = os.environ.get("JWT_SECRET_KEY")
+        if not secret and os.environ.get("JWT_SECRET_FILE"):
+            with open(os.environ["JWT_SECRET_FILE"], encoding="utf-8") as f:
+                secret = f.read().strip()
+        if not secret:
+            raise RuntimeError("JWT secret not configured: set JWT_SECRET_KEY or JWT_SECRET_FILE")
+        _secret = secret
+    return _secret
+
 
 def create_jwt(payload: dict) -> str:
     payload_copy = payload.copy()
     payload_copy["exp"] = datetime.utcnow() + timedelta(minutes=TOKEN_EXPIRE_MINUTES)
     payload_copy["iat"] = datetime.utcnow()
+    payload_copy["jti"] = uuid.uuid4().hex    # revocation handle
 
-    token = jwt.encode(payload_copy, SECRET_KEY, algorithm=ALGORITHM)
+    token = jwt.encode(payload_copy, secret_key(), algorithm=ALGORITHM)
     return token
 
 
+def token_digest(token: str) -> str:
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+# -------------------------------------------------------------
+# REVOCATION LIST
+#   append-only JSONL shared by every server process; each process
+#   reads only the appended tail, at most once per REVOCATION_POLL.
+#   Entries are keyed by jti (or the token digest for tokens issued
+#   without one) and dropped once the token would have expired.
+#   When most lines in the file are expired (and there are at least
+#   REVOCATION_COMPACT_MIN), the writer rewrites it with the live ones;
+#   other processes notice the new file and read it from the start.
+# -------------------------------------------------------------
+class RevocationList:
+
+    def __init__(self, path=REVOKED_FILE):
+        self.path = path
+        self.revoked = {}           # key → exp
+        self.lines = 0              # entries in the file, expired ones included
+        self._offset = 0
+        self._inode = None
+        self._checked = 0.0
+        self._pruned = 0.0
+        self._mutex = threading.Lock()
+
+    @property
+    def lock(self):
+        # looked up per use, so a list built before a fork works in the child
+        return FileLock(self.path + ".lock", is_singleton=True)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked < REVOCATION_POLL:
+            return
+        with self._mutex:
+            self._checked = now
+            if force or now - self._pruned >= REVOCATION_PRUNE:
+                self._prune()
+                self._pruned = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                # rewritten by a compaction: read it again from the start
+                self.revoked, self.lines, self._offset = {}, 0, 0
+                self._inode = st.st_ino
+            if st.st_size <= self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+            end = chunk.rfind(b"\n") + 1
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self.revoked[entry["key"]] = entry.get("exp")
+                    self.lines += 1
+            self._offset += end
+            self._prune()
+
+    def _prune(self):
+        now = time.time()
+        self.revoked = {k: exp for k, exp in self.revoked.items() if exp is None or exp > now}
+
+    def add(self, key, exp=None):
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "exp": exp, "at": time.time()}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.refresh(force=True)
+
+            if self.lines >= REVOCATION_COMPACT_MIN and self.lines > 2 * len(self.revoked):
+                self._compact()
+
+    def _compact(self):
+        # caller holds the file lock: no appends while the file is swapped
+        with self._mutex:
+            tmp_file = self.path + ".compacting"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                for key, exp in self.revoked.items():
+                    f.write(json.dumps({"key": key, "exp": exp}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.path)
+
+            st = os.stat(self.path)
+            dropped = self.lines - len(self.revoked)
+            self.lines = len(self.revoked)
+            self._offset = st.st_size
+            self._inode = st.st_ino
+
+        print(f"🗜️ Compacted {self.path}: dropped {dropped} expired revocations")
+
+    def __contains__(self, key):
+        self.refresh()
+        return key in self.revoked
+
+
+REVOKED = RevocationList()
+
+
+def _revocation_key(token, claims):
+    return claims.get("jti") or token_digest(token)
+
+
+# -------------------------------------------------------------
+# VERIFIED-TOKEN CACHE
+#   batch clients send the same token thousands of times: after one
+#   full HMAC verify + decode, the claims are kept (bounded LRU keyed
+#   by the token digest) until the token's own exp.
+# -------------------------------------------------------------
+class TokenCache:
+
+    def __init__(self, size=TOKEN_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # digest → (claims, exp, revocation key)
+        self._mutex = threading.Lock()
+
+    def get(self, digest):
+        with self._mutex:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.time():
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry
+
+    def put(self, digest, claims, exp, key):
+        with self._mutex:
+            self._entries[digest] = (claims, exp, key)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._mutex:
+            self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._mutex:
+            self._entries.clear()
+
+
+TOKEN_CACHE = TokenCache()
+
+
+def _decode(token):
+    return jwt.decode(token, secret_key(), algorithms=[ALGORITHM])
+
+
 def verify_jwt(token: str) -> dict:
-    decoded = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    return decoded
+    digest = token_digest(token)
+
+    cached = TOKEN_CACHE.get(digest)
+    if cached is not None:
+        claims, _, key = cached
+    else:
+        claims = _decode(token)     # raises on bad signature / expired
+        key = _revocation_key(token, claims)
+        exp = claims.get("exp", time.time() + TOKEN_EXPIRE_MINUTES * 60)
+        TOKEN_CACHE.put(digest, claims, exp, key)
+
+    if key in REVOKED:
+        TOKEN_CACHE.discard(digest)
+        raise jwt.InvalidTokenError("token has been revoked")
+
+    return dict(claims)
+
+
+def revoke_jwt(token: str):
+    """Rejects the token in every process from now on (signature must be valid)."""
+    claims = jwt.decode(token, secret_key(), algorithms=[ALGORITHM],
+                        options={"verify_exp": False})
+    REVOKED.add(_revocation_key(token, claims), claims.get("exp"))
+    TOKEN_CACHE.discard(token_digest(token))
+
+
+# -------------------------------------------------------------
+# BENCHMARK
+#   python jwt_token.py [calls]
+#   per-request auth cost: full verify vs cached verify
+# -------------------------------------------------------------
+def _per_call(fn, token, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(token)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    token = create_jwt({"user_id": "bench", "role": "User"})
+
+    full = _per_call(_decode, token, calls)
+    verify_jwt(token)
+    cached = _per_call(verify_jwt, token, calls)
+
+    print(f"{calls} verifications of one token")
+    print(f"full verify (HMAC + decode) {full:7.2f} µs/request")
+    print(f"verified-token cache        {cached:7.2f} µs/request   ({full / cached:.1f}x)")
@@ -0,0 +1,335 @@
+import os
+import sys
+import hashlib
+import sqlite3
+
+import pandas as pd
+
+from text_store import put_text, get_text
+from ledger_writer import lock_for
+from doc_hash import DocHasher, CHUNK_SIZE
+
+
+LEDGER_DB = "claimed_invoices.db"
+
+# Excel column → ledger column
+COLUMN_MAP = {
+    "File Name": "file_name",
+    "File Hash": "file_hash",
+    "Invoice Date": "invoice_date",
+    "Invoice Number": "invoice_number",
+    "Vendor": "vendor",
+    "Total Amount": "total_amount",
+    "Text Ref": "text_ref",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claimed_invoices (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name        TEXT,
+    file_hash        TEXT,
+    invoice_date     TEXT,
+    invoice_number   TEXT,
+    vendor           TEXT,
+    total_amount     TEXT,
+    text_ref         TEXT,
+    invoice_key      TEXT NOT NULL,
+    total_key        TEXT NOT NULL,
+    created_at       TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_claimed_file_hash
+    ON claimed_invoices (file_hash);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_claimed_invoice_total
+    ON claimed_invoices (invoice_key, total_key);
+
+CREATE TABLE IF NOT EXISTS ledger_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# -------------------------------------------------------------
+# KEYS (same normalization the Excel duplicate check used)
+# -------------------------------------------------------------
+def invoice_key(invoice_no):
+    return str(invoice_no).strip().lower()
+
+
+def total_key(total):
+    return str(total).strip()
+
+
+# -------------------------------------------------------------
+# CONNECT (creates schema on first use)
+# -------------------------------------------------------------
+def connect_ledger(db_path=LEDGER_DB):
+    # pooled connections move between request threads (one user at a time)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    _upgrade_schema(conn)
+    return conn
+
+
+def _upgrade_schema(conn):
+    # ledgers created before the text store kept full OCR text inline
+    cols = {r["name"] for r in conn.execute("PRAGMA table_info(claimed_invoices)")}
+
+    if "text_ref" not in cols:
+        conn.execute("ALTER TABLE claimed_invoices ADD COLUMN text_ref TEXT")
+
+    if "string_extracted" in cols:
+        rows = conn.execute(
+            "SELECT id, string_extracted FROM claimed_invoices "
+            "WHERE string_extracted IS NOT NULL"
+        ).fetchall()
+        with conn:
+            conn.executemany(
+                "UPDATE claimed_invoices SET text_ref = ? WHERE id = ?",
+                [(put_text(r["string_extracted"]), r["id"]) for r in rows]
+            )
+        conn.execute("ALTER TABLE claimed_invoices DROP COLUMN string_extracted")
+
+
+# -------------------------------------------------------------
+# LOOKUPS (index seeks, no full scan)
+# -------------------------------------------------------------
+def _row_to_excel(row):
+    return {col: row[name] for col, name in COLUMN_MAP.items()}
+
+
+def get_claim_by_hash(conn, file_hash):
+    row = conn.execute(
+        "SELECT * FROM claimed_invoices WHERE file_hash = ?",
+        (str(file_hash),)
+    ).fetchone()
+    return _row_to_excel(row) if row else None
+
+
+def is_file_claimed(conn, file_hash):
+    return conn.execute(
+        "SELECT 1 FROM claimed_invoices WHERE file_hash = ?",
+        (str(file_hash),)
+    ).fetchone() is not None
+
+
+def is_already_claimed(conn, invoice_no, total):
+    return conn.execute(
+        "SELECT 1 FROM claimed_invoices WHERE invoice_key = ? AND total_key = ?",
+        (invoice_key(invoice_no), total_key(total))
+    ).fetchone() is not None
+
+
+def get_claim_text(conn, file_hash):
+    # full OCR text is loaded only on demand (audits)
+    row = conn.execute(
+        "SELECT text_ref FROM claimed_invoices WHERE file_hash = ?",
+        (str(file_hash),)
+    ).fetchone()
+    return get_text(row["text_ref"]) if row else None
+
+
+def count_claims(conn):
+    return conn.execute("SELECT COUNT(*) FROM claimed_invoices").fetchone()[0]
+
+
+# -------------------------------------------------------------
+# INSERT (TRANSACTIONAL)
+# -------------------------------------------------------------
+def _insert_values(row):
+    values = [
+        None if pd.isna(row.get(col)) else str(row.get(col))
+        for col in COLUMN_MAP
+    ]
+    values.append(invoice_key(row.get("Invoice Number")))
+    values.append(total_key(row.get("Total Amount")))
+    return values
+
+
+_INSERT_SQL = (
+    "INSERT {verb} INTO claimed_invoices ("
+    + ", ".join(COLUMN_MAP.values())
+    + ", invoice_key, total_key) VALUES ("
+    + ", ".join("?" * (len(COLUMN_MAP) + 2))
+    + ")"
+)
+
+
+def insert_claim(conn, row):
+    """
+    row is keyed by the Excel column names ("Text Ref" from text_store.put_text).
+    Returns False when the unique indexes reject it (already claimed).
+    """
+    try:
+        with conn:
+            conn.execute(_INSERT_SQL.format(verb=""), _insert_values(row))
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+# -------------------------------------------------------------
+# ONE-SHOT MIGRATION FROM EXCEL
+# -------------------------------------------------------------
+def migrate_from_excel(conn, excel_file):
+
+    marker = "migrated:" + os.path.abspath(excel_file)
+
+    done = conn.execute(
+        "SELECT 1 FROM ledger_meta WHERE key = ?", (marker,)
+    ).fetchone()
+
+    if done or not os.path.exists(excel_file):
+        return 0
+
+    df = pd.read_excel(excel_file)
+    df.columns = df.columns.str.strip()
+
+    # inline OCR text moves to the text store; the ledger keeps the ref
+    if "String Extracted" in df.columns:
+        df["Text Ref"] = [put_text(t) for t in df.pop("String Extracted")]
+
+    for col in COLUMN_MAP:
+        if col not in df.columns:
+            df[col] = ""
+
+    # rows the unique indexes refuse (same file, or same invoice + total
+    # as an earlier row) are not imported; they are listed, not lost
+    skipped = []
+
+    with conn:
+        for excel_row, r in enumerate(df.to_dict("records"), start=2):
+            cur = conn.execute(_INSERT_SQL.format(verb="OR IGNORE"), _insert_values(r))
+            if cur.rowcount == 0:
+                skipped.append({"Excel Row": excel_row, **{c: r.get(c) for c in COLUMN_MAP}})
+        conn.execute(
+            "INSERT INTO ledger_meta (key, value) VALUES (?, CURRENT_TIMESTAMP)",
+            (marker,)
+        )
+
+    migrated = len(df) - len(skipped)
+    print(f"📥 Migrated {migrated} rows from {excel_file} into ledger")
+
+    if skipped:
+        report = os.path.splitext(excel_file)[0] + ".migration_skipped.csv"
+        pd.DataFrame(skipped).to_csv(report, index=False)
+        print(f"⚠️ Skipped {len(skipped)} duplicate rows (file hash or invoice + total "
+              f"already in the ledger), listed in {report}")
+        for row in skipped[:10]:
+            print(f"   row {row['Excel Row']}: invoice {row['Invoice Number']} "
+                  f"total {row['Total Amount']} file {row['File Name']}")
+
+    return migrated
+
+
+# -------------------------------------------------------------
+# EXPORT TO EXCEL
+#   the workbook is a read-only view of the ledger: this is its only
+#   writer. Written to a temp file, fsync'd and swapped in under the
+#   workbook's lock, so readers never see a half-written file.
+# -------------------------------------------------------------
+def export_to_excel(conn, excel_file):
+    df = pd.read_sql_query(
+        "SELECT " + ", ".join(COLUMN_MAP.values())
+        + " FROM claimed_invoices ORDER BY id",
+        conn
+    )
+    df.columns = list(COLUMN_MAP)
+
+    base, ext = os.path.splitext(excel_file)
+    tmp_file = base + ".exporting" + ext
+
+    with lock_for(excel_file):
+        df.to_excel(tmp_file, index=False)
+        with open(tmp_file, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_file, excel_file)
+
+    return len(df)
+
+
+# -------------------------------------------------------------
+# LEGACY MD5 FILE HASHES
+#   rows claimed before the BLAKE2b doc ID hold an md5 "File Hash".
+#   The claimed files are re-read once and those rows (and their
+#   similarity-index entries) rewritten to the doc ID:
+#     python ledger.py rehash <file or folder> [...]
+#   Rows whose file is not found keep the md5; the invoice + total
+#   index still guards them.
+# -------------------------------------------------------------
+LEGACY_HASH_CHARS = 32      # md5 hex; doc IDs are 40
+
+
+def count_legacy_hashes(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM claimed_invoices WHERE length(file_hash) = ?",
+        (LEGACY_HASH_CHARS,)
+    ).fetchone()[0]
+
+
+def _walk(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in names:
+                    yield os.path.join(root, name)
+        elif os.path.isfile(path):
+            yield path
+
+
+def _legacy_and_doc_id(path):
+    md5, doc = hashlib.md5(), DocHasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            md5.update(chunk)
+            doc.update(chunk)
+    return md5.hexdigest(), doc.doc_id
+
+
+def rehash_legacy_files(conn, paths):
+    legacy = {r[0] for r in conn.execute(
+        "SELECT file_hash FROM claimed_invoices WHERE length(file_hash) = ?",
+        (LEGACY_HASH_CHARS,)
+    )}
+    has_lsh = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lsh_signatures'"
+    ).fetchone()
+
+    rehashed = 0
+    with conn:
+        for path in _walk(paths):
+            if not legacy:
+                break
+            md5, doc_id = _legacy_and_doc_id(path)
+            if md5 not in legacy:
+                continue
+            legacy.discard(md5)
+            # OR IGNORE: the same file already claimed again under its doc ID
+            rehashed += conn.execute(
+                "UPDATE OR IGNORE claimed_invoices SET file_hash = ? WHERE file_hash = ?",
+                (doc_id, md5)
+            ).rowcount
+            if has_lsh:
+                conn.execute("UPDATE OR IGNORE lsh_signatures SET doc_id = ? WHERE doc_id = ?",
+                             (doc_id, md5))
+                conn.execute("UPDATE OR IGNORE lsh_buckets SET doc_id = ? WHERE doc_id = ?",
+                             (doc_id, md5))
+
+    left = count_legacy_hashes(conn)
+    print(f"🔑 Rehashed {rehashed} legacy md5 rows; {left} left (file not found)")
+    return rehashed, left
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if args and args[0] == "rehash":
+        rehash_legacy_files(connect_ledger(LEDGER_DB), args[1:] or ["."])
+    else:
+        print(f"{count_legacy_hashes(connect_ledger(LEDGER_DB))} ledger rows keyed by md5 "
+              f"(python ledger.py rehash <claimed files>)")
@@ -0,0 +1,100 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+
+
+# -------------------------------------------------------------
+# CONNECTION POOL
+#   ledger connections are opened (schema + migration checks)
+#   once per process, then reused by every request.
+# -------------------------------------------------------------
+class ConnectionPool:
+
+    def __init__(self, factory, size=4):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._mutex = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._mutex:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            conn = self.factory() if grow else self._idle.get()
+
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+
+# -------------------------------------------------------------
+# WRITE-BEHIND FLUSHER
+#   mark_dirty() is O(1) on the request path; a background thread
+#   runs flush() at most max_staleness seconds after the first
+#   unflushed change (and once more at interpreter exit).
+# -------------------------------------------------------------
+class WriteBehind:
+
+    def __init__(self, flush, max_staleness=30, name="ledger"):
+        self.flush = flush
+        self.max_staleness = max_staleness
+        self.name = name
+        self._dirty_since = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._atexit = False
+        # threads do not survive fork: a forked child (job worker,
+        # gunicorn worker) must start its own flusher
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def mark_dirty(self):
+        with self._cond:
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+                self._cond.notify()
+
+    def flush_now(self):
+        with self._cond:
+            if self._dirty_since is None:
+                return
+            self._dirty_since = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ {self.name} flush failed: {e}")
+            self.mark_dirty()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._dirty_since is None:
+                    self._cond.wait()
+                delay = self._dirty_since + self.max_staleness - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.flush_now()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name=f"{self.name}-writer", daemon=True
+            )
+            self._thread.start()
+            if not self._atexit:
+                atexit.register(self.flush_now)
+                self._atexit = True
+        return self
@@ -0,0 +1,228 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+from concurrent.futures import Future
+
+import pandas as pd
+from filelock import FileLock
+
+
+# -------------------------------------------------------------
+# CROSS-PROCESS LOCKS
+#   one FileLock object per ledger path per process (is_singleton),
+#   so nested acquisition (writer batch → journal append) is reentrant.
+#   Holders look the lock up on each use: an object created before a
+#   fork (preforked server master) must not be used in the child.
+# -------------------------------------------------------------
+def ledger_lock_path(ledger_path):
+    return os.path.abspath(ledger_path) + ".lock"
+
+
+def lock_for(ledger_path):
+    return FileLock(ledger_lock_path(ledger_path), is_singleton=True)
+
+
+# -------------------------------------------------------------
+# SINGLE WRITER
+#   every mutation of a ledger is queued to one thread, which
+#   applies queued ops in batches while holding the ledger's
+#   file lock (so other processes' writers are excluded too).
+#   Readers never take the lock: SQLite WAL / journal whole-line
+#   reads / atomic os.replace give them consistent snapshots.
+# -------------------------------------------------------------
+class LedgerWriter:
+
+    def __init__(self, ledger_path, open_resource=None, name=None, max_batch=64):
+        """
+        open_resource: optional factory run on the writer thread (e.g. a
+        SQLite connection); it is then passed as the first op argument.
+        """
+        self.ledger_path = ledger_path
+        self.open_resource = open_resource
+        self.name = name or os.path.basename(ledger_path)
+        self.max_batch = max_batch
+
+        self.ops = 0
+        self.batches = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._mutex = threading.Lock()
+        self._atexit = False
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def lock(self):
+        return lock_for(self.ledger_path)
+
+    def _after_fork(self):
+        # the parent's writer thread (and anything queued to it) did not
+        # come along: the child starts its own on first submit
+        self._mutex = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def _start(self):
+        with self._mutex:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-writer", daemon=True
+                )
+                self._thread.start()
+                if not self._atexit:
+                    atexit.register(self.close)
+                    self._atexit = True
+
+    def submit(self, fn, *args, **kwargs):
+        fut = Future()
+        self._start()
+        self._queue.put((fut, fn, args, kwargs))
+        return fut
+
+    def call(self, fn, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self):
+        # drain queued ops, then stop the thread; a later submit (e.g. a
+        # write-behind flush running after this atexit hook) restarts it
+        with self._mutex:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        resource = self.open_resource() if self.open_resource else None
+
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            batch = [op for op in batch if op is not None]
+
+            if batch:
+                try:
+                    with self.lock:
+                        for fut, fn, args, kwargs in batch:
+                            if not fut.set_running_or_notify_cancel():
+                                continue
+                            try:
+                                if resource is not None:
+                                    fut.set_result(fn(resource, *args, **kwargs))
+                                else:
+                                    fut.set_result(fn(*args, **kwargs))
+                            except BaseException as e:
+                                fut.set_exception(e)
+                except Exception as e:
+                    # lock could not be taken: fail the batch, keep the thread
+                    for fut, *_ in batch:
+                        if not fut.done():
+                            if fut.running() or fut.set_running_or_notify_cancel():
+                                fut.set_exception(e)
+
+                self.ops += len(batch)
+                self.batches += 1
+
+            if stop:
+                return
+
+
+# -------------------------------------------------------------
+# EXCEL READ-MODIFY-WRITE (only ever run on a LedgerWriter)
+# -------------------------------------------------------------
+def append_excel_rows(excel_file, rows, columns=None):
+
+    # re-read under the writer's lock: never write back a stale copy
+    if os.path.exists(excel_file):
+        df = pd.read_excel(excel_file)
+        df.columns = df.columns.str.strip()
+    else:
+        df = pd.DataFrame(columns=columns or [])
+
+    df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+
+    base, ext = os.path.splitext(excel_file)
+    tmp_file = base + ".writing" + ext
+    df.to_excel(tmp_file, index=False)
+    os.replace(tmp_file, excel_file)
+
+    return len(df)
+
+
+# -------------------------------------------------------------
+# STRESS TEST
+#   python ledger_writer.py [processes] [threads] [claims_per_thread]
+#   Concurrent submissions from several processes into one journal
+#   ledger (with a compaction racing them); every row must survive.
+# -------------------------------------------------------------
+def _stress_worker(excel_file, worker, threads, per_thread):
+    from claim_journal import ClaimJournal
+
+    journal = ClaimJournal(excel_file, columns=["Worker", "Thread", "Seq"])
+    writer = LedgerWriter(excel_file)
+
+    def submit_claims(t):
+        for i in range(per_thread):
+            writer.call(journal.append, {"Worker": worker, "Thread": t, "Seq": i})
+            if worker == 0 and t == 0 and i == per_thread // 2:
+                writer.call(journal.compact)
+
+    pool = [threading.Thread(target=submit_claims, args=(t,)) for t in range(threads)]
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+
+    writer.close()
+
+
+def run_stress(processes=4, threads=8, per_thread=50, workdir="stress_ledger"):
+    from multiprocessing import Process
+    from claim_journal import ClaimJournal
+
+    os.makedirs(workdir, exist_ok=True)
+    excel_file = os.path.join(workdir, "stress_claims.xlsx")
+    for leftover in (excel_file, os.path.splitext(excel_file)[0] + ".journal.jsonl"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    expected = processes * threads * per_thread
+
+    start = time.perf_counter()
+    procs = [
+        Process(target=_stress_worker, args=(excel_file, w, threads, per_thread))
+        for w in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    journal = ClaimJournal(excel_file)
+    journal.compact()
+    df = journal.frame()
+
+    unique = len(df.drop_duplicates(["Worker", "Thread", "Seq"]))
+    lost = expected - unique
+
+    print(f"submitted : {expected} claims from {processes} processes x {threads} threads")
+    print(f"stored    : {len(df)} rows ({unique} unique)")
+    print(f"lost      : {lost}")
+    print(f"throughput: {expected / elapsed:.0f} claims/s ({elapsed:.2f}s)")
+
+    return lost == 0 and len(df) == expected
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    ok = run_stress(*args)
+    sys.exit(0 if ok else 1)
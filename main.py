@@ -1,6 +1,3 @@
-import os
-import tempfile
-
 # import the updated safe decryption functions
 from dec import safe_decrypt_text as decrypt_text
 from dec import safe_decrypt_file as decrypt_file
@@ -10,59 +7,128 @@ from total import extract_total
 from invoice import extract_invoice
 from ven1 import get_vendor
 from total import extract_text_full
+from verify import get_text_layer, verify_fields
+from doc_hash import hash_bytes
 
 
 # -------------------------------------------------------------
-# MAIN FUNCTION
+# FULL EXTRACTION (PER FIELD)
 # -------------------------------------------------------------
-def process_invoice_request(enc_date, enc_total, enc_invoice, enc_vendor, enc_file):
+def extract_field(field, text, path):
+    if field == "date":
+        return extract_date_from_text(text)
+    if field == "total":
+        return extract_total(text)
+    if field == "invoice":
+        return extract_invoice(text)
+    if field == "vendor":
+        return get_vendor(path)
+    return None
+
+
+def field_matches(field, found, expected):
+    if found is None:
+        return False
+    if field == "total":
+        return str(found).replace(" ", "") == expected.replace(" ", "")
+    if field == "date":
+        return found == expected
+    return str(found).lower() == expected.lower()
 
-    # STEP 1 — decrypt all text fields safely
-    dec_expected_date = decrypt_text(enc_date)
-    dec_expected_total = decrypt_text(enc_total)
-    dec_expected_invoice = decrypt_text(enc_invoice)
-    dec_expected_vendor = decrypt_text(enc_vendor)
 
-    # STEP 2 — decrypt actual uploaded file (Base64 → bytes)
-    file_bytes = decrypt_file(enc_file)
+# -------------------------------------------------------------
+# VERIFY MODE — search for expected values, extract only failures
+# -------------------------------------------------------------
+def verify_invoice_file(path, expected):
 
-    # STEP 3 — save decrypted file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(file_bytes)
-        temp_path = tmp.name
+    # 1. text layer only (no rasterization, no OCR)
+    text, complete = get_text_layer(path)
+    found = verify_fields(text, expected)
+    matched = {f for f, v in found.items() if v is not None}
 
-    # STEP 4 — extract text from the invoice
-    text = extract_text_full(temp_path)
+    failed = [f for f in expected if f not in matched]
+    if not failed:
+        return found, matched
 
-    found_date = extract_date_from_text(text)
-    found_total = extract_total(text)
-    found_invoice = extract_invoice(text)
-    found_vendor = get_vendor(temp_path)
+    # 2. scanned / image → OCR once, search again
+    if not complete:
+        text = extract_text_full(path)
+        retry = verify_fields(text, {f: expected[f] for f in failed})
+        for f, v in retry.items():
+            if v is not None:
+                found[f] = v
+                matched.add(f)
 
-    # STEP 5 — compare extracted values with expected values
-    result = {
-        "date": found_date,
-        "date_match": (found_date == dec_expected_date),
+    # 3. full extraction only for fields still failing
+    for f in expected:
+        if f not in matched:
+            found[f] = extract_field(f, text, path)
 
-        "total": found_total,
-        "total_match": (str(found_total).replace(" ", "") ==
-                        dec_expected_total.replace(" ", "")),
+    return found, matched
 
-        "invoice": found_invoice,
-        "invoice_match": (found_invoice.lower() ==
-                          dec_expected_invoice.lower()),
 
-        "vendor": found_vendor,
-        "vendor_match": (found_vendor.lower() ==
-                         dec_expected_vendor.lower()),
+# -------------------------------------------------------------
+# MAIN FUNCTION
+# -------------------------------------------------------------
+def decrypt_expected(enc_date, enc_total, enc_invoice, enc_vendor):
+    return {
+        "date": decrypt_text(enc_date),
+        "total": decrypt_text(enc_total),
+        "invoice": decrypt_text(enc_invoice),
+        "vendor": decrypt_text(enc_vendor),
     }
 
-    # remove temporary decrypted file
-    os.remove(temp_path)
+
+def process_document(expected, src, doc, verify=False):
+    """
+    src: the document as a path, bytes or binary buffer (read from
+    memory); doc: its DocHasher.
+    """
+    # extract (or, in verify mode, search for) the values
+    if verify:
+        found, matched = verify_invoice_file(src, expected)
+    else:
+        text = extract_text_full(src)
+        found = {f: extract_field(f, text, src) for f in expected}
+        matched = set()
+
+    # compare extracted values with expected values
+    result = {"doc_id": doc.doc_id}
+    for f in ("date", "total", "invoice", "vendor"):
+        result[f] = found[f]
+        result[f + "_match"] = (f in matched) or field_matches(f, found[f], expected[f])
 
     return result
 
 
+def process_invoice_request(enc_date, enc_total, enc_invoice, enc_vendor, enc_file,
+                            verify=False):
+
+    # STEP 1 — decrypt all text fields safely
+    expected = decrypt_expected(enc_date, enc_total, enc_invoice, enc_vendor)
+
+    # STEP 2 — decrypt actual uploaded file (Base64 → bytes)
+    file_bytes = decrypt_file(enc_file)
+
+    # STEP 3 — hash the decrypted bytes; extraction reads them from memory
+    #          (no temp file to leak if an extractor raises)
+    doc = hash_bytes(file_bytes)
+
+    # STEP 4 — extract and compare
+    return process_document(expected, file_bytes, doc, verify)
+
+
+def process_invoice_upload(enc_date, enc_total, enc_invoice, enc_vendor, upload,
+                           verify=False):
+    """
+    Same as process_invoice_request for a binary upload (uploads.Upload,
+    multipart part or raw body): the file arrives as plain bytes, already
+    spooled and hashed, so there is no Base64 copy to decode.
+    """
+    expected = decrypt_expected(enc_date, enc_total, enc_invoice, enc_vendor)
+    return process_document(expected, upload.buffer, upload.doc, verify)
+
+
 # -------------------------------------------------------------
 # TEST
 # -------------------------------------------------------------
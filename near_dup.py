@@ -0,0 +1,231 @@
+import os
+import json
+import threading
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageOps
+from filelock import FileLock
+
+from doc_source import is_path, source_ext, open_source, source_bytes
+
+
+PHASH_INDEX_FILE = "phash_index.jsonl"
+MAX_DISTANCE = 8    # Hamming bits out of 64
+RENDER_ZOOM = 0.5   # 36 dpi is plenty for a 9x8 fingerprint
+
+# Receipts printed from one template (e.g. ride apps) hash within a few
+# bits of each other, so a page match is a *suspicion*, not proof:
+#   "defer" → stop before OCR and return SUSPECTED_DUPLICATE for review
+#   "flag"  → OCR as usual; report the match once the total amount or
+#             the text agrees as well (confirm_near_duplicate)
+NEAR_DUP_ACTION = os.environ.get("NEAR_DUP_ACTION", "flag")
+
+
+# -------------------------------------------------------------
+# PERCEPTUAL HASH OF THE FIRST PAGE (no OCR)
+# -------------------------------------------------------------
+def render_first_page(path):
+    # path may also be bytes or a binary file object (see doc_source)
+    if source_ext(path) == ".pdf":
+        doc = (fitz.open(path) if is_path(path)
+               else fitz.open(stream=source_bytes(path), filetype="pdf"))
+        try:
+            pix = doc.load_page(0).get_pixmap(
+                matrix=fitz.Matrix(RENDER_ZOOM, RENDER_ZOOM),
+                colorspace=fitz.csGRAY,
+                alpha=False
+            )
+            return Image.frombytes(
+                "L", (pix.width, pix.height), pix.samples, "raw", "L", pix.stride
+            )
+        finally:
+            doc.close()
+
+    img = Image.open(open_source(path))
+    img.draft("L", (256, 256))  # JPEG: decode at reduced size
+    return ImageOps.exif_transpose(img).convert("L")
+
+
+def trim_margins(img, threshold=200):
+    # crop to the inked area so scan offsets / borders don't move the hash
+    bbox = img.point(lambda x: 255 if x < threshold else 0).getbbox()
+    return img.crop(bbox) if bbox else img
+
+
+def dhash(img, hash_size=8):
+    small = trim_margins(img.convert("L")).resize(
+        (hash_size + 1, hash_size), Image.LANCZOS
+    )
+    px = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = px[row * (hash_size + 1) + col]
+            right = px[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def page_hash(path):
+    return dhash(render_first_page(path))
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# -------------------------------------------------------------
+# BK-TREE (sublinear Hamming-radius search)
+# -------------------------------------------------------------
+class BKTree:
+
+    def __init__(self):
+        self.root = None   # [hash, [doc_ids], {distance: child}]
+        self.size = 0
+
+    def add(self, value, doc_id):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [doc_id], {}]
+            return
+
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(doc_id)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [doc_id], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        if self.root is None:
+            return []
+
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= max_distance:
+                found.extend((doc_id, d) for doc_id in node[1])
+            # triangle inequality: only children in [d - r, d + r] can match
+            for dist, child in node[2].items():
+                if d - max_distance <= dist <= d + max_distance:
+                    stack.append(child)
+
+        return sorted(found, key=lambda x: x[1])
+
+
+# -------------------------------------------------------------
+# PERSISTED INDEX (append-only JSONL, tree rebuilt in memory)
+#   the tree is read and extended under one mutex: BKTree.add changes
+#   the child dicts a concurrent search would be iterating.
+# -------------------------------------------------------------
+class PageHashIndex:
+
+    def __init__(self, index_file=PHASH_INDEX_FILE):
+        self.index_file = index_file
+        self.tree = BKTree()
+        self.totals = {}    # doc_id → claimed amount (entries since it is stored)
+        self._offset = 0
+        self._mutex = threading.Lock()
+
+    @property
+    def lock(self):
+        # looked up per use, so an index built before a fork works in the child
+        return FileLock(self.index_file + ".lock", is_singleton=True)
+
+    def refresh(self):
+        # pick up entries appended by other processes
+        with self._mutex:
+            if not os.path.exists(self.index_file):
+                return
+            with open(self.index_file, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+            end = chunk.rfind(b"\n") + 1
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self.tree.add(int(entry["phash"], 16), entry["doc_id"])
+                    if entry.get("total") is not None:
+                        self.totals[entry["doc_id"]] = entry["total"]
+            self._offset += end
+
+    def find(self, phash, max_distance=MAX_DISTANCE):
+        self.refresh()
+        with self._mutex:
+            return self.tree.search(phash, max_distance)
+
+    def total(self, doc_id):
+        with self._mutex:
+            return self.totals.get(doc_id)
+
+    def add(self, doc_id, phash, total=None):
+        line = json.dumps({"doc_id": doc_id, "phash": f"{phash:016x}",
+                           "total": _amount(total)}) + "\n"
+        with self.lock:
+            with open(self.index_file, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        self.refresh()
+
+
+PAGE_INDEX = PageHashIndex()
+
+
+# -------------------------------------------------------------
+# PIPELINE HELPERS
+#   check_near_duplicate runs before OCR and finds candidates (enough
+#   to defer); confirm_near_duplicate decides after OCR, from the total
+#   amount or the text-similarity matches (text_lsh), whether a flagged
+#   candidate is reported.
+# -------------------------------------------------------------
+def _amount(value):
+    try:
+        value = round(float(value), 2)
+    except (TypeError, ValueError):
+        return None
+    return value or None    # 0 / missing total confirms nothing
+
+
+def check_near_duplicate(path, doc_id=None, max_distance=MAX_DISTANCE):
+    """
+    Returns (phash, candidates): [{"doc_id", "distance"}] of previously
+    claimed pages within max_distance, closest first. phash is None if
+    the file could not be rendered.
+    """
+    try:
+        phash = page_hash(path)
+    except Exception as e:
+        # path may be the document itself (bytes / buffer): log the ID
+        print(f"⚠️ Page hash failed for {doc_id}: {e}")
+        return None, []
+
+    candidates = [
+        {"doc_id": match_id, "distance": distance}
+        for match_id, distance in PAGE_INDEX.find(phash, max_distance)
+        if match_id != doc_id
+    ]
+    return phash, candidates
+
+
+def confirm_near_duplicate(candidates, total=None, similar_ids=()):
+    """
+    The closest candidate whose claimed total equals total, or whose
+    text matched (similar_ids); None when the page hash is all they
+    share.
+    """
+    total = _amount(total)
+    for match in candidates:
+        if match["doc_id"] in similar_ids:
+            return {**match, "confirmed_by": "text"}
+        if total is not None and PAGE_INDEX.total(match["doc_id"]) == total:
+            return {**match, "confirmed_by": "total"}
+    return None
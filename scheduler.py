@@ -0,0 +1,333 @@
+import os
+import sys
+import time
+import heapq
+import random
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future, wait
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from doc_source import source_ext, open_source, source_bytes, is_path, as_path
+from governor import OCR_WORKERS, MAX_PAGES, MAX_PIXELS, RASTER_DPI, Budget, page_dpi
+from job_queue import percentile
+from total import extract_text_full, extract_pdf_page, PdfPages
+
+
+SJF_AGING = float(os.environ.get("SJF_AGING", "0.5"))        # cost units forgiven per second queued
+SPLIT_MIN_PAGES = int(os.environ.get("SJF_SPLIT_PAGES", "2"))  # scanned PDFs this long run page by page
+LATENCY_WINDOW = 1000
+
+# cost unit: one A4 page rasterised for OCR
+A4_PIXELS = (595 / 72 * RASTER_DPI) * (842 / 72 * RASTER_DPI)
+TEXT_PAGE_COST = 0.02       # page with a text layer: no OCR
+FLAT_COST = 0.05            # spreadsheets, unreadable files
+
+# size class → largest cost in it
+SIZE_CLASSES = (("small", 4.0), ("medium", 12.0), ("large", float("inf")))
+
+
+def size_class(cost):
+    for name, limit in SIZE_CLASSES:
+        if cost <= limit:
+            return name
+
+
+# -------------------------------------------------------------
+# COST ESTIMATE
+#   from signals that cost milliseconds: the PDF page tree (page
+#   count, page sizes, whether a page has a text layer) or the image
+#   header (pixel count). Nothing is rendered or OCR'd.
+# -------------------------------------------------------------
+class Estimate:
+
+    def __init__(self, ext, pages=1, ocr_pages=0, pixels=0, cost=FLAT_COST):
+        self.ext = ext
+        self.pages = pages
+        self.ocr_pages = ocr_pages
+        self.pixels = pixels
+        self.cost = cost
+        self.size_class = size_class(cost)
+
+    def as_dict(self):
+        return {"pages": self.pages, "ocr_pages": self.ocr_pages,
+                "pixels": self.pixels, "cost": round(self.cost, 2),
+                "size_class": self.size_class}
+
+
+def _estimate_pdf(src):
+    try:
+        doc = (fitz.open(src) if is_path(src)
+               else fitz.open(stream=source_bytes(src), filetype="pdf"))
+    except Exception:
+        return Estimate(".pdf", ocr_pages=1, pixels=int(A4_PIXELS), cost=1.0)
+
+    with doc:
+        pages = doc.page_count
+        ocr_pages, pixels, cost = 0, 0, 0.0
+
+        # pages past MAX_PAGES are never read (governor budget)
+        for i in range(min(pages, MAX_PAGES)):
+            page = doc[i]
+            if page.get_text().strip():
+                cost += TEXT_PAGE_COST
+                continue
+            w, h = page.rect.width, page.rect.height
+            dpi = page_dpi(w, h)
+            page_pixels = int((w / 72 * dpi) * (h / 72 * dpi))
+            ocr_pages += 1
+            pixels += page_pixels
+            cost += page_pixels / A4_PIXELS
+
+    return Estimate(".pdf", pages, ocr_pages, pixels, max(cost, TEXT_PAGE_COST))
+
+
+def _estimate_image(src, ext):
+    try:
+        with Image.open(open_source(src)) as img:     # header only
+            w, h = img.size
+    except Exception:
+        return Estimate(ext)
+    pixels = min(w * h, MAX_PIXELS)
+    return Estimate(ext, 1, 1, pixels, pixels / A4_PIXELS)
+
+
+# no document at hand, only its size (a base64 attachment of a queued
+# claim): about one scanned A4 page per SCAN_PAGE_BYTES
+SCAN_PAGE_BYTES = int(os.environ.get("SJF_SCAN_PAGE_BYTES", 250_000))
+
+
+def estimate_size(nbytes):
+    return min(max(nbytes / SCAN_PAGE_BYTES, FLAT_COST), float(MAX_PAGES))
+
+
+def estimate(src):
+    ext = source_ext(src)
+    if ext == ".pdf":
+        return _estimate_pdf(src)
+    if ext == ".xlsx":
+        return Estimate(ext)
+    return _estimate_image(src, ext)
+
+
+# -------------------------------------------------------------
+# SHORTEST-JOB-FIRST SCHEDULER (per server process)
+#   OCR_WORKERS threads take the task with the lowest
+#       cost - SJF_AGING * seconds waited
+#   so short documents overtake long ones, and a long one moves up
+#   the longer it waits (no starvation). Since every task ages at
+#   the same rate this orders like cost + SJF_AGING * enqueued, a
+#   fixed heap key.
+#   The pages of a document share its cost and enqueue time: small
+#   receipts get in between the pages of a 30-page scan instead of
+#   waiting for all of it.
+# -------------------------------------------------------------
+class Scheduler:
+
+    def __init__(self, workers=OCR_WORKERS, aging=SJF_AGING, policy="sjf"):
+        self.workers = workers
+        self.aging = aging
+        self.policy = policy            # "sjf" | "fifo" (for comparison)
+        self.latency = {name: deque(maxlen=LATENCY_WINDOW) for name, _ in SIZE_CLASSES}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pid = None
+
+    def _start(self):
+        # threads do not survive fork: each process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._heap = []
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f"ocr-{i}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def priority(self, cost, enqueued):
+        if self.policy == "fifo":
+            return enqueued
+        return cost + self.aging * enqueued
+
+    def submit(self, fn, *args, cost=1.0, enqueued=None):
+        """Queues fn(*args); tasks sharing cost + enqueued run in submit order."""
+        self._start()
+        future = Future()
+        key = self.priority(cost, enqueued if enqueued is not None else time.monotonic())
+        with self._cond:
+            heapq.heappush(self._heap, (key, next(self._seq), future, fn, args))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, future, fn, args = heapq.heappop(self._heap)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    # ---------------------------------------------------------
+    # METRICS (document latency: queued → text ready)
+    # ---------------------------------------------------------
+    def record(self, size_class, seconds):
+        self.latency[size_class].append(seconds)
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "workers": self.workers,
+            "aging": self.aging,
+            "queued_tasks": len(self._heap),
+            "latency_seconds": {
+                name: {"count": len(values),
+                       "p50": percentile(list(values), 50),
+                       "p95": percentile(list(values), 95)}
+                for name, values in self.latency.items()
+            },
+        }
+
+
+SCHEDULER = Scheduler()
+
+
+# -------------------------------------------------------------
+# EXTRACTION THROUGH THE SCHEDULER
+# -------------------------------------------------------------
+def _extract_pages(scheduler, src, est, budget, enqueued):
+    pages = min(est.pages, budget.max_pages)
+    if est.pages > pages:
+        budget.truncated = budget.truncated or "page_limit"
+
+    # page tasks share one path (one temp copy for in-memory sources)
+    # and one parsed PDF per worker thread
+    with as_path(src) as path:
+        pdfs = PdfPages(path)
+        futures = [
+            scheduler.submit(extract_pdf_page, pdfs, n, budget,
+                             cost=est.cost, enqueued=enqueued)
+            for n in range(1, pages + 1)
+        ]
+        try:
+            return "".join(f.result() for f in futures)
+        finally:
+            # after a failure / cancellation: drop pages not started,
+            # and let running ones finish before the handles and the
+            # temp copy go
+            for f in futures:
+                f.cancel()
+            wait(futures)
+            pdfs.close()
+
+
+def extract_text(src, budget=None, scheduler=None):
+    """
+    total.extract_text_full, scheduled: cost estimated up front, short
+    documents first, scanned multi-page PDFs split into page tasks.
+    """
+    scheduler = scheduler or SCHEDULER
+    budget = budget or Budget()
+    est = estimate(src)
+    enqueued = time.monotonic()
+
+    if est.ocr_pages >= SPLIT_MIN_PAGES:
+        text = _extract_pages(scheduler, src, est, budget, enqueued)
+    else:
+        text = scheduler.submit(
+            extract_text_full, src, budget, cost=est.cost, enqueued=enqueued
+        ).result()
+
+    scheduler.record(est.size_class, time.monotonic() - enqueued)
+    return text
+
+
+# -------------------------------------------------------------
+# SIMULATION
+#   python scheduler.py bench [small docs] [large docs] [workers]
+#   one-page receipts and 30-page scans arrive mixed (Poisson); OCR
+#   is simulated at PAGE_SECONDS per page. Reports p50/p95 latency per
+#   size class for FIFO, SJF + aging, and SJF + aging + page split.
+# -------------------------------------------------------------
+PAGE_SECONDS = 0.05
+
+
+def _simulate(policy, split, docs, workers, rate):
+    scheduler = Scheduler(workers=workers, policy=policy)
+    done = threading.Semaphore(0)
+    arrivals = random.Random(11)    # same arrival times for every policy
+
+    def submit(pages):
+        cost = float(pages)
+        enqueued = time.monotonic()
+        tasks = [1] * pages if split else [pages]
+        left = [len(tasks)]
+        lock = threading.Lock()
+
+        def finished(_):
+            with lock:
+                left[0] -= 1
+                if left[0]:
+                    return
+            scheduler.record(size_class(cost), time.monotonic() - enqueued)
+            done.release()
+
+        for n in tasks:
+            scheduler.submit(time.sleep, n * PAGE_SECONDS,
+                             cost=cost, enqueued=enqueued).add_done_callback(finished)
+
+    for pages in docs:
+        submit(pages)
+        time.sleep(arrivals.expovariate(rate))
+    for _ in docs:
+        done.acquire()
+    return scheduler.stats()["latency_seconds"]
+
+
+def bench(small, large, workers):
+    docs = [1] * small + [30] * large
+    random.seed(7)
+    random.shuffle(docs)
+
+    # offered load ≈ 90% of capacity
+    pages = sum(docs)
+    rate = 0.9 * workers / PAGE_SECONDS * len(docs) / pages
+
+    print(f"{small} one-page + {large} thirty-page documents, {workers} workers, "
+          f"{PAGE_SECONDS * 1000:.0f} ms/page, ~90% load")
+    for name, policy, split in (("FIFO", "fifo", False),
+                                ("SJF + aging", "sjf", False),
+                                ("SJF + aging + page split", "sjf", True)):
+        latency = _simulate(policy, split, docs, workers, rate)
+        print(f"\n{name}")
+        for cls, values in latency.items():
+            if values["count"]:
+                print(f"   {cls:6s} n={values['count']:4d}   p50 {values['p50']:7.3f}s   "
+                      f"p95 {values['p95']:7.3f}s")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if args and args[0] == "bench":
+        small = int(args[1]) if len(args) > 1 else 400
+        large = int(args[2]) if len(args) > 2 else 10
+        workers = int(args[3]) if len(args) > 3 else 4
+        bench(small, large, workers)
+        sys.exit(0)
+
+    # python scheduler.py file [file ...]   → cost estimates
+    for path in args:
+        start = time.perf_counter()
+        est = estimate(path)
+        print(f"{path}: {est.as_dict()}  ({(time.perf_counter() - start) * 1000:.1f} ms)")
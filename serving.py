@@ -0,0 +1,236 @@
+import gc
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import importlib
+import subprocess
+import urllib.request
+
+
+# app name → (WSGI module, default port)
+APPS = {
+    "claim": ("claim_service", 5000),
+    "invoice": ("invoice_api", 5001),
+}
+
+# touches every extractor's patterns so re's compiled-pattern cache
+# is filled in the master and inherited by the workers
+SAMPLE_TEXT = """TAX INVOICE
+UBER
+Invoice No: INV-2024-0001
+Date: 05/04/2024
+Total Amount Payable: 250.00
+"""
+
+
+# -------------------------------------------------------------
+# PRELOAD (server master, before fork)
+#   models and indexes are loaded once; forked workers share the
+#   pages copy-on-write instead of each loading its own copy on the
+#   first request.
+# -------------------------------------------------------------
+def warm_regexes():
+    from date import extract_date_from_text
+    from total import extract_total
+    from invoice import extract_invoice
+    from ven1 import detect_vendor
+
+    extract_date_from_text(SAMPLE_TEXT)
+    extract_total(SAMPLE_TEXT)
+    extract_invoice(SAMPLE_TEXT)
+    detect_vendor(SAMPLE_TEXT.splitlines())
+
+
+def preload(module_name):
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+
+    from near_dup import PAGE_INDEX
+
+    warm_regexes()
+    PAGE_INDEX.refresh()    # page-hash BK-tree
+
+    # app-specific: models / indexes only that app uses
+    warm = getattr(module, "warm_state", None)
+    if warm:
+        warm()
+
+    # everything loaded so far lives as long as the server: take it out
+    # of the GC generations so collections in the workers don't write to
+    # (and so un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+    print(f"🔥 Preloaded {module_name} in {time.perf_counter() - start:.1f}s "
+          f"({gc.get_freeze_count()} objects frozen)")
+
+
+def post_fork(module_name, workers=1):
+    # threads do not survive fork: background writers start per worker
+    module = sys.modules[module_name]
+    start_background = getattr(module, "start_background", None)
+    if start_background:
+        start_background()
+
+    # N workers x all-core torch pools would oversubscribe the CPU
+    if "torch" in sys.modules:
+        threads = int(os.environ.get("OCR_THREADS", max(1, os.cpu_count() // workers)))
+        sys.modules["torch"].set_num_threads(threads)
+
+
+# -------------------------------------------------------------
+# MEASUREMENT
+#   python serving.py bench claim|invoice [workers]
+#   starts the app in the current mode (app.run) and preforked
+#   (gunicorn), then reports per-process memory and cold start:
+#     ready  → seconds until the port accepts connections
+#     first  → latency of the first real request (model load included
+#              when it happens lazily)
+# -------------------------------------------------------------
+def _proc_memory(pid):
+    """(RSS, PSS) in MiB; PSS splits shared pages between their users."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return values.get("Rss", 0), values.get("Pss", 0)
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def _wait_for_port(port, timeout=600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def _first_request(app, port, sample):
+    import base64
+
+    # trailing bytes give a new doc ID, so the file is never short-cut
+    # as already claimed and the request always reaches OCR
+    with open(sample, "rb") as f:
+        data = f.read() + os.urandom(16)
+
+    if app == "invoice":
+        from jwt_token import create_jwt
+        copy = f"bench-{os.getpid()}{os.path.splitext(sample)[1]}"
+        with open(copy, "wb") as f:
+            f.write(data)
+        body = {"file_path": os.path.abspath(copy)}
+        headers = {"Authorization": "Bearer " + create_jwt({"user_id": "bench"})}
+        url = f"http://127.0.0.1:{port}/process-invoice"
+    else:
+        encoded = base64.b64encode(data).decode()
+        body = {"Claim": {
+            "Employee_Code": f"BENCH-{time.time_ns()}",
+            "Total_Bill_Amount": 10 ** 6,
+            "Vouchers": [{"Sub_Type": "Individual_Expense",
+                          "Attachments": [{"base64File": encoded}]}]
+        }}
+        headers = {}
+        url = f"http://127.0.0.1:{port}/process-claim"
+
+    req = urllib.request.Request(
+        url, data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json", **headers}
+    )
+    start = time.perf_counter()
+    try:
+        for attempt in range(20):
+            try:
+                with urllib.request.urlopen(req, timeout=600) as resp:
+                    resp.read()
+                break
+            except ConnectionError:
+                # debug reloader: the port is bound before the app serves
+                time.sleep(0.5)
+    finally:
+        if app == "invoice":
+            os.remove(copy)
+    return time.perf_counter() - start
+
+
+def _measure(app, command, port, sample, processes):
+    if _wait_for_port(port, timeout=0.5):
+        raise RuntimeError(f"port {port} is already in use")
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not _wait_for_port(port):
+            raise RuntimeError(f"{' '.join(command)} did not start")
+        ready = time.perf_counter() - start
+        first = _first_request(app, port, sample)
+
+        # the master binds before its workers have booted
+        deadline = time.time() + 60
+        while len(_children(proc.pid)) + 1 < processes and time.time() < deadline:
+            time.sleep(0.2)
+
+        pids = [proc.pid] + _children(proc.pid)
+        memory = [_proc_memory(pid) for pid in pids]
+        return ready, first, memory
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait()
+
+
+def bench(app, workers, sample):
+    module, port = APPS[app]
+
+    # (name, command, expected processes incl. the parent)
+    modes = [
+        ("app.run (current)", [sys.executable, f"{module}.py"], 1),
+        (f"gunicorn x{workers}", [sys.executable, "-m", "gunicorn",
+                                  "-c", "gunicorn.conf.py", "-w", str(workers),
+                                  "-b", f"127.0.0.1:{port}", f"{module}:app"], workers + 1),
+    ]
+
+    print(f"{app}: first request with {sample}")
+    for name, command, processes in modes:
+        ready, first, memory = _measure(app, command, port, sample, processes)
+        print(f"\n{name}: port ready {ready:.1f}s, first request {first:.2f}s")
+        for i, (rss, pss) in enumerate(memory):
+            role = "parent" if i == 0 else "child"
+            print(f"   {role:6s} RSS {rss:6.0f} MiB   PSS {pss:6.0f} MiB")
+        print(f"   total PSS {sum(m[1] for m in memory):6.0f} MiB")
+
+
+# -------------------------------------------------------------
+# ENTRY POINT
+#   python serving.py claim|invoice          → preforked server
+#   python serving.py bench claim|invoice [workers] [sample file]
+# -------------------------------------------------------------
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    if args and args[0] == "bench":
+        app = args[1] if len(args) > 1 else "invoice"
+        workers = int(args[2]) if len(args) > 2 else 4
+        sample = args[3] if len(args) > 3 else "bill.png"
+        bench(app, workers, sample)
+        sys.exit(0)
+
+    app = args[0] if args else "claim"
+    module, port = APPS[app]
+    bind = os.environ.get("BIND", f"0.0.0.0:{port}")
+    os.execvp(sys.executable, [sys.executable, "-m", "gunicorn",
+                               "-c", "gunicorn.conf.py", "-b", bind, f"{module}:app"])
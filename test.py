@@ -1,9 +1,11 @@
 import os
-import hashlib
-import pandas as pd
 
 # 🔐 JWT
 from jwt_token import create_jwt, verify_jwt
+from text_store import put_text
+from doc_hash import hash_file
+from ledger import is_already_claimed, insert_claim, export_to_excel
+from vali import EXCEL_FILE, LEDGER_WRITER, open_ledger, find_claimed_file
 
 from date import extract_date_from_text
 from total import extract_total, extract_text_full
@@ -11,8 +13,8 @@ from invoice import extract_invoice, check_known_invoice_in_text
 from ven1 import get_vendor
 
 
-EXCEL_FILE = "claimed_invoices.xlsx"
-
+# claims live in the SQLite ledger (vali.LEDGER_WRITER is its only
+# writer); claimed_invoices.xlsx is re-exported from it
 REQUIRED_COLUMNS = [
     "File Name",
     "File Hash",
@@ -20,7 +22,7 @@ REQUIRED_COLUMNS = [
     "Invoice Number",
     "Vendor",
     "Total Amount",
-    "String Extracted"
+    "Text Ref"
 ]
 
 
@@ -28,59 +30,21 @@ REQUIRED_COLUMNS = [
 # FILE HASH (STRONG DUPLICATE PROTECTION)
 # -------------------------------------------------------------
 def get_file_hash(file_path):
-    with open(file_path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
-
-
-# -------------------------------------------------------------
-# LOAD OR CREATE EXCEL (SAFE)
-# -------------------------------------------------------------
-def load_or_create_excel():
-
-    if os.path.exists(EXCEL_FILE):
-        df = pd.read_excel(EXCEL_FILE)
-        df.columns = df.columns.str.strip()
-    else:
-        df = pd.DataFrame(columns=REQUIRED_COLUMNS)
-        df.to_excel(EXCEL_FILE, index=False)
-
-    for col in REQUIRED_COLUMNS:
-        if col not in df.columns:
-            df[col] = ""
-
-    return df
-
-
-# -------------------------------------------------------------
-# DUPLICATE CHECK (INVOICE + TOTAL)
-# -------------------------------------------------------------
-def is_already_claimed(df, invoice_no, total):
-
-    invoice_no = str(invoice_no).strip().lower()
-    total = str(total).strip()
-
-    df["Invoice Number"] = df["Invoice Number"].astype(str).str.strip().str.lower()
-    df["Total Amount"] = df["Total Amount"].astype(str).str.strip()
-
-    match = df[
-        (df["Invoice Number"] == invoice_no) &
-        (df["Total Amount"] == total)
-    ]
-
-    return not match.empty
+    return hash_file(file_path).doc_id
 
 
 # -------------------------------------------------------------
 # MAIN PROCESS
 # -------------------------------------------------------------
-def process_invoice(file_path, df):
+def process_invoice(file_path, conn):
 
     file_name = os.path.basename(file_path)
-    file_hash = get_file_hash(file_path)
+    doc = hash_file(file_path)
+    file_hash = doc.doc_id
 
-    if file_hash in df["File Hash"].astype(str).values:
+    if find_claimed_file(conn, doc):
         print(f"\n❌ ALREADY CLAIMED (FILE MATCH): {file_name}")
-        return df
+        return
 
     text = extract_text_full(file_path)
 
@@ -98,28 +62,22 @@ def process_invoice(file_path, df):
     vendor = get_vendor(file_path)
     total = extract_total(text)
 
-    if is_already_claimed(df, invoice_no, total):
+    if is_already_claimed(conn, invoice_no, total):
         print(f"\n❌ ALREADY CLAIMED: {file_name}")
         print("Invoice:", invoice_no)
         print("Total:", total)
-        return df
-
-    print(f"\n✅ NEW CLAIM: {file_name}")
+        return
 
-    new_row = {
-        "File Name": file_name,
-        "File Hash": file_hash,
-        "Invoice Date": invoice_date,
-        "Invoice Number": invoice_no,
-        "Vendor": vendor,
-        "Total Amount": total,
-        "String Extracted": text
-    }
+    new_row = dict(zip(REQUIRED_COLUMNS, [
+        file_name, file_hash, invoice_date, invoice_no, vendor, total, put_text(text)
+    ]))
 
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_excel(EXCEL_FILE, index=False)
+    # unique indexes reject a row another process claimed meanwhile
+    if not LEDGER_WRITER.call(insert_claim, new_row):
+        print(f"\n❌ ALREADY CLAIMED: {file_name}")
+        return
 
-    return df
+    print(f"\n✅ NEW CLAIM: {file_name}")
 
 
 # -------------------------------------------------------------
@@ -135,14 +93,16 @@ def process_files(file_paths, jwt_token):   # 🔐 JWT added
         print(f"\n❌ JWT ERROR: {e}")
         return
 
-    df = load_or_create_excel()
+    conn = open_ledger()
 
     for path in file_paths:
         if os.path.exists(path):
-            df = process_invoice(path, df)
+            process_invoice(path, conn)
         else:
             print(f"\n⚠️ File not found: {path}")
 
+    export_to_excel(conn, EXCEL_FILE)
+
 
 # -------------------------------------------------------------
 # RUN
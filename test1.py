@@ -1,48 +1,42 @@
 import os
-import hashlib
-import pandas as pd
+
+from doc_hash import hash_file
+from ledger import is_already_claimed, insert_claim
+from vali import LEDGER_WRITER, open_ledger, find_claimed_file
+from text_store import put_text
 
 from date import extract_date_from_text
 from total import extract_total, extract_text_full
 from invoice import extract_invoice, check_known_invoice_in_text
 from ven1 import get_vendor
 
-EXCEL_FILE = "claimed_invoices.xlsx"
-
 REQUIRED_COLUMNS = [
     "File Name", "File Hash", "Invoice Date",
-    "Invoice Number", "Vendor", "Total Amount", "String Extracted"
+    "Invoice Number", "Vendor", "Total Amount", "Text Ref"
 ]
 
 def get_file_hash(file_path):
-    with open(file_path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
-
-def load_or_create_excel():
-    if os.path.exists(EXCEL_FILE):
-        df = pd.read_excel(EXCEL_FILE)
-        df.columns = df.columns.str.strip()
-    else:
-        df = pd.DataFrame(columns=REQUIRED_COLUMNS)
-        df.to_excel(EXCEL_FILE, index=False)
-    return df
-
-def is_already_claimed(df, invoice_no, total):
-    df["Invoice Number"] = df["Invoice Number"].astype(str).str.lower()
-    df["Total Amount"] = df["Total Amount"].astype(str)
-    return not df[
-        (df["Invoice Number"] == str(invoice_no).lower()) &
-        (df["Total Amount"] == str(total))
-    ].empty
-
-def process_invoice(file_path):
-    df = load_or_create_excel()
+    return hash_file(file_path).doc_id
+
+# claims go to the SQLite ledger through its single writer;
+# claimed_invoices.xlsx is only ever an export of it
+LEDGER = None
+
+def ledger():
+    global LEDGER
+    if LEDGER is None:
+        LEDGER = open_ledger()
+    return LEDGER
 
+def process_invoice(file_path, doc=None):
     file_name = os.path.basename(file_path)
-    file_hash = get_file_hash(file_path)
+    doc = doc or hash_file(file_path)
+    file_hash = doc.doc_id
 
-    if file_hash in df["File Hash"].astype(str).values:
-        return {"status": "DUPLICATE_FILE"}
+    conn = ledger()
+
+    if find_claimed_file(conn, doc):
+        return {"status": "DUPLICATE_FILE", "doc_id": file_hash}
 
     text = extract_text_full(file_path)
 
@@ -53,23 +47,35 @@ def process_invoice(file_path):
 
     invoice_no = extracted_invoice
 
-    if is_already_claimed(df, invoice_no, total):
+    if is_already_claimed(conn, invoice_no, total):
         return {
             "status": "DUPLICATE_CLAIM",
+            "doc_id": file_hash,
             "invoice_number": invoice_no,
             "invoice_date": invoice_date,
             "vendor": vendor,
             "total_amount": total
         }
 
-    df.loc[len(df)] = [
+    inserted = LEDGER_WRITER.call(insert_claim, dict(zip(REQUIRED_COLUMNS, [
         file_name, file_hash, invoice_date,
-        invoice_no, vendor, total, text
-    ]
-    df.to_excel(EXCEL_FILE, index=False)
+        invoice_no, vendor, total, put_text(text)
+    ])))
+
+    if not inserted:
+        # claimed by another process between the check and the insert
+        return {
+            "status": "DUPLICATE_CLAIM",
+            "doc_id": file_hash,
+            "invoice_number": invoice_no,
+            "invoice_date": invoice_date,
+            "vendor": vendor,
+            "total_amount": total
+        }
 
     return {
         "status": "NEW_CLAIM",
+        "doc_id": file_hash,
         "invoice_number": invoice_no,
         "invoice_date": invoice_date,
         "vendor": vendor,
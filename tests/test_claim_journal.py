@@ -0,0 +1,120 @@
+import json
+
+import pandas as pd
+import pytest
+
+import claim_journal
+from claim_journal import ClaimJournal, JOURNAL_SHEET
+from claim_index import ClaimAmountIndex
+
+
+COLUMNS = ["Employee_Code", "Invoice_No", "Date", "Total_Amount"]
+
+
+def row(n):
+    return {"Employee_Code": "E1", "Invoice_No": f"INV-{n}", "Date": "2024-04-05",
+            "Total_Amount": 100 + n}
+
+
+def journal(path):
+    return ClaimJournal(str(path), columns=COLUMNS, indexes={
+        "invoice": lambda r: r.get("Invoice_No"),
+        "amount": ClaimAmountIndex(),
+    })
+
+
+def invoices(j):
+    return list(j.frame()["Invoice_No"])
+
+
+@pytest.fixture
+def excel(tmp_path):
+    return tmp_path / "claim.xlsx"
+
+
+def test_append_is_visible_before_compaction(excel):
+    j = journal(excel)
+    j.append([row(1), row(2)])
+
+    assert invoices(j) == ["INV-1", "INV-2"]
+    assert j.contains("invoice", "INV-2")
+    assert not excel.exists()
+
+
+def test_compaction_folds_the_journal_into_the_workbook(excel):
+    j = journal(excel)
+    j.append([row(1), row(2)])
+    assert j.compact() == 2
+    j.append(row(3))
+
+    assert list(pd.read_excel(excel)["Invoice_No"]) == ["INV-1", "INV-2"]
+    # a fresh reader (another process) sees workbook + journal tail once
+    assert invoices(journal(excel)) == ["INV-1", "INV-2", "INV-3"]
+    assert j.compact() == 1
+    assert invoices(journal(excel)) == ["INV-1", "INV-2", "INV-3"]
+
+
+def test_other_instance_picks_up_compaction(excel):
+    writer, reader = journal(excel), journal(excel)
+    writer.append(row(1))
+    assert invoices(reader) == ["INV-1"]
+
+    writer.compact()
+    writer.append(row(2))
+    assert invoices(reader) == ["INV-1", "INV-2"]
+
+
+def test_crash_between_workbook_and_journal_replace_does_not_replay(excel, monkeypatch):
+    j = journal(excel)
+    j.append([row(1), row(2)])
+    j.compact()
+    j.append([row(3), row(4)])
+
+    replace = ClaimJournal._write_durably
+    calls = []
+
+    def crash_on_journal(tmp_file, target):
+        calls.append(target)
+        if target == j.journal_file:
+            raise SystemExit("killed")
+        replace(tmp_file, target)
+
+    monkeypatch.setattr(ClaimJournal, "_write_durably", staticmethod(crash_on_journal))
+    with pytest.raises(SystemExit):
+        j.compact()
+    monkeypatch.undo()
+
+    # the workbook already holds rows 3 and 4; the old journal still does too
+    meta = pd.read_excel(excel, sheet_name=JOURNAL_SHEET)
+    assert int(meta["offset"].iloc[0]) > 0
+    assert invoices(journal(excel)) == ["INV-1", "INV-2", "INV-3", "INV-4"]
+
+    recovered = journal(excel)
+    recovered.append(row(5))
+    assert recovered.compact() == 1
+    assert invoices(journal(excel)) == ["INV-1", "INV-2", "INV-3", "INV-4", "INV-5"]
+
+
+def test_journal_without_header_still_replays(excel):
+    pd.DataFrame([row(1)]).to_excel(excel, index=False)
+    with open(claim_journal.os.path.splitext(str(excel))[0] + ".journal.jsonl", "w") as f:
+        f.write(json.dumps(row(2)) + "\n")
+
+    j = journal(excel)
+    assert invoices(j) == ["INV-1", "INV-2"]
+    assert j.compact() == 1
+    assert invoices(journal(excel)) == ["INV-1", "INV-2"]
+
+
+def test_reload_swaps_in_new_indexes(excel):
+    writer, reader = journal(excel), journal(excel)
+    writer.append(row(1))
+    before = reader.get_index("amount")
+    assert before.contains("E1", "INV-1", "2024-04-05", 101)
+
+    writer.compact()        # reader reloads the workbook on its next refresh
+    after = reader.get_index("amount")
+
+    assert after is not before
+    assert before.contains("E1", "INV-1", "2024-04-05", 101)
+    assert after.contains("E1", "INV-1", "2024-04-05", 101)
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from governor import Admission, Budget, Cancelled, Overloaded
+
+
+def test_page_limit_truncates():
+    budget = Budget(max_pages=3)
+
+    assert [budget.take_page() for _ in range(5)] == [True, True, True, False, False]
+    assert budget.pages == 3
+    assert budget.truncated == "page_limit"
+
+
+def test_time_budget_truncates():
+    budget = Budget(seconds=0.05)
+    assert budget.take_page()
+
+    time.sleep(0.1)
+    assert not budget.check()
+    assert not budget.take_page()
+    assert budget.truncated == "time_budget"
+
+
+def test_first_reason_is_kept():
+    budget = Budget(max_pages=1, seconds=0.05)
+    budget.take_page()
+    budget.take_page()
+    time.sleep(0.1)
+    budget.check()
+
+    assert budget.truncated == "page_limit"
+
+
+def test_clock_starts_at_the_first_check():
+    budget = Budget(seconds=0.1)
+    time.sleep(0.15)            # queued, not yet running
+
+    assert budget.take_page()
+    assert budget.truncated is None
+
+
+def test_cancelled_raises():
+    gone = []
+    budget = Budget(cancelled=lambda: bool(gone))
+    assert budget.take_page()
+
+    gone.append(True)
+    with pytest.raises(Cancelled):
+        budget.take_page()
+
+
+def test_slot_is_released_on_error():
+    admission = Admission(concurrency=1, queue=0, timeout=0.05)
+
+    with pytest.raises(ValueError):
+        with admission.slot():
+            with pytest.raises(Overloaded):
+                admission.enter()
+            raise ValueError
+
+    with admission.slot():
+        assert admission.active == 1
+    assert admission.active == 0
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+import idempotency
+from idempotency import IdempotencyStore, idempotent
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY", IdempotencyStore(str(tmp_path / "idem.db")))
+
+    app = Flask(__name__)
+    calls = []
+    gate = threading.Event()
+    gate.set()
+
+    @app.route("/claim", methods=["POST"])
+    @idempotent
+    def claim():
+        calls.append(1)
+        gate.wait(5)
+        return jsonify({"status": "NEW_CLAIM", "n": len(calls)})
+
+    @app.route("/fail", methods=["POST"])
+    @idempotent
+    def fail():
+        calls.append(1)
+        return jsonify({"status": "ERROR"}), 500
+
+    client = app.test_client()
+    client.calls = calls
+    client.gate = gate
+    return client
+
+
+def post(client, path="/claim", key="k1", body=None):
+    return client.post(path, json=body or {"a": 1}, headers={"Idempotency-Key": key})
+
+
+def test_same_key_replays_the_stored_response(client):
+    first = post(client)
+    again = post(client)
+
+    assert len(client.calls) == 1
+    assert again.get_json() == first.get_json()
+    assert again.headers.get("Idempotent-Replayed") == "true"
+    assert "Idempotent-Replayed" not in first.headers
+
+
+def test_same_key_with_another_payload_is_refused(client):
+    post(client)
+    reused = post(client, body={"a": 2})
+
+    assert reused.status_code == 422
+    assert reused.get_json()["status"] == "IDEMPOTENCY_KEY_REUSED"
+    assert len(client.calls) == 1
+
+
+def test_concurrent_retry_waits_for_the_first_request(client):
+    client.gate.clear()
+    results = []
+    first = threading.Thread(target=lambda: results.append(post(client)))
+    first.start()
+    while not client.calls:
+        time.sleep(0.01)
+
+    retry = threading.Thread(target=lambda: results.append(post(client)))
+    retry.start()
+    time.sleep(0.3)
+    assert retry.is_alive()         # waiting, not computing again
+
+    client.gate.set()
+    first.join()
+    retry.join()
+
+    assert len(client.calls) == 1
+    assert [r.get_json()["n"] for r in results] == [1, 1]
+
+
+def test_failures_are_not_replayed(client):
+    assert post(client, "/fail").status_code == 500
+    assert post(client, "/fail").status_code == 500
+    assert len(client.calls) == 2
+
+
+def test_requests_without_a_key_always_run(client):
+    client.post("/claim", json={"a": 1})
+    client.post("/claim", json={"a": 1})
+    assert len(client.calls) == 2
@@ -0,0 +1,41 @@
+import os
+import socket
+
+from job_queue import connect_jobs, enqueue, claim_next, get_job, requeue_orphans
+
+
+DEAD = f"{socket.gethostname()}:999999"
+
+
+def test_orphan_is_requeued(tmp_path):
+    conn = connect_jobs(str(tmp_path / "jobs.db"))
+    job_id = enqueue(conn, "claim", {})
+    claim_next(conn, ["claim"], DEAD)
+
+    assert requeue_orphans(conn, max_attempts=3) == 1
+    job = get_job(conn, job_id)
+    assert job["status"] == "queued"
+    assert job["worker"] is None
+
+
+def test_orphan_fails_after_max_attempts(tmp_path):
+    conn = connect_jobs(str(tmp_path / "jobs.db"))
+    job_id = enqueue(conn, "claim", {})
+
+    for _ in range(2):
+        claim_next(conn, ["claim"], DEAD)
+        requeue_orphans(conn, max_attempts=2)
+
+    job = get_job(conn, job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert claim_next(conn, ["claim"], DEAD) is None
+
+
+def test_live_worker_keeps_its_job(tmp_path):
+    conn = connect_jobs(str(tmp_path / "jobs.db"))
+    job_id = enqueue(conn, "claim", {})
+    claim_next(conn, ["claim"], f"{socket.gethostname()}:{os.getpid()}")
+
+    assert requeue_orphans(conn) == 0
+    assert get_job(conn, job_id)["status"] == "running"
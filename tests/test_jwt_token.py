@@ -0,0 +1,77 @@
+import jwt
+import pytest
+
+import jwt_token
+from jwt_token import RevocationList, create_jwt, verify_jwt, revoke_jwt
+
+
+SECRET = "test-secret-of-at-least-32-bytes!"
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(jwt_token, "_secret", SECRET)
+    monkeypatch.setattr(jwt_token, "REVOKED", RevocationList(str(tmp_path / "revoked.jsonl")))
+    jwt_token.TOKEN_CACHE.clear()
+    yield tmp_path
+    jwt_token.TOKEN_CACHE.clear()
+
+
+def test_revoked_token_is_rejected_even_when_cached():
+    token = create_jwt({"user_id": "u1"})
+    assert verify_jwt(token)["user_id"] == "u1"
+    assert verify_jwt(token)["user_id"] == "u1"     # served from the cache
+
+    revoke_jwt(token)
+    with pytest.raises(jwt.InvalidTokenError):
+        verify_jwt(token)
+
+
+def test_revocation_reaches_other_processes(isolated):
+    token = create_jwt({"user_id": "u1"})
+    other = RevocationList(str(isolated / "revoked.jsonl"))     # another worker's view
+
+    revoke_jwt(token)
+    other.refresh(force=True)
+
+    claims = jwt.decode(token, SECRET, algorithms=["HS256"])
+    assert claims["jti"] in other
+
+
+def test_other_tokens_stay_valid():
+    revoke_jwt(create_jwt({"user_id": "u1"}))
+    assert verify_jwt(create_jwt({"user_id": "u2"}))["user_id"] == "u2"
+
+
+def test_revoking_needs_a_valid_signature():
+    forged = jwt.encode({"user_id": "u1"}, "another-secret-of-at-least-32-bytes", algorithm="HS256")
+    with pytest.raises(jwt.InvalidSignatureError):
+        revoke_jwt(forged)
+
+
+def json_key(line):
+    return jwt_token.json.loads(line)["key"]
+
+
+def test_expired_revocations_are_dropped_and_the_file_compacted(isolated, monkeypatch):
+    monkeypatch.setattr(jwt_token, "REVOCATION_COMPACT_MIN", 10)
+    path = str(isolated / "revoked.jsonl")
+    revoked = RevocationList(path)
+    other = RevocationList(path)
+
+    now = jwt_token.time.time()
+    for n in range(9):
+        revoked.add(f"old-{n}", now - 60)
+    other.refresh(force=True)
+    assert len(revoked.revoked) == 0 and revoked.lines == 9
+
+    revoked.add("live", now + 600)      # 10 lines, 1 live → rewritten
+
+    with open(path) as f:
+        assert [json_key(line) for line in f] == ["live"]
+    assert revoked.lines == 1
+
+    # a process that read the old file starts over on the new one
+    revoked.add("later", now + 600)
+    other.refresh(force=True)
+    assert set(other.revoked) == {"live", "later"}
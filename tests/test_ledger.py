@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from ledger import (
+    connect_ledger, insert_claim, is_already_claimed, get_claim_by_hash,
+    count_claims, migrate_from_excel
+)
+
+
+def claim(file_hash, invoice="INV-1", total="250.00", **extra):
+    return {"File Name": f"{file_hash}.pdf", "File Hash": file_hash,
+            "Invoice Date": "2024-04-05", "Invoice Number": invoice,
+            "Vendor": "UBER", "Total Amount": total, "Text Ref": None, **extra}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect_ledger(str(tmp_path / "ledger.db"))
+    yield conn
+    conn.close()
+
+
+def test_same_file_is_claimed_once(conn):
+    assert insert_claim(conn, claim("a" * 40))
+    assert not insert_claim(conn, claim("a" * 40, invoice="INV-2", total="99"))
+    assert count_claims(conn) == 1
+    assert get_claim_by_hash(conn, "a" * 40)["Invoice Number"] == "INV-1"
+
+
+def test_same_invoice_and_total_is_claimed_once(conn):
+    assert insert_claim(conn, claim("a" * 40, invoice="INV-1"))
+    # invoice numbers compare case- and whitespace-insensitively
+    assert not insert_claim(conn, claim("b" * 40, invoice=" inv-1 "))
+    assert is_already_claimed(conn, "Inv-1", "250.00")
+    assert insert_claim(conn, claim("c" * 40, invoice="INV-1", total="260.00"))
+    assert count_claims(conn) == 2
+
+
+def test_migration_reports_rows_the_indexes_refuse(conn, tmp_path):
+    excel = tmp_path / "claimed_invoices.xlsx"
+    pd.DataFrame([
+        claim("a" * 40, invoice="INV-1"),
+        claim("a" * 40, invoice="INV-2"),       # same file
+        claim("b" * 40, invoice="INV-1"),       # same invoice + total
+        claim("c" * 40, invoice="INV-3"),
+    ]).to_excel(excel, index=False)
+
+    assert migrate_from_excel(conn, str(excel)) == 2
+    assert count_claims(conn) == 2
+
+    skipped = pd.read_csv(tmp_path / "claimed_invoices.migration_skipped.csv")
+    assert list(skipped["Excel Row"]) == [3, 4]
+
+    # runs once per workbook
+    assert migrate_from_excel(conn, str(excel)) == 0
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from scheduler import Scheduler
+
+
+def run_order(scheduler, tasks):
+    """tasks: [(name, cost, enqueued)] queued behind a blocked worker."""
+    order = []
+    gate = threading.Event()
+    scheduler.submit(gate.wait, 5, cost=-1e9)
+    futures = [
+        scheduler.submit(order.append, name, cost=cost, enqueued=enqueued)
+        for name, cost, enqueued in tasks
+    ]
+    time.sleep(0.05)
+    gate.set()
+    for f in futures:
+        f.result(5)
+    return order
+
+
+def test_shortest_job_runs_first():
+    now = time.monotonic()
+    order = run_order(Scheduler(workers=1, aging=0.5), [
+        ("scan", 30.0, now), ("receipt", 1.0, now), ("form", 4.0, now),
+    ])
+    assert order == ["receipt", "form", "scan"]
+
+
+def test_aging_lets_a_long_wait_overtake_short_jobs():
+    now = time.monotonic()
+    # queued 100 s ago: 30 - 0.5 * 100 beats a fresh 1.0
+    order = run_order(Scheduler(workers=1, aging=0.5), [
+        ("receipt", 1.0, now), ("old scan", 30.0, now - 100),
+    ])
+    assert order == ["old scan", "receipt"]
+
+
+def test_pages_of_one_document_keep_submit_order():
+    now = time.monotonic()
+    order = run_order(Scheduler(workers=1), [(f"page {n}", 12.0, now) for n in range(1, 6)])
+    assert order == [f"page {n}" for n in range(1, 6)]
+
+
+def test_fifo_policy_ignores_cost():
+    now = time.monotonic()
+    order = run_order(Scheduler(workers=1, policy="fifo"), [
+        ("scan", 30.0, now), ("receipt", 1.0, now + 1),
+    ])
+    assert order == ["scan", "receipt"]
@@ -0,0 +1,67 @@
+import io
+
+import pytest
+from flask import Flask, request
+
+from doc_hash import hash_bytes
+from uploads import (
+    request_uploads, request_upload_list, close_uploads, spool_stream, UploadTooLarge, RAW_FIELD
+)
+
+
+PDF = b"%PDF-1.4\n" + b"x" * 5000
+PNG = b"\x89PNG\r\n\x1a\n" + b"y" * 3000
+
+app = Flask(__name__)
+
+
+def test_multipart_parts_are_hashed_in_place():
+    data = {"a": (io.BytesIO(PDF), "bill.pdf"), "b": (io.BytesIO(PNG), "photo.png")}
+    with app.test_request_context("/", method="POST", data=data,
+                                  content_type="multipart/form-data"):
+        uploads = request_uploads(request)
+        try:
+            assert uploads["a"].doc_id == hash_bytes(PDF).doc_id
+            assert (uploads["a"].name, uploads["a"].ext, uploads["a"].size) == \
+                ("bill.pdf", ".pdf", len(PDF))
+            assert uploads["b"].ext == ".png"
+            assert uploads["b"].buffer.read() == PNG
+        finally:
+            close_uploads(uploads)
+
+
+def test_raw_body_is_one_upload():
+    with app.test_request_context("/", method="POST", data=PDF, content_type="application/pdf",
+                                  headers={"X-File-Name": "bill.pdf"}):
+        uploads = request_uploads(request)
+        upload = uploads[RAW_FIELD]
+        try:
+            assert upload.name == "bill.pdf"
+            assert upload.doc_id == hash_bytes(PDF).doc_id
+            assert upload.buffer.read() == PDF
+        finally:
+            close_uploads(uploads)
+
+
+def test_other_bodies_have_no_uploads():
+    with app.test_request_context("/", method="POST", json={"file_path": "x.pdf"}):
+        assert request_uploads(request) == {}
+
+
+def test_upload_list_keeps_repeated_fields_in_order():
+    data = {"files": [(io.BytesIO(PDF), "1.pdf"), (io.BytesIO(PNG), "2.png")]}
+    with app.test_request_context("/", method="POST", data=data,
+                                  content_type="multipart/form-data"):
+        uploads = request_upload_list(request)
+    try:
+        # spooled copies outlive the request
+        assert [u.name for u in uploads] == ["1.pdf", "2.png"]
+        assert uploads[1].buffer.read() == PNG
+    finally:
+        for u in uploads:
+            u.close()
+
+
+def test_oversized_upload_is_refused():
+    with pytest.raises(UploadTooLarge):
+        spool_stream(io.BytesIO(PDF), "big.pdf", max_bytes=1000)
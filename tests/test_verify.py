@@ -0,0 +1,95 @@
+import pytest
+
+from verify import find_date, find_total, find_invoice, find_vendor
+
+
+PAGE = """ACME TRADERS PVT LTD
+12 Market Road, Pune
+Invoice No: INV-2024-0042
+Invoice Date: 05/04/2024
+Due Date: 20/04/2024
+Item   Qty   Amount
+Widget   2   1,500.00
+Phone: 105500
+Grand Total
+Rs. 1,05,500.00
+"""
+
+
+def test_date_on_a_date_line():
+    assert find_date(PAGE, "05-04-2024") == "05/04/2024"
+    assert find_date(PAGE, "5 April 2024") == "05/04/2024"
+
+
+def test_date_elsewhere_on_the_page_is_ignored():
+    text = "Order ref 05/04/2024\nShipped in 3 days"
+    assert find_date(text, "05/04/2024") is None
+    assert find_date(PAGE, "01/01/2024") is None
+
+
+def test_total_under_its_label():
+    assert find_total(PAGE, "105500") == "1,05,500.00"
+    assert find_total(PAGE, "Rs.105500.0") == "1,05,500.00"
+
+
+def test_total_off_the_total_line_is_ignored():
+    # the phone number equals the amount but is not on a total line
+    assert find_total("Phone: 105500\nThank you", "105500") is None
+    assert find_total(PAGE, "abc") is None
+
+
+def test_invoice_exact_and_split():
+    assert find_invoice(PAGE, "INV/2024/0042") == "INV/2024/0042"
+    assert find_invoice("Invoice No: INV 0012 34", "INV001234") == "INV001234"
+
+
+def test_invoice_prefix_of_a_longer_number_is_rejected():
+    assert find_invoice("Invoice No: INV1234", "INV12") is None
+    assert find_invoice("Invoice No: INV 0012 345", "INV001234") is None
+    assert find_invoice(PAGE, "") is None
+
+
+def test_vendor_fuzzy_in_the_header():
+    assert find_vendor(PAGE, "Acme Traders") == "Acme Traders"
+    assert find_vendor(PAGE, "ACME TRADRS PVT LTD") == "ACME TRADRS PVT LTD"
+    assert find_vendor(PAGE, "Globex Corporation") is None
+
+
+def test_vendor_below_the_header_is_ignored():
+    text = "\n".join(["line"] * 30 + ["ACME TRADERS"])
+    assert find_vendor(text, "Acme Traders") is None
+
+
+EXPECTED = {"date": "05/04/2024", "total": "105500",
+            "invoice": "INV-2024-0042", "vendor": "Acme Traders"}
+
+
+def test_complete_text_layer_skips_ocr(monkeypatch):
+    main = pytest.importorskip("main")
+    monkeypatch.setattr(main, "get_text_layer", lambda path: (PAGE, True))
+    monkeypatch.setattr(main, "extract_text_full",
+                        lambda path: pytest.fail("OCR on a complete text layer"))
+
+    found, matched = main.verify_invoice_file("x.pdf", EXPECTED)
+
+    assert matched == set(EXPECTED)
+
+
+def test_incomplete_text_layer_falls_back_to_ocr(monkeypatch):
+    main = pytest.importorskip("main")
+    ocr_calls = []
+
+    def ocr(path):
+        ocr_calls.append(path)
+        return PAGE
+
+    # the scanned page has no text: only the vendor is on the text layer
+    monkeypatch.setattr(main, "get_text_layer",
+                        lambda path: ("ACME TRADERS PVT LTD\n", False))
+    monkeypatch.setattr(main, "extract_text_full", ocr)
+
+    found, matched = main.verify_invoice_file("scan.pdf", EXPECTED)
+
+    assert ocr_calls == ["scan.pdf"]
+    assert matched == set(EXPECTED)
+    assert found["total"] == "1,05,500.00"
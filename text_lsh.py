@@ -0,0 +1,177 @@
+import re
+import sys
+import sqlite3
+import hashlib
+
+import numpy as np
+
+
+LSH_DB = "claim_lsh.db"
+
+SHINGLE_SIZE = 5     # character 5-grams survive single-character OCR errors
+NUM_PERM = 128
+BANDS = 32           # 32 bands x 4 rows → candidate threshold ≈ 0.42
+ROWS = NUM_PERM // BANDS
+MIN_JACCARD = 0.6    # 3% OCR character noise still scores ~0.7
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# fixed seed: stored signatures must stay comparable across processes
+_rng = np.random.RandomState(20240401)
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lsh_signatures (
+    doc_id TEXT PRIMARY KEY,
+    sig    BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band   INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, doc_id)
+) WITHOUT ROWID;
+"""
+
+
+# -------------------------------------------------------------
+# MINHASH SIGNATURE
+# -------------------------------------------------------------
+def shingles(text):
+    norm = re.sub(r"\s+", " ", str(text or "")).strip().lower()
+    if len(norm) < SHINGLE_SIZE:
+        return {norm} if norm else set()
+    return {norm[i:i + SHINGLE_SIZE] for i in range(len(norm) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    sh = shingles(text)
+    if not sh:
+        return None
+
+    hv = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+         for s in sh),
+        dtype=np.uint64, count=len(sh)
+    )
+
+    # (a*x + b) mod p for every permutation x shingle, min per permutation
+    phv = ((np.outer(hv, _PERM_A) + _PERM_B) % _MERSENNE) & _MAX_HASH
+    return phv.min(axis=0).astype(np.uint32)
+
+
+def band_keys(sig):
+    keys = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        bucket = int.from_bytes(
+            hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True
+        )
+        keys.append((band, bucket))
+    return keys
+
+
+# -------------------------------------------------------------
+# PERSISTED INDEX
+# -------------------------------------------------------------
+def init_lsh(conn):
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def connect_lsh(db_path=LSH_DB):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return init_lsh(conn)
+
+
+def add_document(conn, doc_id, sig):
+    if sig is None:
+        return
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO lsh_signatures (doc_id, sig) VALUES (?, ?)",
+            (doc_id, sig.tobytes())
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO lsh_buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+            [(band, bucket, doc_id) for band, bucket in band_keys(sig)]
+        )
+
+
+def query(conn, sig, min_jaccard=MIN_JACCARD, exclude=None, limit=5):
+    """
+    Returns [(doc_id, estimated_jaccard)] best first.
+    Only documents sharing at least one band bucket are compared.
+    """
+    if sig is None:
+        return []
+
+    candidates = set()
+    for band, bucket in band_keys(sig):
+        for (doc_id,) in conn.execute(
+            "SELECT doc_id FROM lsh_buckets WHERE band = ? AND bucket = ?",
+            (band, bucket)
+        ):
+            candidates.add(doc_id)
+
+    candidates.discard(exclude)
+    if not candidates:
+        return []
+
+    ids = list(candidates)
+    found = []
+    for start in range(0, len(ids), 500):
+        part = ids[start:start + 500]
+        rows = conn.execute(
+            "SELECT doc_id, sig FROM lsh_signatures WHERE doc_id IN ("
+            + ",".join("?" * len(part)) + ")",
+            part
+        ).fetchall()
+        for doc_id, blob in rows:
+            jac = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == sig))
+            if jac >= min_jaccard:
+                found.append((doc_id, round(jac, 3)))
+
+    found.sort(key=lambda x: -x[1])
+    return found[:limit]
+
+
+def find_similar(conn, text, exclude=None, min_jaccard=MIN_JACCARD):
+    """Returns (sig, [(doc_id, jaccard)]) so the caller can index sig later."""
+    sig = minhash(text)
+    return sig, query(conn, sig, min_jaccard, exclude)
+
+
+# -------------------------------------------------------------
+# BACKFILL FROM THE SQLITE LEDGER (texts in text_store)
+#   python text_lsh.py
+# -------------------------------------------------------------
+def backfill_from_ledger(ledger_conn):
+    from text_store import get_text
+
+    init_lsh(ledger_conn)
+    added = 0
+
+    rows = ledger_conn.execute(
+        "SELECT file_hash, text_ref FROM claimed_invoices "
+        "WHERE text_ref IS NOT NULL AND file_hash NOT IN (SELECT doc_id FROM lsh_signatures)"
+    ).fetchall()
+
+    for file_hash, ref in rows:
+        text = get_text(ref)
+        if text:
+            add_document(ledger_conn, file_hash, minhash(text))
+            added += 1
+
+    print(f"🔎 Indexed {added} ledger texts for similarity search")
+    return added
+
+
+if __name__ == "__main__":
+    from ledger import connect_ledger, LEDGER_DB
+
+    backfill_from_ledger(connect_ledger(sys.argv[1] if len(sys.argv) > 1 else LEDGER_DB))
@@ -0,0 +1,104 @@
+import os
+import sys
+import zlib
+import hashlib
+import tempfile
+
+import pandas as pd
+
+
+TEXT_STORE_DIR = "text_store"
+
+
+# -------------------------------------------------------------
+# CONTENT-ADDRESSED, COMPRESSED TEXT STORE
+#   text_store/ab/abcdef....z  (zlib of the UTF-8 text)
+# The ledger keeps only the returned ref.
+# -------------------------------------------------------------
+def text_ref(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def _blob_path(ref, store_dir=TEXT_STORE_DIR):
+    return os.path.join(store_dir, ref[:2], ref + ".z")
+
+
+def put_text(text, store_dir=TEXT_STORE_DIR):
+    if text is None or (isinstance(text, float) and pd.isna(text)):
+        return None
+
+    text = str(text)
+    ref = text_ref(text)
+    path = _blob_path(ref, store_dir)
+
+    # same text → same blob; nothing to write
+    if os.path.exists(path):
+        return ref
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(zlib.compress(text.encode("utf-8"), 6))
+    os.replace(tmp_path, path)
+
+    return ref
+
+
+def get_text(ref, store_dir=TEXT_STORE_DIR):
+    if not ref or (isinstance(ref, float) and pd.isna(ref)):
+        return None
+
+    path = _blob_path(str(ref), store_dir)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as f:
+        return zlib.decompress(f.read()).decode("utf-8")
+
+
+# -------------------------------------------------------------
+# ONE-SHOT: move "String Extracted" out of an existing workbook
+#   python text_store.py claimed_invoices.xlsx
+# The workbook is an export of the ledger (ledger.export_to_excel):
+# the refs go into the ledger's text_ref through its writer, then the
+# workbook is exported again, without the text column.
+# -------------------------------------------------------------
+def migrate_excel_text(excel_file, store_dir=TEXT_STORE_DIR):
+    # imported here: ledger and vali import this module
+    from vali import LEDGER_WRITER
+    from ledger import export_to_excel
+
+    df = pd.read_excel(excel_file)
+    df.columns = df.columns.str.strip()
+
+    if "String Extracted" not in df.columns or "File Hash" not in df.columns:
+        return 0
+
+    refs = [
+        (ref, str(file_hash))
+        for ref, file_hash in zip(
+            (put_text(t, store_dir) for t in df["String Extracted"]), df["File Hash"]
+        )
+        if ref is not None
+    ]
+
+    def store_refs(conn):
+        with conn:
+            updated = conn.executemany(
+                "UPDATE claimed_invoices SET text_ref = ? "
+                "WHERE file_hash = ? AND text_ref IS NULL",
+                refs
+            ).rowcount
+        export_to_excel(conn, excel_file)
+        return updated
+
+    updated = LEDGER_WRITER.call(store_refs)
+    print(f"📦 Moved {len(refs)} extracted texts from {excel_file} into {store_dir}/ "
+          f"({updated} ledger rows given their ref)")
+    return len(refs)
+
+
+if __name__ == "__main__":
+    for excel in sys.argv[1:]:
+        migrate_excel_text(excel)
@@ -1,9 +1,14 @@
 import pdfplumber
 import re
+import threading
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pdf2image.exceptions import PDFPopplerTimeoutError
 from PIL import Image
 
+from doc_source import source_ext, open_source, LazyPath
+from governor import Budget, Cancelled, page_dpi, limit_pixels
+
 # -----------------------------------------------------------
 # TESSERACT PATH (add your path here)
 pytesseract.pytesseract.tesseract_cmd = r"C:\Users\VikasTiwari\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
@@ -71,54 +76,166 @@ def extract_total(text):
 # -------------------------------------------------------------------------------------
 # OCR + UNIVERSAL FILE TEXT EXTRACTOR  (same style as date code)
 # -------------------------------------------------------------------------------------
-def _ocr_best(img):
+def _ocr_best(img, budget):
+    # every rotation is a full tesseract run: stop trying once time is up
     best = ""
     for angle in (0, 90, 180, 270):
-        text = pytesseract.image_to_string(img.rotate(angle, expand=True))
+        if not budget.check() and best:
+            break
+        try:
+            text = pytesseract.image_to_string(
+                img.rotate(angle, expand=True), timeout=budget.timeout()
+            )
+        except RuntimeError:            # tesseract killed at the deadline
+            budget.truncated = budget.truncated or "time_budget"
+            break
         if len(text) > len(best):
             best = text
     return best
 
 
-def extract_text_full(path):
+def _ocr_pdf_page(pdf_path, page_number, dpi, budget):
+    # one page at a time, at a dpi that keeps it under MAX_PIXELS;
+    # poppler needs a file, so pdf_path is one (see LazyPath)
+    try:
+        imgs = convert_from_path(
+            pdf_path,
+            poppler_path=POPLER_PATH,
+            first_page=page_number,
+            last_page=page_number,
+            dpi=dpi,
+            timeout=budget.timeout()
+        )
+    except PDFPopplerTimeoutError:
+        budget.truncated = budget.truncated or "time_budget"
+        return ""
+    return "".join("\n" + _ocr_best(limit_pixels(img), budget) for img in imgs)
 
-    if path.lower().endswith(".pdf"):
-        text_out = ""
 
-        try:
-            pdf = pdfplumber.open(path)
-
-            for pg in pdf.pages:
-                txt = pg.extract_text()
-
-                if txt and txt.strip():
-                    text_out += "\n" + txt
-                else:
-                    # scanned PDF → convert that single page
-                    imgs = convert_from_path(
-                        path,
-                        first_page=pg.page_number,
-                        last_page=pg.page_number,
-                        poppler_path=POPLER_PATH
-                    )
-                    for img in imgs:
-                        text_out += "\n" + _ocr_best(img)
+def extract_text_full(path, budget=None):
+    """
+    path: file path, bytes or binary file object (see doc_source).
+    budget: governor.Budget (page / time limits); after the call
+    budget.truncated says whether the text is partial.
+    """
+    budget = budget or Budget()
 
-            pdf.close()
-            return text_out
+    if source_ext(path) == ".pdf":
+        # in-memory sources: one temp copy per document, made for the
+        # first scanned page and shared by the rest
+        with LazyPath(path) as workspace:
+            text_out = ""
+
+            try:
+                # closed on every exit, Cancelled from the budget included
+                with pdfplumber.open(open_source(path)) as pdf:
+                    for pg in pdf.pages:
+                        if not budget.take_page():
+                            break
+
+                        txt = pg.extract_text()
+
+                        if txt and txt.strip():
+                            text_out += "\n" + txt
+                        else:
+                            # scanned PDF → convert that single page
+                            dpi = page_dpi(float(pg.width), float(pg.height))
+                            text_out += _ocr_pdf_page(workspace.path(), pg.page_number, dpi, budget)
 
-        except:
-            # fallback OCR for full PDF
-            imgs = convert_from_path(path, poppler_path=POPLER_PATH)
-            text_all = ""
-            for img in imgs:
-                text_all += "\n" + _ocr_best(img)
-            return text_all
+                return text_out
+
+            except Cancelled:
+                raise
+
+            except:
+                # fallback OCR, page by page, within the same budget
+                # (pages counted before pdfplumber failed are read again)
+                budget.pages = 0
+                try:
+                    info = _pdf_info(workspace.path())
+                    pages = int(info["Pages"])
+                except Exception:
+                    pages, info = budget.max_pages, {}
+                dpi = page_dpi(*_page_size(info))
+
+                text_all = ""
+                for page_number in range(1, pages + 1):
+                    if not budget.take_page():
+                        break
+                    text_all += _ocr_pdf_page(workspace.path(), page_number, dpi, budget)
+                return text_all
 
     else:
         # image file
-        img = Image.open(path)
-        return _ocr_best(img)
+        budget.take_page()
+        img = limit_pixels(Image.open(open_source(path)))
+        return _ocr_best(img, budget)
+
+
+class PdfPages:
+    """
+    pdfplumber handles on one PDF file for the page tasks of a document:
+    each thread parses the file once (pdfminer objects are not
+    thread-safe) and close() releases them all when the document is done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._opened = []
+        self._mutex = threading.Lock()
+
+    def page(self, page_number):
+        pdf = getattr(self._local, "pdf", None)
+        if pdf is None:
+            pdf = self._local.pdf = pdfplumber.open(self.path)
+            with self._mutex:
+                self._opened.append(pdf)
+        return pdf.pages[page_number - 1]
+
+    def close(self):
+        with self._mutex:
+            opened, self._opened = self._opened, []
+        for pdf in opened:
+            pdf.close()
+
+
+def extract_pdf_page(pdfs, page_number, budget, size=None):
+    """
+    One PDF page (1-based) of pdfs (PdfPages): its text layer, else OCR.
+    The scheduler runs the pages of a long document as separate tasks
+    through this.
+    """
+    if not budget.take_page():
+        return ""
+
+    try:
+        pg = pdfs.page(page_number)
+        try:
+            txt = pg.extract_text()
+            if txt and txt.strip():
+                return "\n" + txt
+            size = (float(pg.width), float(pg.height))
+        finally:
+            pg.close()      # drop the page's parsed objects
+    except Exception:
+        pass    # unreadable text layer → OCR
+
+    dpi = page_dpi(*(size or (595.0, 842.0)))
+    return _ocr_pdf_page(pdfs.path, page_number, dpi, budget)
+
+
+def _pdf_info(pdf_path):
+    return pdfinfo_from_path(pdf_path, poppler_path=POPLER_PATH, timeout=10)
+
+
+def _page_size(info):
+    # "595 x 842 pts (A4)" → (595.0, 842.0); unknown → A4
+    try:
+        w, _, h = info["Page size"].split()[:3]
+        return float(w), float(h)
+    except Exception:
+        return 595.0, 842.0
 
 
 # -------------------------------------------------------------------------------------
@@ -0,0 +1,129 @@
+import os
+import tempfile
+
+from doc_hash import DocHasher
+from doc_source import sniff_ext
+
+
+CHUNK_SIZE = 1 << 20
+SPOOL_MAX_MEMORY = 8 << 20                      # larger uploads roll over to an unlinked temp file
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 50 << 20))
+# whole request body, all parts together: set as the apps'
+# MAX_CONTENT_LENGTH, so werkzeug answers 413 before buffering more
+MAX_REQUEST_BYTES = int(os.environ.get("MAX_REQUEST_BYTES", 500 << 20))
+
+BINARY_TYPES = ("application/pdf", "application/octet-stream", "image/")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+# -------------------------------------------------------------
+# SPOOLED, HASHED UPLOAD
+#   the request body is copied once, chunk by chunk, into a buffer
+#   that stays in memory up to SPOOL_MAX_MEMORY; the doc ID is
+#   computed on the way, so nothing re-reads the file to hash it.
+# -------------------------------------------------------------
+class Upload:
+
+    def __init__(self, name, buffer, doc):
+        self.name = name
+        self.buffer = buffer
+        self.doc = doc
+        self.doc_id = doc.doc_id
+        self.size = doc.size
+
+        head = buffer.read(8)
+        buffer.seek(0)
+        self.ext = sniff_ext(head)
+
+    def close(self):
+        self.buffer.close()
+
+
+def _hash_in_place(stream, max_bytes=MAX_UPLOAD_BYTES):
+    # werkzeug already buffered the multipart file (BytesIO / temp file):
+    # hash it where it is instead of copying it again
+    doc = DocHasher()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        doc.update(chunk)
+        if doc.size > max_bytes:
+            raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+    stream.seek(0)
+    return doc
+
+
+def spool_stream(stream, name=None, max_bytes=MAX_UPLOAD_BYTES):
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    doc = DocHasher()
+
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            doc.update(chunk)
+            if doc.size > max_bytes:
+                raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+            buffer.write(chunk)
+    except BaseException:
+        buffer.close()
+        raise
+
+    buffer.seek(0)
+    return Upload(name, buffer, doc)
+
+
+# -------------------------------------------------------------
+# FLASK REQUEST → UPLOADS
+#   multipart/form-data: every file part (keyed by field name)
+#   raw body (application/pdf, image/*, octet-stream): one upload
+#   under the field name "file", spooled from the unbuffered request
+#   stream; anything else the route needs travels in headers or the
+#   query string
+# -------------------------------------------------------------
+RAW_FIELD = "file"
+
+
+def request_uploads(request):
+    """Returns {field name: Upload}; the caller closes them (close_uploads)."""
+    content_type = request.mimetype or ""
+
+    if content_type.startswith("multipart/"):
+        uploads = {}
+        try:
+            for field, storage in request.files.items():
+                uploads[field] = Upload(
+                    storage.filename, storage.stream, _hash_in_place(storage.stream)
+                )
+        except BaseException:
+            close_uploads(uploads)
+            raise
+        return uploads
+
+    if content_type.startswith(BINARY_TYPES):
+        name = request.headers.get("X-File-Name") or request.args.get("name")
+        return {RAW_FIELD: spool_stream(request.stream, name)}
+
+    return {}
+
+
+def request_upload_list(request):
+    """
+    Every file part of a multipart request, in order (repeated field
+    names allowed). Parts are spooled into buffers the caller owns:
+    werkzeug closes its own when the view returns, before a streamed
+    response has been produced.
+    """
+    uploads = []
+    try:
+        for _, storage in request.files.items(multi=True):
+            uploads.append(spool_stream(storage.stream, storage.filename))
+    except BaseException:
+        for upload in uploads:
+            upload.close()
+        raise
+    return uploads
+
+
+def close_uploads(uploads):
+    for upload in uploads.values():
+        upload.close()
@@ -1,88 +1,108 @@
 import os
-import hashlib
-import pandas as pd
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from doc_hash import hash_file
+from near_dup import check_near_duplicate, confirm_near_duplicate, PAGE_INDEX, NEAR_DUP_ACTION
+from text_store import put_text
+from text_lsh import init_lsh, find_similar, add_document
+from ledger_writer import LedgerWriter
+from ledger_cache import ConnectionPool
+from ledger import (
+    LEDGER_DB, connect_ledger, migrate_from_excel, export_to_excel,
+    get_claim_by_hash, is_already_claimed, insert_claim
+)
 
 from date import extract_date_from_text
-from total import extract_total, extract_text_full
+from total import extract_total
+from scheduler import extract_text
 from invoice import extract_invoice, check_known_invoice_in_text
 from ven1 import get_vendor
+from governor import Budget, Cancelled
 
 
+# Excel is kept only as an export / migration source
 EXCEL_FILE = "claimed_invoices.xlsx"
 
-REQUIRED_COLUMNS = [
-    "File Name",
-    "File Hash",
-    "Invoice Date",
-    "Invoice Number",
-    "Vendor",
-    "Total Amount",
-    "String Extracted"
-]
+# files OCR'd concurrently by process_batch
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "4"))
 
 
 # -------------------------------------------------------------
 # FILE HASH (STRONG DUPLICATE PROTECTION)
 # -------------------------------------------------------------
 def get_file_hash(file_path):
-    with open(file_path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
+    return hash_file(file_path).doc_id
 
 
-# -------------------------------------------------------------
-# LOAD OR CREATE EXCEL (SAFE)
-# -------------------------------------------------------------
-def load_or_create_excel():
-
-    if os.path.exists(EXCEL_FILE):
-        df = pd.read_excel(EXCEL_FILE)
-        df.columns = df.columns.str.strip()
-    else:
-        df = pd.DataFrame(columns=REQUIRED_COLUMNS)
-        df.to_excel(EXCEL_FILE, index=False)
+def find_claimed_file(conn, doc):
+    # md5-keyed rows from before the doc ID: see ledger.rehash_legacy_files
+    return get_claim_by_hash(conn, doc.doc_id)
 
-    # Ensure required columns exist
-    for col in REQUIRED_COLUMNS:
-        if col not in df.columns:
-            df[col] = ""
 
-    return df
+def duplicate_file_result(file_hash, existing):
+    return {
+        "status": "DUPLICATE_CLAIM",
+        "duplicate_reason": "file",     # same file bytes already claimed
+        "doc_id": file_hash,
+        "invoice_number": existing["Invoice Number"],
+        "invoice_date": existing["Invoice Date"],
+        "vendor": existing["Vendor"],
+        "total_amount": existing["Total Amount"]
+    }
 
 
 # -------------------------------------------------------------
-# DUPLICATE CHECK (INVOICE + TOTAL)
+# OPEN LEDGER (SQLite, one-shot import of the old Excel file)
 # -------------------------------------------------------------
-def is_already_claimed(df, invoice_no, total):
+def open_ledger():
+    conn = connect_ledger(LEDGER_DB)
+    migrate_from_excel(conn, EXCEL_FILE)
+    init_lsh(conn)   # text-similarity index lives in the same database
+    return conn
 
-    invoice_no = str(invoice_no).strip().lower()
-    total = str(total).strip()
 
-    df["Invoice Number"] = df["Invoice Number"].astype(str).str.strip().str.lower()
-    df["Total Amount"] = df["Total Amount"].astype(str).str.strip()
-
-    match = df[
-        (df["Invoice Number"] == invoice_no) &
-        (df["Total Amount"] == total)
-    ]
-
-    return not match.empty
+# every ledger mutation runs on this one thread (own connection)
+LEDGER_WRITER = LedgerWriter(LEDGER_DB, open_resource=open_ledger, name="ledger")
 
 
 # -------------------------------------------------------------
 # MAIN PROCESS
 # -------------------------------------------------------------
-def process_invoice(file_path, df):
+def process_invoice(file_path, conn, doc=None, allow_near_duplicate=False, file_name=None,
+                    budget=None):
 
-    file_name = os.path.basename(file_path)
-    file_hash = get_file_hash(file_path)
+    # file_path may also be an in-memory upload (then pass doc + file_name)
+    file_name = file_name or os.path.basename(file_path)
 
-    # ❌ HARD DUPLICATE (same file)
-    if file_hash in df["File Hash"].astype(str).values:
-        print(f"\n❌ ALREADY CLAIMED (FILE MATCH): {file_name}")
-        return df
+    # doc ID is computed once (by the caller when it had the bytes in hand)
+    doc = doc or hash_file(file_path)
+    file_hash = doc.doc_id
 
-    # OCR once
-    text = extract_text_full(file_path)
+    # ❌ HARD DUPLICATE (same file)
+    existing = find_claimed_file(conn, doc)
+    if existing:
+        print(f"\n❌ ALREADY CLAIMED (FILE MATCH): {file_name} [{file_hash}]")
+        return duplicate_file_result(file_hash, existing)
+
+    # ⚠️ NEAR DUPLICATE (re-scan / re-photo) → known before paying for OCR
+    phash, candidates = check_near_duplicate(file_path, file_hash)
+
+    if candidates and NEAR_DUP_ACTION == "defer" and not allow_near_duplicate:
+        near = candidates[0]
+        print(f"\n⚠️ SUSPECTED DUPLICATE: {file_name} [{file_hash}] "
+              f"~ {near['doc_id']} (distance {near['distance']}), deferred before OCR")
+        return {
+            "status": "SUSPECTED_DUPLICATE",
+            "doc_id": file_hash,
+            "matched_doc_id": near["doc_id"],
+            "distance": near["distance"]
+        }
+
+    # OCR once (page / time limits from the governor budget), shortest
+    # documents first (scheduler.py)
+    budget = budget or Budget()
+    text = extract_text(file_path, budget)
 
     # -----------------------------
     # EXTRACT DATA
@@ -104,20 +124,43 @@ def process_invoice(file_path, df):
     vendor = get_vendor(file_path)
     total = extract_total(text)
 
+    # OCR-noisy resubmissions (invoice number misread) still share most text
+    text_sig, similar = find_similar(conn, text, exclude=file_hash)
+    if similar:
+        print(f"\n⚠️ SIMILAR TEXT: {file_name} [{file_hash}] ~ "
+              + ", ".join(f"{d} ({j})" for d, j in similar))
+
+    # flagged (not deferred): reported only when total / text agree too
+    near = confirm_near_duplicate(candidates, total, {d for d, _ in similar})
+    if near:
+        print(f"\n⚠️ SUSPECTED DUPLICATE: {file_name} [{file_hash}] "
+              f"~ {near['doc_id']} (distance {near['distance']}, same {near['confirmed_by']})")
+
+    result = {
+        "doc_id": file_hash,
+        "suspected_duplicate_of": near["doc_id"] if near else None,
+        "similar_claims": [{"doc_id": d, "jaccard": j} for d, j in similar],
+        "invoice_number": invoice_no,
+        "invoice_date": invoice_date,
+        "vendor": vendor,
+        "total_amount": total
+    }
+    if budget.truncated:
+        # text is partial: pages after the limit / deadline were not read
+        result["partial"] = budget.truncated
+
     # -----------------------------
     # DUPLICATE CHECK (LOGICAL)
     # -----------------------------
-    if is_already_claimed(df, invoice_no, total):
-        print(f"\n❌ ALREADY CLAIMED: {file_name}")
+    if is_already_claimed(conn, invoice_no, total):
+        print(f"\n❌ ALREADY CLAIMED: {file_name} [{file_hash}]")
         print("Invoice:", invoice_no)
         print("Total:", total)
-        return df
+        return {"status": "DUPLICATE_CLAIM", "duplicate_reason": "invoice_total", **result}
 
     # -----------------------------
-    # NEW CLAIM
+    # NEW CLAIM (unique indexes make this race-safe)
     # -----------------------------
-    print(f"\n✅ NEW CLAIM: {file_name}")
-
     new_row = {
         "File Name": file_name,
         "File Hash": file_hash,
@@ -125,16 +168,86 @@ def process_invoice(file_path, df):
         "Invoice Number": invoice_no,
         "Vendor": vendor,
         "Total Amount": total,
-        "String Extracted": text
-        
+        "Text Ref": put_text(text)
     }
 
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+    if not LEDGER_WRITER.call(insert_claim, new_row):
+        print(f"\n❌ ALREADY CLAIMED: {file_name} [{file_hash}]")
+        return {"status": "DUPLICATE_CLAIM", "duplicate_reason": "invoice_total", **result}
+
+    if phash is not None:
+        PAGE_INDEX.add(file_hash, phash, total)
+    LEDGER_WRITER.submit(add_document, file_hash, text_sig)
 
-    # Write ONCE safely
-    df.to_excel(EXCEL_FILE, index=False)
+    print(f"\n✅ NEW CLAIM: {file_name} [{file_hash}]")
 
-    return df
+    return {"status": "NEW_CLAIM", **result}
+
+
+# -------------------------------------------------------------
+# BATCH
+#   1. hash every file and check the ledger once, up front:
+#      repeats inside the batch and already-claimed files never
+#      reach OCR
+#   2. the rest is spread over a thread pool (OCR runs in the
+#      tesseract / poppler subprocesses); results are yielded as
+#      each file finishes, not in input order
+# -------------------------------------------------------------
+def process_batch(items, connection, workers=BATCH_WORKERS, cancelled=None, slot=nullcontext):
+    """
+    items: [(name, source, doc)] — source is a path or an in-memory
+    document, doc its DocHasher (None → hashed here).
+    connection: ledger connection context manager (ConnectionPool.connection).
+    cancelled: optional callable; True stops in-flight OCR (see governor).
+    slot: context manager factory held around each file's OCR
+    (governor.ADMISSION.slot); Overloaded becomes that file's ERROR.
+    Yields (index, result).
+    """
+    first_index = {}
+    early = []
+    todo = []
+
+    with connection() as conn:
+        for i, (name, source, doc) in enumerate(items):
+            doc = doc or hash_file(source)
+
+            if doc.doc_id in first_index:
+                early.append((i, {
+                    "status": "DUPLICATE_IN_BATCH",
+                    "doc_id": doc.doc_id,
+                    "duplicate_of_index": first_index[doc.doc_id]
+                }))
+                continue
+            first_index[doc.doc_id] = i
+
+            existing = find_claimed_file(conn, doc)
+            if existing:
+                print(f"\n❌ ALREADY CLAIMED (FILE MATCH): {name} [{doc.doc_id}]")
+                early.append((i, duplicate_file_result(doc.doc_id, existing)))
+            else:
+                todo.append((i, name, source, doc))
+
+    yield from early
+
+    def run(name, source, doc):
+        with slot(), connection() as conn:
+            return process_invoice(source, conn, doc=doc, file_name=name,
+                                   budget=Budget(cancelled=cancelled))
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(run, name, source, doc): i for i, name, source, doc in todo}
+
+        for fut in as_completed(futures):
+            try:
+                yield futures[fut], fut.result()
+            except Cancelled:
+                raise
+            except Exception as e:
+                yield futures[fut], {"status": "ERROR", "error": str(e)}
+    finally:
+        # consumer gone (client disconnected) → drop files not started yet
+        pool.shutdown(wait=True, cancel_futures=True)
 
 
 # -------------------------------------------------------------
@@ -142,14 +255,25 @@ def process_invoice(file_path, df):
 # -------------------------------------------------------------
 def process_files(file_paths):
 
-    df = load_or_create_excel()
-
+    found = []
     for path in file_paths:
         if os.path.exists(path):
-            df = process_invoice(path, df)
+            found.append(path)
         else:
             print(f"\n⚠️ File not found: {path}")
 
+    pool = ConnectionPool(open_ledger, size=BATCH_WORKERS)
+    items = [(os.path.basename(p), p, None) for p in found]
+
+    for i, result in process_batch(items, pool.connection):
+        if result["status"] == "DUPLICATE_IN_BATCH":
+            print(f"\n❌ REPEATED IN BATCH: {found[i]} "
+                  f"(same file as {found[result['duplicate_of_index']]})")
+
+    # Excel is an export of the ledger, written once per batch
+    with pool.connection() as conn:
+        export_to_excel(conn, EXCEL_FILE)
+
 
 # -------------------------------------------------------------
 # RUN
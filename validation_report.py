@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import PatternFill
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.utils import get_column_letter
+
+
+EXCEEDED = "Exceeded daily limit"
+RED_FILL = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
+
+
+# -------------------------------------------------------------
+# ONE-PASS REPORT WRITER
+#   rows are streamed into a write-only workbook; highlighting is a
+#   single conditional-formatting rule over the data range, so no
+#   cell is styled (or the file reopened) one by one.
+# -------------------------------------------------------------
+def write_validation_report(df, path, status_col="Validation", flag=EXCEEDED,
+                            sheet="Sheet1"):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet)
+
+    ws.append([str(c) for c in df.columns])
+
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        ws.append(row)
+
+    if status_col in df.columns and len(df):
+        status = get_column_letter(df.columns.get_loc(status_col) + 1)
+        last_col = get_column_letter(len(df.columns))
+        ws.conditional_formatting.add(
+            f"A2:{last_col}{len(df) + 1}",
+            FormulaRule(formula=[f'${status}2="{flag}"'], fill=RED_FILL)
+        )
+
+    wb.save(path)
+    return path
+
+
+# -------------------------------------------------------------
+# PREVIOUS APPROACH (kept for the benchmark only)
+# -------------------------------------------------------------
+def _legacy_report(df, path, status_col="Validation", flag=EXCEEDED):
+    df.to_excel(path, index=False)
+
+    wb = load_workbook(path)
+    ws = wb.active
+
+    validation_col = next(
+        (i for i, c in enumerate(ws[1], start=1) if c.value == status_col),
+        None
+    )
+
+    for row in range(2, ws.max_row + 1):
+        if ws.cell(row=row, column=validation_col).value == flag:
+            for col in range(1, ws.max_column + 1):
+                ws.cell(row=row, column=col).fill = RED_FILL
+
+    wb.save(path)
+    return path
+
+
+# -------------------------------------------------------------
+# BENCHMARK
+#   python validation_report.py [rows]
+#   Book1-shaped sheet, ~10% of rows over the limit.
+# -------------------------------------------------------------
+def _sample_frame(rows):
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        "Batch No": rng.integers(1, 500, rows),
+        "Applied Date": pd.Timestamp("2024-04-01")
+                        + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "Employee Code": rng.integers(100000, 100500, rows).astype(str),
+        "Employee Name": "Sample Employee",
+        "Claim Type": "Other Reimbursement",
+        "Applied Amount/Units": rng.integers(10, 260, rows).astype(float),
+        "Remarks": "Local conveyance",
+    })
+    for i in range(15):
+        df[f"Extra {i}"] = rng.integers(0, 1000, rows)
+    df["Validation"] = np.where(df["Applied Amount/Units"] > 235, EXCEEDED, "Within limit")
+    df["UploadedBy"] = "bench"
+    return df
+
+
+def _measure(fn, df, path):
+    start = time.perf_counter()
+    fn(df, path)
+    elapsed = time.perf_counter() - start
+
+    # separate run: tracing slows the write down several times
+    tracemalloc.start()
+    fn(df, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 2**20, os.path.getsize(path) / 2**20
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    df = _sample_frame(rows)
+
+    print(f"{rows} rows x {len(df.columns)} columns")
+    for name, fn, path in [
+        ("per-cell fill (old)", _legacy_report, "bench_legacy.xlsx"),
+        ("one-pass writer", write_validation_report, "bench_report.xlsx"),
+    ]:
+        elapsed, peak, size = _measure(fn, df, path)
+        print(f"{name:22s} {elapsed:7.2f}s  peak {peak:7.1f} MiB  file {size:5.1f} MiB")
+        os.remove(path)
@@ -1,9 +1,12 @@
 import pandas as pd
 import numpy as np
 import os
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
-from tkinter import Tk, messagebox
+import sys
+from daily_limits import daily_limit_check
+from expense_store import (
+    connect_store, import_workbook, upload_id_for, row_keys,
+    new_rows_mask, load_daily_totals, ingest, export_workbook
+)
 import getpass
  
  
@@ -12,6 +15,18 @@ INPUT_FILE = r"C:\newproj\OPE_Samples.xlsx"          # uploaded Excel
 DATABASE_FILE = r"C:\newproj\Book1.xlsx"      # main database Excel
 DAILY_LIMIT = 200
  
+# python valiex.py [upload.xlsx] [--headless]   ingest one upload
+# python valiex.py --export                     regenerate DATABASE_FILE
+ARGS = [a for a in sys.argv[1:] if not a.startswith("--")]
+HEADLESS = "--headless" in sys.argv or os.environ.get("VALIEX_HEADLESS") == "1"
+ 
+if ARGS:
+    INPUT_FILE = ARGS[0]
+ 
+if "--export" in sys.argv and not ARGS:
+    export_workbook(connect_store(), DATABASE_FILE)
+    sys.exit(0)
+ 
 # Dynamically capture uploader (Windows login)
 UPLOADED_BY = getpass.getuser()
  
@@ -46,11 +61,34 @@ df[date_col] = pd.to_datetime(df[date_col], errors="coerce", dayfirst=True)
  
 print("\n🧹 Data cleaned successfully")
  
+# ---------------- STORE + DEDUP ----------------
+store = connect_store()
+ 
+# first run: existing database workbook becomes the store's baseline
+import_workbook(store, DATABASE_FILE, employee_col, date_col, amount_col)
+ 
+upload_id = upload_id_for(INPUT_FILE)
+keys = row_keys(df, employee_col, date_col, amount_col, upload_id)
+is_new = new_rows_mask(store, keys, upload_id)
+ 
+if not is_new.all():
+    print(f"\n♻️ Skipping {(~is_new).sum()} rows already ingested from this upload")
+ 
+df = df[is_new]
+keys = keys[is_new]
+ 
+# ---------------- HISTORICAL DAILY TOTALS ----------------
+history = load_daily_totals(store)
+ 
+print(f"\n📚 Daily totals loaded for {len(history)} employee-days")
+ 
 # ---------------- DAILY TOTAL & VALIDATION ----------------
-daily_total = df.groupby([employee_col, date_col])[amount_col].transform("sum")
+exceeded, daily_total = daily_limit_check(
+    df[employee_col], df[date_col], df[amount_col], DAILY_LIMIT, history
+)
  
 df["Validation"] = np.where(
-    (daily_total > DAILY_LIMIT) | (df[amount_col] > DAILY_LIMIT),
+    exceeded,
     "Exceeded daily limit",
     "Within limit"
 )
@@ -60,42 +98,33 @@ df["UploadedBy"] = UPLOADED_BY
 print("\n✅ Validation completed")
 print(df[[employee_col, date_col, amount_col, "Validation"]].head())
  
-# ---------------- MERGE INTO DATABASE ----------------
-if os.path.exists(DATABASE_FILE):
-    old_df = pd.read_excel(DATABASE_FILE)
-    final_df = pd.concat([old_df, df], ignore_index=True)
-else:
-    final_df = df
- 
-final_df.to_excel(DATABASE_FILE, index=False)
- 
-print(f"\n💾 Data saved to: {DATABASE_FILE}")
- 
-# ---------------- HIGHLIGHT EXCEEDED ----------------
-wb = load_workbook(DATABASE_FILE)
-ws = wb.active
- 
-red_fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
- 
-validation_col = next(
-    (i for i, c in enumerate(ws[1], start=1) if c.value == "Validation"),
-    None
+# ---------------- APPEND TO STORE ----------------
+added = ingest(
+    store, df, keys, upload_id,
+    file_name=os.path.basename(INPUT_FILE), uploaded_by=UPLOADED_BY
 )
  
-for row in range(2, ws.max_row + 1):
-    if ws.cell(row=row, column=validation_col).value == "Exceeded daily limit":
-        for col in range(1, ws.max_column + 1):
-            ws.cell(row=row, column=col).fill = red_fill
- 
-wb.save(DATABASE_FILE)
+print(f"\n💾 {added} rows added to the expense store")
  
-print("\n🎨 Highlighted exceeded rows in Excel")
+# ---------------- DATABASE WORKBOOK (LAZY) ----------------
+if HEADLESS and "--export" not in sys.argv:
+    print(f"\n⏳ {DATABASE_FILE} regeneration deferred (python valiex.py --export)")
+else:
+    # validation result + highlighting written in one pass
+    export_workbook(store, DATABASE_FILE)
  
 # ---------------- POPUP ----------------
-root = Tk()
-root.withdraw()
+exceeded_any = (df["Validation"] == "Exceeded daily limit").any()
+ 
+if HEADLESS:
+    if exceeded_any:
+        print(f"\n⚠️ One or more employees exceeded ₹{DAILY_LIMIT}")
+elif exceeded_any:
+    from tkinter import Tk, messagebox
+ 
+    root = Tk()
+    root.withdraw()
  
-if (df["Validation"] == "Exceeded daily limit").any():
     messagebox.showwarning(
         "Daily Limit Exceeded",
         f"One or more employees exceeded ₹{DAILY_LIMIT}"
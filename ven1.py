@@ -4,6 +4,9 @@ import easyocr
 from PIL import Image, ImageOps, ImageFilter
 import io
 from difflib import get_close_matches
+import threading
+ 
+from doc_source import is_path, source_ext, source_bytes
  
 # -------------------------------
 # Known Vendors
@@ -25,7 +28,9 @@ corrections = {
 # Convert first page to high-quality image
 # -------------------------------
 def get_first_page_image(pdf_path):
-    doc = fitz.open(pdf_path)
+    # pdf_path may also be bytes or a binary file object (see doc_source)
+    doc = (fitz.open(pdf_path) if is_path(pdf_path)
+           else fitz.open(stream=source_bytes(pdf_path), filetype=source_ext(pdf_path)[1:]))
     page = doc.load_page(0)
  
     zoom = 300 / 72
@@ -85,13 +90,26 @@ def detect_vendor(lines):
  
     return "Vendor Not Found"
  
+# -------------------------------
+# OCR model: loaded once per process
+# (serving.preload loads it before the server forks)
+# -------------------------------
+_reader = None
+_reader_lock = threading.Lock()
+ 
+def get_reader():
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            _reader = easyocr.Reader(['en'])
+    return _reader
+ 
 # -------------------------------
 # Master function
 # -------------------------------
 def get_vendor(pdf_path):
     img_data = get_first_page_image(pdf_path)
-    reader = easyocr.Reader(['en'])
-    lines = reader.readtext(img_data, detail=0)
+    lines = get_reader().readtext(img_data, detail=0)
     lines = [l.strip() for l in lines if l.strip()]
     if not lines:
         return "Vendor Not Found"
@@ -0,0 +1,218 @@
+import re
+from difflib import SequenceMatcher
+
+import pdfplumber
+from dateutil import parser
+
+from invoice import normalize_invoice, check_known_invoice_in_text
+from date import date_keywords
+from doc_source import source_ext, open_source
+
+
+# -------------------------------------------------------------
+# TEXT LAYER (NO OCR)
+# -------------------------------------------------------------
+def get_text_layer(path):
+    """
+    Returns (text, complete) from the PDF text layer only.
+    complete is False when any page has no text (scanned) or the
+    file is not a readable PDF — the caller then needs OCR.
+    """
+    if source_ext(path) != ".pdf":
+        return "", False
+
+    text_out = ""
+    complete = True
+
+    try:
+        with pdfplumber.open(open_source(path)) as pdf:
+            for pg in pdf.pages:
+                txt = pg.extract_text()
+                if txt and txt.strip():
+                    text_out += "\n" + txt
+                else:
+                    complete = False
+    except Exception:
+        return "", False
+
+    return text_out, complete
+
+
+# -------------------------------------------------------------
+# DATE
+# -------------------------------------------------------------
+def date_variants(expected_date):
+
+    if not expected_date:
+        return []
+
+    try:
+        d = parser.parse(str(expected_date), dayfirst=True).date()
+    except Exception:
+        return [str(expected_date).strip()]
+
+    days = {f"{d.day:02d}", str(d.day)}
+    months = {f"{d.month:02d}", str(d.month)}
+    years = {str(d.year), str(d.year)[2:]}
+    mon_short = d.strftime("%b")
+    mon_long = d.strftime("%B")
+
+    variants = {str(expected_date).strip()}
+
+    for dd in days:
+        for mm in months:
+            for sep in ("/", "-", "."):
+                for yy in years:
+                    variants.add(f"{dd}{sep}{mm}{sep}{yy}")
+                variants.add(f"{d.year}{sep}{mm}{sep}{dd}")
+
+        for mon in (mon_short, mon_long):
+            variants.add(f"{dd} {mon} {d.year}")
+            variants.add(f"{dd}-{mon}-{d.year}")
+            variants.add(f"{dd} {mon}, {d.year}")
+            variants.add(f"{mon} {dd} {d.year}")
+            variants.add(f"{mon} {dd}, {d.year}")
+
+    # longest first so "01/02/2024" wins over "01/02/20"
+    return sorted(variants, key=len, reverse=True)
+
+
+def labelled_lines(text, keywords):
+    """Lines naming one of keywords, each followed by the line under it
+    (layouts often print the value below its label)."""
+    lines = text.split("\n")
+    for i, line in enumerate(lines):
+        if any(k in line.lower() for k in keywords):
+            yield line
+            if i + 1 < len(lines):
+                yield lines[i + 1]
+
+
+def find_date(text, expected_date):
+    # only dates next to a date label: due dates, order dates printed
+    # elsewhere on the page do not count
+    text_flat = re.sub(r"[ \t]+", " ", "\n".join(labelled_lines(text, date_keywords)))
+
+    for v in date_variants(expected_date):
+        pat = r"(?<![0-9A-Za-z])" + re.escape(v) + r"(?![0-9A-Za-z])"
+        m = re.search(pat, text_flat, re.IGNORECASE)
+        if m:
+            return m.group(0)
+
+    return None
+
+
+# -------------------------------------------------------------
+# TOTAL
+# -------------------------------------------------------------
+# only amounts on a line naming the total (or the line under it, where
+# layouts print the value below its label) count: line items, tax and
+# phone numbers equal to the expected total do not
+TOTAL_KEYWORDS = ("total", "payable", "due", "amount", "paid")
+CURRENCY_PREFIX = re.compile(r"^\s*(?:rs\.?|inr\.?|₹|\$)\s*", re.IGNORECASE)
+
+
+def parse_amount(value):
+    # "Rs.100" → 100.0: the prefix goes with its dot
+    value = CURRENCY_PREFIX.sub("", str(value))
+    cleaned = re.sub(r"[^0-9.]", "", value.replace(",", ""))
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def find_total(text, expected_total):
+    expected = parse_amount(expected_total)
+    if expected is None:
+        return None
+
+    # "1,05,500.00", "105500", "105500.0" all compare equal
+    for line in labelled_lines(text, TOTAL_KEYWORDS):
+        for tok in re.findall(r"\d[\d,]*(?:\.\d+)?", line):
+            amt = parse_amount(tok)
+            if amt is not None and abs(amt - expected) < 0.005:
+                return tok
+
+    return None
+
+
+# -------------------------------------------------------------
+# INVOICE NUMBER
+# -------------------------------------------------------------
+def joins_tokens(line, target):
+    # target == tokens[i] + tokens[i + 1] + ... for some run of the
+    # line's alphanumeric tokens, never a part of one
+    tokens = [t.lower() for t in re.findall(r"[A-Za-z0-9]+", line)]
+    for i in range(len(tokens)):
+        joined = ""
+        for tok in tokens[i:]:
+            joined += tok
+            if len(joined) >= len(target):
+                break
+        if joined == target:
+            return True
+    return False
+
+
+def find_invoice(text, expected_invoice):
+    norm_expected = normalize_invoice(expected_invoice)
+    if not norm_expected:
+        return None
+
+    if check_known_invoice_in_text(text, expected_invoice):
+        return expected_invoice
+
+    # OCR / layout may split the number with spaces ("INV 0012 34"):
+    # it must be made of whole tokens, so "INV12" does not match "INV1234"
+    if len(norm_expected) >= 6:
+        for line in text.split("\n"):
+            if joins_tokens(line, norm_expected):
+                return expected_invoice
+
+    return None
+
+
+# -------------------------------------------------------------
+# VENDOR (FUZZY)
+# -------------------------------------------------------------
+def find_vendor(text, expected_vendor, cutoff=0.8, top_lines=25):
+    target = re.sub(r"\s+", " ", str(expected_vendor or "")).strip().upper()
+    if not target:
+        return None
+
+    n_words = len(target.split())
+    lines = [l.strip().upper() for l in text.split("\n") if l.strip()]
+
+    for line in lines[:top_lines]:
+        if target in line:
+            return expected_vendor
+
+        words = line.split()
+        for i in range(max(len(words) - n_words + 1, 1)):
+            window = " ".join(words[i:i + n_words])
+            if SequenceMatcher(None, target, window).ratio() >= cutoff:
+                return expected_vendor
+
+    return None
+
+
+# -------------------------------------------------------------
+# VERIFY ALL FIELDS
+# -------------------------------------------------------------
+def verify_fields(text, expected):
+    """
+    expected: {"date": .., "total": .., "invoice": .., "vendor": ..}
+    Returns {field: matched text or None}.
+    """
+    finders = {
+        "date": find_date,
+        "total": find_total,
+        "invoice": find_invoice,
+        "vendor": find_vendor,
+    }
+
+    return {
+        field: finders[field](text, value) if text else None
+        for field, value in expected.items()
+    }